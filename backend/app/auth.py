@@ -1,10 +1,17 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException, status
-from app.database import get_db
+from app.database import get_db, AsyncSessionLocal
+from sqlalchemy import event, inspect, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app import models
 
@@ -13,9 +20,75 @@ SECRET_KEY = "CHANGE_THIS_TO_A_LONG_SECURE_STRING_IN_PROD"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-# Using Argon2 for "Elite" security as per standards
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+# Using Argon2 for "Elite" security as per standards.
+# Costs default to passlib's (i.e. the installed argon2-cffi's), so existing hashes are kept.
+# Setting ARGON2_TIME_COST / ARGON2_MEMORY_COST (KiB) / ARGON2_PARALLELISM is the opt-in:
+# hashes made with other costs are then upgraded on the user's next login.
+ARGON2_COSTS = {
+    f"argon2__{name}": int(os.environ[var])
+    for name, var in (("time_cost", "ARGON2_TIME_COST"), ("memory_cost", "ARGON2_MEMORY_COST"),
+                      ("parallelism", "ARGON2_PARALLELISM"))
+    if os.getenv(var)
+}
+pwd_context = CryptContext(schemes=["argon2"], deprecated="auto", **ARGON2_COSTS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+oauth2_optional = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
+
+class UserCache:
+    """
+    In-process LRU + TTL cache of authenticated users, keyed on the token subject (email).
+    Entries are detached User rows: fine for reading columns (id, email, ...),
+    but relationships aren't loaded.
+    """
+    def __init__(self, maxsize=10_000, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()  # email -> (expires_at, user)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, email):
+        entry = self.entries.get(email)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self.entries[email]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(email)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, email, user):
+        self.entries[email] = (time.monotonic() + self.ttl, user)
+        self.entries.move_to_end(email)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, email=None):
+        if email is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(email, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"size": len(self.entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0}
+
+user_cache = UserCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "30")),
+)
+
+# Any ORM update/delete of a user (deactivation, email or password change) drops the cached copy.
+# Bulk UPDATE statements bypass these hooks; the short TTL bounds staleness for those
+# and for other API workers.
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target):
+    user_cache.invalidate(target.email)
+    for old_email in inspect(target).attrs.email.history.deleted or ():
+        user_cache.invalidate(old_email)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -23,6 +96,68 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+class HashPool:
+    """
+    Runs Argon2 off the event loop on a dedicated thread pool (argon2-cffi releases the GIL).
+    At most `workers + queue_size` hashes are in flight; beyond that callers get a 503
+    with Retry-After instead of queueing without bound. workers=0 hashes inline.
+    """
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.in_flight = 0
+        self.rejected = 0
+        self.avg_seconds = 0.05     # Moving average of one hash, for Retry-After
+        self._executor = None
+
+    async def run(self, fn, *args):
+        if self.workers == 0:
+            return fn(*args)
+        if self.in_flight >= self.workers + self.queue_size:
+            self.rejected += 1
+            retry_after = max(1, math.ceil(self.in_flight * self.avg_seconds / self.workers))
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication is busy, please retry shortly",
+                headers={"Retry-After": str(retry_after)},
+            )
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="argon2")
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._timed, fn, args)
+        finally:
+            self.in_flight -= 1
+
+    def _timed(self, fn, args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.avg_seconds += 0.1 * (time.perf_counter() - started - self.avg_seconds)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+hash_pool = HashPool(
+    workers=int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    queue_size=int(os.getenv("HASH_QUEUE_SIZE", "64")),
+)
+
+async def hash_password_async(password):
+    return await hash_pool.run(pwd_context.hash, password)
+
+async def verify_and_update_password(plain_password, hashed_password):
+    """
+    (valid, new_hash): new_hash is set when the stored hash uses outdated cost parameters,
+    and only once costs are set explicitly (ARGON2_*); otherwise hashes are never rewritten.
+    """
+    if not ARGON2_COSTS:
+        return await hash_pool.run(pwd_context.verify, plain_password, hashed_password), None
+    return await hash_pool.run(pwd_context.verify_and_update, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -49,11 +184,25 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     except JWTError:
         raise credentials_exception
         
-    # Async query to fetch user
-    from sqlalchemy import select
-    result = await db.execute(select(models.User).where(models.User.email == email))
-    user = result.scalars().first()
-    
+    user = user_cache.get(email)
     if user is None:
+        # Async query to fetch user
+        result = await db.execute(select(models.User).where(models.User.email == email))
+        user = result.scalars().first()
+        if user is None:
+            raise credentials_exception
+        db.expunge(user)  # Cached across requests, so it must not belong to this session
+        user_cache.put(email, user)
+
+    if not user.is_active:
         raise credentials_exception
     return user
+
+async def get_stream_user(token: Optional[str] = Depends(oauth2_optional), access_token: Optional[str] = None):
+    """
+    get_current_user for long-lived streams. EventSource can't set headers, so the token
+    may also come as ?access_token=, and a cache miss is looked up in a short session of
+    its own rather than one held (with its pooled connection) for the life of the stream.
+    """
+    async with AsyncSessionLocal() as db:
+        return await get_current_user(token or access_token or "", db)
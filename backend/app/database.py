@@ -2,54 +2,88 @@ import os
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.engine import make_url
+from app.db_config import configure_engine, engine_options, instrument_engine, read_only_url
 
-# 1. Get DB URL
+# 1. Get DB URLs (DATABASE_READ_URL: optional read replica for read-only queries)
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./gapeva.db")
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
 
-# 2. Connection Args container
-connect_args = {}
-
-# 3. Robust Parsing Logic
-try:
-    # Use SQLAlchemy's built-in tool to parse the URL safely
-    url_obj = make_url(DATABASE_URL)
-
-    # A. Fix Driver for Async (Postgres -> Postgres+Asyncpg)
-    if url_obj.drivername == "postgresql":
-        url_obj = url_obj._replace(drivername="postgresql+asyncpg")
-    
-    # B. Fix SSL Conflict (Asyncpg crashes if 'sslmode' is in the query params)
-    if "sslmode" in url_obj.query:
-        # Copy query params to a mutable dict
-        query_dict = dict(url_obj.query)
-        
-        # If sslmode is on, tell asyncpg to use SSL via connect_args
-        if query_dict.get("sslmode") in ["require", "prefer"]:
-            connect_args = {"ssl": "require"}
-        
-        # Remove the offending parameter from the string
-        del query_dict["sslmode"]
-        
-        # Reconstruct the safe URL
-        url_obj = url_obj._replace(query=query_dict)
-    
-    # Generate the final string
-    DATABASE_URL = url_obj.render_as_string(hide_password=False)
-
-except Exception as e:
-    # Fallback for local SQLite or unexpected errors
-    print(f"⚠️ URL Parsing Warning: {e}")
-
-# 4. Create Engine
-engine = create_async_engine(
-    DATABASE_URL, 
-    echo=True, 
-    connect_args=connect_args
-)
+# 2. Robust Parsing Logic
+def parse_database_url(database_url):
+    """Returns (async URL, connect_args) for create_async_engine."""
+    connect_args = {}
+    try:
+        # Use SQLAlchemy's built-in tool to parse the URL safely
+        url_obj = make_url(database_url)
+
+        # A. Fix Driver for Async (Postgres -> Postgres+Asyncpg)
+        if url_obj.drivername == "postgresql":
+            url_obj = url_obj._replace(drivername="postgresql+asyncpg")
+
+        # B. Fix SSL Conflict (Asyncpg crashes if 'sslmode' is in the query params)
+        if "sslmode" in url_obj.query:
+            # Copy query params to a mutable dict
+            query_dict = dict(url_obj.query)
+
+            # If sslmode is on, tell asyncpg to use SSL via connect_args
+            if query_dict.get("sslmode") in ["require", "prefer"]:
+                connect_args = {"ssl": "require"}
+
+            # Remove the offending parameter from the string
+            del query_dict["sslmode"]
+
+            # Reconstruct the safe URL
+            url_obj = url_obj._replace(query=query_dict)
+
+        # Generate the final string
+        database_url = url_obj.render_as_string(hide_password=False)
+
+    except Exception as e:
+        # Fallback for local SQLite or unexpected errors
+        print(f"⚠️ URL Parsing Warning: {e}")
+    return database_url, connect_args
+
+DATABASE_URL, connect_args = parse_database_url(DATABASE_URL)
+
+# 3. Create Engines (per-dialect pool settings and SQLite PRAGMAs live in db_config)
+engine = configure_engine(create_async_engine(
+    DATABASE_URL,
+    echo=DB_ECHO,
+    **engine_options(DATABASE_URL, connect_args)
+))
+
+# Read-only queries (history, statements) go to the replica if there is one. On SQLite
+# they use the same file opened read-only, so under WAL they never wait on the writer.
+if DATABASE_READ_URL:
+    read_url, read_connect_args = parse_database_url(DATABASE_READ_URL)
+elif read_only_url(DATABASE_URL) != DATABASE_URL:
+    read_url, read_connect_args = read_only_url(DATABASE_URL), {}
+else:
+    read_url = None
+
+if read_url:
+    read_engine = configure_engine(create_async_engine(
+        read_url,
+        echo=DB_ECHO,
+        **engine_options(read_url, read_connect_args)
+    ), read_only=True)
+else:
+    read_engine = engine
+
+instrument_engine(engine, "primary")
+if read_engine is not engine:
+    instrument_engine(read_engine, "read")
 
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+ReadSessionLocal = sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
 Base = declarative_base()
 
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
+
+async def get_read_db():
+    """For endpoints that only read and can tolerate replica lag."""
+    async with ReadSessionLocal() as session:
+        yield session
@@ -0,0 +1,130 @@
+"""
+Per-dialect database tuning, shared by the API (async engines) and the trading bot
+(sync engine in services/pool_service.py).
+
+This module must not import anything from `app`: the bot imports it as
+`backend.app.db_config`.
+
+SQLite (the API and the bot share one file in docker-compose):
+    WAL journal so readers never block the writer (and vice versa), a busy timeout so
+    a locked database is waited on instead of failing, synchronous=NORMAL (durable
+    under WAL except on power loss). Read-only engines open the file with
+    `mode=ro`, so they can never take a write lock.
+Postgres:
+    Bounded pool with pre-ping and recycling, and a configurable asyncpg statement
+    cache (set DB_STATEMENT_CACHE_SIZE=0 behind pgbouncer in transaction mode).
+"""
+import os
+import re
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from .metrics import histogram
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+DB_QUERY_SECONDS = histogram(
+    "db_query_duration_seconds", "SQL statement latency (cursor execute, excluding fetch)",
+    ("engine", "operation", "table"),
+)
+_TABLE_RE = re.compile(r'\b(?:FROM|INTO)\s+["`]?(\w+)', re.IGNORECASE)
+_statement_labels = {}
+
+
+def is_sqlite(url) -> bool:
+    return make_url(str(url)).get_backend_name() == "sqlite"
+
+
+def read_only_url(url) -> str:
+    """SQLite: the same file opened through a read-only URI. Other dialects: unchanged."""
+    url_obj = make_url(str(url))
+    if url_obj.get_backend_name() != "sqlite" or not url_obj.database or url_obj.database == ":memory:":
+        return str(url)
+    if url_obj.database.startswith("file:"):
+        path = url_obj.database
+    else:
+        path = f"file:{url_obj.database}"
+    query = {**url_obj.query, "mode": "ro", "uri": "true"}
+    return url_obj.set(database=path, query=query).render_as_string(hide_password=False)
+
+
+def engine_options(url, connect_args=None, pool_size=None) -> dict:
+    """Keyword arguments for create_engine / create_async_engine, tuned for the URL's dialect."""
+    connect_args = dict(connect_args or {})
+    url_obj = make_url(str(url))
+    if url_obj.get_backend_name() == "sqlite":
+        return {"connect_args": connect_args}
+
+    if url_obj.get_driver_name() == "asyncpg":
+        connect_args.setdefault("statement_cache_size", DB_STATEMENT_CACHE_SIZE)
+    return {
+        "connect_args": connect_args,
+        "pool_size": pool_size or DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_pre_ping": True,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+
+
+def configure_engine(engine, read_only=False):
+    """Installs per-connection settings (SQLite PRAGMAs). Accepts sync or async engines."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if sync_engine.dialect.name != "sqlite":
+        return engine
+
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not read_only:
+            # Persistent, stored in the file: every later connection (the bot's too) sees WAL
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+
+    return engine
+
+
+def _query_labels(engine_name, statement):
+    """(engine, operation, table) for a SQL string, e.g. ('primary', 'SELECT', 'transactions')."""
+    labels = _statement_labels.get((engine_name, statement))
+    if labels is None:
+        words = statement.split(None, 2)
+        operation = words[0].upper() if words else "OTHER"
+        if operation == "UPDATE" and len(words) > 1:
+            table = words[1].strip('"`')
+        else:
+            match = _TABLE_RE.search(statement)
+            table = match.group(1) if match else ""
+        if len(_statement_labels) > 4096:
+            _statement_labels.clear()  # Statements are cached by SQLAlchemy, so this rarely fills
+        labels = _statement_labels[(engine_name, statement)] = DB_QUERY_SECONDS.labels(
+            engine=engine_name, operation=operation, table=table.lower())
+    return labels
+
+
+def instrument_engine(engine, name):
+    """Records every statement's latency in db_query_duration_seconds{engine=name}."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def stop_timer(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        _query_labels(name, statement).observe(time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def drop_timer(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+    return engine
@@ -0,0 +1,160 @@
+"""
+In-process publish/subscribe for the push channel (GET /api/v1/events).
+
+Topics are strings: "user:42" (balances and transactions), "bot" (trading telemetry).
+Every event takes the next number of one process-wide sequence, and each topic keeps its
+last REPLAY_SIZE events. A client that reconnects with the id of the last event it saw
+(SSE's Last-Event-ID) gets exactly what it missed; when that isn't possible (evicted from
+the buffer, a topic nobody was watching, or an id from before a restart: ids carry the
+process epoch) it is told to load a fresh snapshot instead.
+
+Events carry state, not increments (the whole balance, the whole transaction row), so
+seeing one twice or after a snapshot that already includes it is harmless.
+
+Publishing never blocks and never waits on a client: each subscriber has a bounded queue,
+and one that falls behind is reset to a snapshot. An idle subscriber is a queue and a
+parked task, so a worker holds thousands. A topic is only kept while it has subscribers,
+plus LINGER_SECONDS after the last one leaves so quick reconnects can still replay:
+`watched(topic)` lets publishers skip building events nobody will read.
+
+Event loop only (not thread-safe): publish from request handlers and background tasks.
+"""
+import asyncio
+import os
+import time
+import uuid
+from collections import deque
+
+REPLAY_SIZE = int(os.getenv("EVENTS_REPLAY_SIZE", "64"))
+QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+LINGER_SECONDS = float(os.getenv("EVENTS_LINGER_SECONDS", "120"))
+
+RESYNC = object()   # From Subscription.get: the subscriber fell behind and needs a snapshot
+
+
+class Topic:
+    __slots__ = ("events", "floor", "subscribers", "idle_since")
+
+    def __init__(self, floor):
+        self.events = deque(maxlen=REPLAY_SIZE)     # (seq, event, data)
+        self.floor = floor          # Events up to here may be missing: no replay from before it
+        self.subscribers = set()
+        self.idle_since = None
+
+
+class Subscription:
+    def __init__(self, broker, topics):
+        self.broker = broker
+        self.topics = topics
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.lagged = False
+        self.seq = broker.seq       # Everything after this reaches the queue
+
+    def push(self, item):
+        if self.lagged:
+            return
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.lagged = True      # The queue is dropped on the next get(): resync from a snapshot
+
+    async def get(self, timeout):
+        """Next (seq, event, data), RESYNC, or None if nothing arrived within `timeout` seconds."""
+        if self.lagged:
+            self.queue = asyncio.Queue(QUEUE_SIZE)
+            self.lagged = False
+            self.seq = self.broker.seq
+            return RESYNC
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.seq = 0
+        self.topics = {}
+        self.swept_at = time.monotonic()
+
+    def event_id(self, seq) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def parse_id(self, event_id):
+        """The sequence number of one of this process's event ids, else None."""
+        epoch, _, seq = (event_id or "").partition("-")
+        return int(seq) if epoch == self.epoch and seq.isdigit() else None
+
+    def watched(self, topic) -> bool:
+        return topic in self.topics
+
+    def publish(self, topic, event, data):
+        """Fans `event` out to the topic's subscribers. Returns its seq (None if nobody's watching)."""
+        t = self.topics.get(topic)
+        if t is None:
+            return None
+        self.seq += 1
+        if len(t.events) == t.events.maxlen:
+            t.floor = t.events[0][0]    # About to be evicted
+        item = (self.seq, event, data)
+        t.events.append(item)
+        for subscriber in t.subscribers:
+            subscriber.push(item)
+        return self.seq
+
+    def subscribe(self, topics, last_id=None):
+        """
+        Returns (subscription, replay): `replay` is what happened on `topics` after `last_id`,
+        in order, or None if the client must start from a snapshot.
+        """
+        self._sweep()
+        last = self.parse_id(last_id)
+        subscription = Subscription(self, topics)
+        replay = [] if last is not None else None
+        for name in topics:
+            t = self.topics.get(name)
+            if t is None:
+                t = self.topics[name] = Topic(floor=self.seq)
+            t.subscribers.add(subscription)
+            t.idle_since = None
+            if replay is not None:
+                if last < t.floor:
+                    replay = None
+                else:
+                    replay.extend(item for item in t.events if item[0] > last)
+        if replay is not None:
+            replay.sort(key=lambda item: item[0])
+        return subscription, replay
+
+    def unsubscribe(self, subscription):
+        now = time.monotonic()
+        for name in subscription.topics:
+            t = self.topics.get(name)
+            if t is not None:
+                t.subscribers.discard(subscription)
+                if not t.subscribers:
+                    t.idle_since = now
+
+    def _sweep(self):
+        """Drops topics idle for LINGER_SECONDS (at most a few scans per linger period)."""
+        now = time.monotonic()
+        if now - self.swept_at < LINGER_SECONDS / 4:
+            return
+        self.swept_at = now
+        for name in [n for n, t in self.topics.items()
+                     if t.idle_since is not None and now - t.idle_since > LINGER_SECONDS]:
+            del self.topics[name]
+
+    def stats(self):
+        return {
+            "topics": len(self.topics),
+            "subscribers": len(set().union(*(t.subscribers for t in self.topics.values()))),
+            "published": self.seq,
+        }
+
+
+broker = Broker()
@@ -1,16 +1,79 @@
 import os
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth_routes, wallet_routes
-from app.database import engine, Base
+from fastapi.responses import PlainTextResponse
+from app import auth, events, metrics, migrations
+from app.routers import auth_routes, event_routes, wallet_routes
+from app.database import engine, read_engine, AsyncSessionLocal
+from app.services import ledger_service, paystack, push_service, settlement_service
+
+# How often the materialized trading pool is checked against the full SUM
+POOL_RECONCILE_SECONDS = int(os.getenv("POOL_RECONCILE_SECONDS", "3600"))
+# How often deposits still pending (missed webhook, abandoned page) are re-verified
+DEPOSIT_RECONCILE_SECONDS = int(os.getenv("DEPOSIT_RECONCILE_SECONDS", "300"))
+# How often the end-of-day settlement is checked for (and resumed if cut short); 0 disables it
+SETTLEMENT_CHECK_SECONDS = int(os.getenv("SETTLEMENT_CHECK_SECONDS", "900"))
+# Set to false when migrations run as a separate release step (python -m app.migrations)
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "true").lower() == "true"
+
+async def reconcile_pool_periodically():
+    while True:
+        await asyncio.sleep(POOL_RECONCILE_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                await ledger_service.reconcile_trading_pool(db)
+        except Exception as e:
+            print(f"❌ Pool Reconciliation Error: {e}")
+
+async def reconcile_deposits_periodically():
+    while True:
+        await asyncio.sleep(DEPOSIT_RECONCILE_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                await paystack.reconcile_pending_deposits(db)
+        except Exception as e:
+            print(f"❌ Deposit Reconciliation Error: {e}")
+
+async def settle_periodically():
+    while True:
+        await asyncio.sleep(SETTLEMENT_CHECK_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                await settlement_service.settle_pending_days(db)
+        except Exception as e:
+            print(f"❌ Settlement Error: {e}")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Create tables on startup
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # Versioned migrations: a single version lookup when the schema is already current
+    if MIGRATE_ON_STARTUP:
+        await migrations.migrate()
+    async with AsyncSessionLocal() as db:
+        await ledger_service.ensure_trading_pool(db)
+
+    background = [
+        # One pooled, keep-alive HTTP client for every Paystack call (built off the startup path)
+        asyncio.create_task(asyncio.to_thread(paystack.start_client)),
+        asyncio.create_task(reconcile_pool_periodically()),
+        asyncio.create_task(reconcile_deposits_periodically()),
+    ]
+    if SETTLEMENT_CHECK_SECONDS > 0:
+        background.append(asyncio.create_task(settle_periodically()))
+    if push_service.BOT_STATUS_URL:
+        # Bot telemetry for the push channel, polled only while someone is subscribed
+        background.append(asyncio.create_task(push_service.watch_bot_status()))
     yield
+    auth.hash_pool.shutdown()
+    for task in background:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await paystack.close_client()
+    if read_engine is not engine:
+        await read_engine.dispose()
+    await engine.dispose()
 
 app = FastAPI(
     title="Gapeva Protocol API",
@@ -46,12 +109,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # /history pagination
+)
+
+# --- METRICS (Prometheus, scraped from /metrics) ---
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds", "API latency per route", ("method", "route", "status"),
 )
+app.add_middleware(metrics.LatencyMiddleware, histogram=HTTP_REQUEST_SECONDS)
 
 # --- ROUTERS ---
 app.include_router(auth_routes.router, prefix="/api/v1/auth", tags=["Authentication"])
 app.include_router(wallet_routes.router, prefix="/api/v1/wallets", tags=["Wallets"])
+app.include_router(event_routes.router, prefix="/api/v1/events", tags=["Events"])
 
 @app.get("/")
 def read_root():
-    return {"status": "Gapeva Protocol Online", "system": "Nominal"}
+    return {"status": "Gapeva Protocol Online", "system": "Nominal", "user_cache": auth.user_cache.stats(),
+            "events": events.broker.stats()}
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    # Route/DB latency histograms in Prometheus text format (keep this path internal at the proxy)
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,190 @@
+"""
+Versioned schema migrations (replaces create_all + per-index checks on every boot).
+
+Applied versions are recorded in `schema_version`. Startup reads the latest one
+(a single query) and only runs migrations newer than it. A migration is a function
+of a sync connection: append it to MIGRATIONS with the next number and never edit
+it once released.
+
+Run as a release step (then start the API with MIGRATE_ON_STARTUP=false):
+    python -m app.migrations
+"""
+import asyncio
+from sqlalchemy import (Boolean, Column, Date, DateTime, ForeignKey, Index, Integer, MetaData, Numeric,
+                        String, Table, func, insert, inspect, select, text)
+from sqlalchemy.exc import DBAPIError
+from app.database import engine
+
+schema_version = Table(
+    "schema_version", MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+
+# Migrations pin the tables and columns they create: built from the models, an old
+# migration would silently change whenever a model does. Column types only matter for DDL.
+
+def _baseline(conn):
+    """v1: the schema create_all used to build (existing databases already have most of it)."""
+    v1 = MetaData()
+    tables = [
+        Table(
+            "users", v1,
+            Column("id", Integer, primary_key=True, index=True),
+            Column("full_name", String, nullable=False),
+            Column("email", String, unique=True, index=True, nullable=False),
+            Column("phone", String, nullable=False),
+            Column("hashed_password", String, nullable=False),
+            Column("is_active", Boolean),
+            Column("created_at", DateTime(timezone=True), server_default=func.now()),
+        ),
+        Table(
+            "wallets", v1,
+            Column("id", Integer, primary_key=True, index=True),
+            Column("user_id", Integer, ForeignKey("users.id")),
+            Column("wallet_balance", Numeric(18, 2)),
+            Column("trading_balance", Numeric(18, 2)),
+            Column("updated_at", DateTime(timezone=True)),
+        ),
+        Table(
+            "transactions", v1,
+            Column("id", Integer, primary_key=True, index=True),
+            Column("user_id", Integer, ForeignKey("users.id")),
+            Column("reference", String, unique=True, index=True),
+            Column("amount", Numeric(18, 2), nullable=False),
+            Column("status", String),
+            Column("type", String),
+            Column("created_at", DateTime(timezone=True), server_default=func.now()),
+            Index("ix_transactions_user_created_id", "user_id", "created_at", "id"),
+        ),
+        Table(
+            "trading_pool", v1,
+            Column("id", Integer, primary_key=True),
+            Column("total_trading_balance", Numeric(18, 2), nullable=False),
+            Column("updated_at", DateTime(timezone=True), server_default=func.now()),
+            Column("last_reconciled_at", DateTime(timezone=True), nullable=True),
+        ),
+    ]
+    v1.create_all(conn)
+    for table in tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _add_column(conn, table, column):
+    """ALTER TABLE ... ADD COLUMN, unless the table already has it."""
+    if column.name in {c["name"] for c in inspect(conn).get_columns(table)}:
+        return False
+    ddl = f"ALTER TABLE {table} ADD COLUMN {column.name} {column.type.compile(conn.dialect)}"
+    if column.server_default is not None:
+        ddl += f" DEFAULT {column.server_default.arg}"
+    if not column.nullable:
+        ddl += " NOT NULL"
+    conn.execute(text(ddl))
+    return True
+
+
+def _nav_units(conn):
+    """
+    v2: unit-based pool accounting. Existing trading balances become units at a NAV of
+    1.00, so every user's value and the pool total are unchanged on the day it ships.
+    """
+    units = Column("trading_units", Numeric(28, 12), nullable=False, server_default="0")
+    if _add_column(conn, "wallets", units):
+        conn.execute(text("UPDATE wallets SET trading_units = trading_balance"))
+    for column in (
+        Column("total_units", Numeric(28, 12), nullable=False, server_default="0"),
+        Column("nav_per_unit", Numeric(28, 12), nullable=False, server_default="1"),
+        Column("equity", Numeric(18, 2), nullable=False, server_default="0"),
+        Column("nav_updated_at", DateTime(timezone=True), nullable=True),
+    ):
+        _add_column(conn, "trading_pool", column)
+    conn.execute(text(
+        "UPDATE trading_pool SET "
+        "total_units = (SELECT COALESCE(SUM(trading_units), 0) FROM wallets), "
+        "equity = total_trading_balance "
+        "WHERE total_units = 0"
+    ))
+
+
+def _settlement(conn):
+    """
+    v3: end-of-day settlement. Withdrawal fee / settlement time columns, the daily rollup
+    and run tables, and the indexes the batch jobs scan by (wallets.user_id was unindexed).
+    """
+    _add_column(conn, "transactions", Column("fee", Numeric(18, 2), nullable=True))
+    _add_column(conn, "transactions", Column("settled_at", DateTime(timezone=True), nullable=True))
+    v3 = MetaData()
+    Table("users", v3, Column("id", Integer, primary_key=True))     # FK target only
+    Table(
+        "balance_rollups", v3,
+        Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
+        Column("day", Date, primary_key=True),
+        Column("wallet_balance", Numeric(18, 2), nullable=False),
+        Column("trading_balance", Numeric(18, 2), nullable=False),
+        Column("trading_units", Numeric(28, 12), nullable=False),
+        Column("nav_per_unit", Numeric(28, 12), nullable=False),
+        Column("deposits", Numeric(18, 2), nullable=False),
+        Column("withdrawals", Numeric(18, 2), nullable=False),
+        Column("fees", Numeric(18, 2), nullable=False),
+    )
+    Table(
+        "settlement_runs", v3,
+        Column("day", Date, primary_key=True),
+        Column("withdrawals_settled", Integer, nullable=False),
+        Column("fees", Numeric(18, 2), nullable=False),
+        Column("rollup_cursor", Integer, nullable=False),
+        Column("rollup_rows", Integer, nullable=False),
+        Column("started_at", DateTime(timezone=True), server_default=func.now()),
+        Column("finished_at", DateTime(timezone=True), nullable=True),
+    )
+    v3.create_all(conn, tables=[v3.tables["balance_rollups"], v3.tables["settlement_runs"]])
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_wallets_user_id ON wallets (user_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_transactions_type_status_created "
+                      "ON transactions (type, status, created_at)"))
+
+
+MIGRATIONS = [
+    (1, _baseline),
+    (2, _nav_units),
+    (3, _settlement),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn) -> int:
+    """Latest applied version, 0 for a database that has never been migrated."""
+    try:
+        return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+    except DBAPIError:
+        conn.rollback()
+        return 0
+
+
+def _upgrade(conn):
+    if conn.dialect.name == "postgresql":
+        # Several API workers may boot at once: one migrates, the others wait and skip
+        conn.execute(text("SELECT pg_advisory_xact_lock(7245001)"))
+    schema_version.create(conn, checkfirst=True)
+    applied = current_version(conn)
+    for version, migration in MIGRATIONS:
+        if version > applied:
+            migration(conn)
+            conn.execute(insert(schema_version).values(version=version))
+            print(f"🗄️ Schema migrated to v{version} ({migration.__name__.strip('_')})")
+    return max(applied, LATEST_VERSION)
+
+
+async def migrate() -> int:
+    """Brings the database to LATEST_VERSION. Returns the version it's at."""
+    async with engine.connect() as conn:
+        version = await conn.run_sync(current_version)
+    if version >= LATEST_VERSION:
+        return version
+    async with engine.begin() as conn:
+        return await conn.run_sync(_upgrade)
+
+
+if __name__ == "__main__":
+    print(f"Schema version: {asyncio.run(migrate())}")
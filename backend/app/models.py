@@ -1,10 +1,17 @@
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Numeric, Integer
+from sqlalchemy import Column, String, Boolean, Date, DateTime, ForeignKey, Numeric, Integer, Index
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
 
 # We use Numeric(18, 2) for currency to ensure 2 decimal places precision 
 
+# SQLite stores timestamps as text. Bound values must use CURRENT_TIMESTAMP's format
+# (no microseconds) or range/keyset comparisons against server-default rows mis-sort.
+SQLITE_TIMESTAMP = sqlite.DATETIME(
+    storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"
+)
+
 class User(Base):
     __tablename__ = "users"
 
@@ -23,15 +30,20 @@ class Wallet(Base):
     __tablename__ = "wallets"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    # Indexed: every balance move is an UPDATE ... WHERE user_id = ?
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     
     # Dual-Balance Ledger 
     # wallet_balance: Cash held in fiat/stable (Safe) [cite: 54]
     wallet_balance = Column(Numeric(18, 2), default=0.00) 
     
-    # trading_balance: Capital allocated to the AI Agent (Active) [cite: 56]
+    # trading_balance: Capital allocated to the AI Agent (Active) [cite: 56], at cost
     trading_balance = Column(Numeric(18, 2), default=0.00)
 
+    # Pool units held: live trading value = trading_units * trading_pool.nav_per_unit,
+    # PnL = that value - trading_balance. Allocations mint units at the NAV, deallocations burn them.
+    trading_units = Column(Numeric(28, 12), nullable=False, default=0, server_default="0")
+
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     user = relationship("User", back_populates="wallet")
@@ -45,8 +57,74 @@ class Transaction(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     reference = Column(String, unique=True, index=True) # Paystack Reference
     amount = Column(Numeric(18, 2), nullable=False)
-    status = Column(String, default="pending") # pending, success, failed
+    status = Column(String, default="pending") # pending, success, failed (withdrawals: processing, settled)
     type = Column(String, default="deposit")
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True).with_variant(SQLITE_TIMESTAMP, "sqlite"), server_default=func.now())
+    # Withdrawals: the quoted fee, booked by the settlement job (status processing -> settled)
+    fee = Column(Numeric(18, 2), nullable=True)
+    settled_at = Column(DateTime(timezone=True).with_variant(SQLITE_TIMESTAMP, "sqlite"), nullable=True)
 
     user = relationship("User")
+
+    # Keyset pagination for /history: WHERE user_id = ? AND (created_at, id) < (?, ?)
+    # ORDER BY created_at DESC, id DESC reads straight off this index.
+    # Batch jobs find their rows (pending deposits, processing withdrawals) by type and status.
+    __table_args__ = (
+        Index("ix_transactions_user_created_id", "user_id", "created_at", "id"),
+        Index("ix_transactions_type_status_created", "type", "status", "created_at"),
+    )
+
+class TradingPool(Base):
+    """
+    Materialized SUM(wallets.trading_balance) and SUM(wallets.trading_units): a single row
+    (id=1) kept in step with every wallet allocation, so the bot reads the pool with a
+    primary-key lookup.
+
+    Also the fund's unit price: the bot writes its equity snapshot here and
+    nav_per_unit = equity / total_units re-prices every user's units in one row write.
+    Between snapshots, allocations add to `equity` at the current NAV, so they never move it.
+    """
+    __tablename__ = "trading_pool"
+
+    id = Column(Integer, primary_key=True)
+    total_trading_balance = Column(Numeric(18, 2), nullable=False, default=0.00)
+    total_units = Column(Numeric(28, 12), nullable=False, default=0, server_default="0")
+    nav_per_unit = Column(Numeric(28, 12), nullable=False, default=1, server_default="1")
+    equity = Column(Numeric(18, 2), nullable=False, default=0, server_default="0")
+    nav_updated_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    last_reconciled_at = Column(DateTime(timezone=True), nullable=True)
+
+class BalanceRollup(Base):
+    """
+    One row per user per day, written in bulk by the settlement job: balances as of the
+    run (a snapshot shortly after the day closes, not rebuilt to midnight) and the day's
+    flows, so dashboard charts read precomputed rows instead of replaying the transaction history.
+    """
+    __tablename__ = "balance_rollups"
+
+    # (user_id, day) primary key: a user's chart is one index range scan
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    wallet_balance = Column(Numeric(18, 2), nullable=False)
+    trading_balance = Column(Numeric(18, 2), nullable=False)    # At cost
+    trading_units = Column(Numeric(28, 12), nullable=False)
+    nav_per_unit = Column(Numeric(28, 12), nullable=False)      # Value = units x NAV, as in /wallets
+    deposits = Column(Numeric(18, 2), nullable=False, default=0)
+    withdrawals = Column(Numeric(18, 2), nullable=False, default=0)
+    fees = Column(Numeric(18, 2), nullable=False, default=0)
+
+class SettlementRun(Base):
+    """
+    Progress of the end-of-day settlement for `day`. Updated in the same transaction as
+    each chunk it records, so an interrupted run resumes exactly where it stopped.
+    """
+    __tablename__ = "settlement_runs"
+
+    day = Column(Date, primary_key=True)
+    withdrawals_settled = Column(Integer, nullable=False, default=0)
+    fees = Column(Numeric(18, 2), nullable=False, default=0)
+    rollup_cursor = Column(Integer, nullable=False, default=0)  # Last wallets.user_id rolled up
+    rollup_rows = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
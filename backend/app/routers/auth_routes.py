@@ -14,7 +14,7 @@ async def signup(user: schemas.UserCreate, db: AsyncSession = Depends(database.g
         raise HTTPException(status_code=400, detail="Email already registered")
 
     # 2. Create User
-    hashed_password = auth.get_password_hash(user.password)
+    hashed_password = await auth.hash_password_async(user.password)
     new_user = models.User(
         email=user.email,
         full_name=user.full_name,
@@ -51,11 +51,17 @@ async def signup(user: schemas.UserCreate, db: AsyncSession = Depends(database.g
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(database.get_db)):
     result = await db.execute(select(models.User).where(models.User.email == form_data.username))
     user = result.scalars().first()
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+    valid, new_hash = (await auth.verify_and_update_password(form_data.password, user.hashed_password)
+                       if user else (False, None))
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Cost parameters changed since this hash was made: upgrade it transparently
+        user.hashed_password = new_hash
+        await db.commit()
     access_token = auth.create_access_token(data={"sub": user.email})
     return {"access_token": access_token, "token_type": "bearer"}
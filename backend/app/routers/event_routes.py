@@ -0,0 +1,24 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Header
+from fastapi.responses import StreamingResponse
+from app import auth, models
+from app.services import push_service
+
+router = APIRouter(tags=["Events"])
+
+@router.get("")
+async def stream_events(
+    last_event_id: Optional[str] = Header(None),
+    current_user: models.User = Depends(auth.get_stream_user)
+):
+    """
+    Live dashboard updates as server-sent events: a snapshot, then balance, transaction
+    and bot events (see push_service). EventSource reconnects by itself and sends the
+    Last-Event-ID it saw, so a dropped connection resumes with just the events it missed.
+    """
+    return StreamingResponse(
+        push_service.stream(current_user.id, last_event_id),
+        media_type="text/event-stream",
+        # No caching, and no buffering at nginx-style proxies: events must go out as they happen
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
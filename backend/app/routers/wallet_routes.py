@@ -1,19 +1,18 @@
-import httpx 
+import json
 import os
-import time
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+import uuid
+from typing import Literal, Optional
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from decimal import Decimal
 from app import auth, models, database
+from app.services import ledger_service, history_service, paystack, push_service, settlement_service
 
 router = APIRouter(tags=["Wallet"])
 
-# --- SECURITY: Load Paystack Key from Environment Variables ---
-# This ensures your real money keys are never written in the code.
-PAYSTACK_SECRET_KEY = os.getenv("PAYSTACK_SECRET_KEY")
-
 class DepositRequest(BaseModel):
     amount: Decimal = Field(..., gt=0, decimal_places=2)
 
@@ -23,6 +22,35 @@ class PaymentVerification(BaseModel):
 class WithdrawalRequest(BaseModel):
     amount: Decimal = Field(..., gt=0, decimal_places=2)
 
+class AllocationRequest(BaseModel):
+    amount: Decimal = Field(..., gt=0, decimal_places=2)
+
+@router.get("/")
+async def get_wallet(
+    db: AsyncSession = Depends(database.get_read_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """
+    Balances and the live trading position: pool units x NAV per unit (updated from the
+    bot's equity), the cost of what's allocated and the PnL. One query, however many users.
+    """
+    position = await ledger_service.get_position(db, current_user.id)
+    if position is None:
+        raise HTTPException(status_code=404, detail="Wallet not found")
+    return position
+
+@router.get("/daily")
+async def get_daily_balances(
+    days: int = Query(30, ge=1, le=366),
+    db: AsyncSession = Depends(database.get_read_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """
+    Daily balance series for the dashboard charts, oldest first: one precomputed row per
+    settled day (written by the end-of-day settlement job), not a replay of the history.
+    """
+    return await settlement_service.daily_balances(db, current_user.id, days)
+
 @router.post("/validate-deposit")
 async def validate_deposit_intent(
     deposit: DepositRequest, 
@@ -45,67 +73,89 @@ async def validate_deposit_intent(
 @router.post("/verify-deposit")
 async def verify_payment(
     payment: PaymentVerification, 
+    response: Response,
     db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
     """
-    1. Verify transaction with Paystack API
-    2. Update User's Wallet Balance
-    3. Log the Transaction
+    1. Register the reference as a pending deposit
+    2. Verify it with Paystack (one attempt over the shared client)
+    3. Credit the wallet if confirmed
+
+    If Paystack can't confirm it yet, the deposit stays pending (202) and is credited by
+    the webhook or the reconciliation job instead. Crediting is idempotent across all three.
     """
     # Safety Check: Ensure the server has the key before proceeding
-    if not PAYSTACK_SECRET_KEY:
+    if not paystack.PAYSTACK_SECRET_KEY:
         raise HTTPException(status_code=500, detail="Server misconfiguration: Payment key missing in environment variables.")
 
-    # A. Call Paystack API to verify
-    headers = {"Authorization": f"Bearer {PAYSTACK_SECRET_KEY}"}
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(f"https://api.paystack.co/transaction/verify/{payment.reference}", headers=headers)
-    
-    if resp.status_code != 200:
-        raise HTTPException(status_code=400, detail="Verification failed with payment provider")
-    
-    data = resp.json().get('data', {})
-    
-    # B. Security Checks
-    if data.get('status') != 'success':
+    # A. Double Spending Protection: a reference belongs to one user and is credited once
+    txn = await ledger_service.register_deposit(db, current_user.id, payment.reference)
+    if txn.user_id != current_user.id or txn.type != "deposit":
+        raise HTTPException(status_code=400, detail="Transaction already processed")
+    if txn.status == "success":
+        raise HTTPException(status_code=400, detail="Transaction already processed")
+    if txn.status == "failed":
         raise HTTPException(status_code=400, detail="Transaction was not successful")
-        
-    # Paystack returns amount in kobo (cents). Convert to dollars/main currency.
-    # We assume 1 Unit = 1 USD for simplicity.
-    amount_paid = Decimal(str(data['amount'])) / 100
-    
-    # C. Check if reference already used (Double Spending Protection)
-    existing_txn = await db.execute(select(models.Transaction).where(models.Transaction.reference == payment.reference))
-    if existing_txn.scalars().first():
+
+    # B. Call Paystack API to verify
+    try:
+        data = await paystack.verify_transaction(payment.reference)
+    except paystack.UnknownReference:
+        # Not a payment at all: don't keep a pending row for it
+        await ledger_service.discard_deposit(db, payment.reference)
+        await db.commit()
+        raise HTTPException(status_code=400, detail="Unknown transaction reference")
+    except paystack.PaystackError as e:
+        print(f"⚠️ Deposit {payment.reference} left pending: {e}")
+        response.status_code = 202
+        return {"status": "pending", "message": "Payment received. Your wallet will be credited once it is confirmed."}
+
+    # C. Execute Ledger Update (Atomic Transaction), once the payer is confirmed to be this account
+    status, new_balance = await paystack.settle_from_paystack(db, current_user.id, {**data, "reference": payment.reference})
+    await db.commit()
+    await push_service.publish_wallet(db, current_user.id, payment.reference)
+
+    if status == "rejected":
+        raise HTTPException(status_code=400, detail="Transaction does not belong to this account")
+    if status == "failed":
+        raise HTTPException(status_code=400, detail="Transaction was not successful")
+    if status == "pending":
+        response.status_code = 202
+        return {"status": "pending", "message": "Payment received. Your wallet will be credited once it is confirmed."}
+    if new_balance is None:
+        # Credited concurrently by the webhook or the reconciler
         raise HTTPException(status_code=400, detail="Transaction already processed")
 
-    # D. Execute Ledger Update (Atomic Transaction)
-    # 1. Create Transaction Record
-    new_txn = models.Transaction(
-        user_id=current_user.id,
-        reference=payment.reference,
-        amount=amount_paid,
-        status="success",
-        type="deposit"
-    )
-    db.add(new_txn)
-    
-    # 2. Credit the Wallet
-    wallet_result = await db.execute(select(models.Wallet).where(models.Wallet.user_id == current_user.id))
-    wallet = wallet_result.scalars().first()
-    
-    # Ensure wallet exists (defensive coding)
-    if not wallet:
-        # Should technically never happen if signup flow works, but safe to check
-        wallet = models.Wallet(user_id=current_user.id, wallet_balance=0.00, trading_balance=0.00)
-        db.add(wallet)
+    return {"status": "success", "new_balance": new_balance}
 
-    wallet.wallet_balance += amount_paid
-    
+@router.post("/paystack/webhook", include_in_schema=False)
+async def paystack_webhook(request: Request, db: AsyncSession = Depends(database.get_db)):
+    """
+    Paystack event callback. Authenticated by the HMAC-SHA512 signature of the raw body.
+    charge.success credits the deposit (idempotently, so retries and duplicates are harmless).
+    """
+    body = await request.body()
+    if not paystack.valid_signature(body, request.headers.get("x-paystack-signature")):
+        raise HTTPException(status_code=401, detail="Invalid signature")
+
+    event = json.loads(body)
+    data = event.get("data") or {}
+    reference = data.get("reference")
+    if event.get("event") != "charge.success" or not reference:
+        return {"status": "ignored"}
+
+    # Owner: the paying customer's account, not whoever registered the reference
+    email = paystack.customer_email(data)
+    user_id = await db.scalar(select(models.User.id).where(models.User.email == email)) if email else None
+    if user_id is None:
+        print(f"⚠️ Webhook for unknown customer (reference {reference})")
+        return {"status": "ignored"}
+
+    await paystack.settle_from_paystack(db, user_id, data)
     await db.commit()
-    
-    return {"status": "success", "new_balance": wallet.wallet_balance}
+    await push_service.publish_wallet(db, user_id, reference)
+    return {"status": "ok"}
 
 @router.post("/withdraw")
 async def request_withdrawal(
@@ -116,32 +166,19 @@ async def request_withdrawal(
     """
     Handles withdrawals with the 35% Profit-Share Fee Logic.
     """
-    # 1. Fetch Wallet
-    result = await db.execute(select(models.Wallet).where(models.Wallet.user_id == current_user.id))
-    wallet = result.scalars().first()
-
-    if not wallet or wallet.wallet_balance < req.amount:
-        raise HTTPException(status_code=400, detail="Insufficient funds in Wallet Balance")
-
-    # 2. Calculate Fee (35% on withdrawal amount as per current logic)
-    FEE_PERCENT = Decimal("0.35")
-    fee_amount = req.amount * FEE_PERCENT
+    # 1. Calculate Fee (35% on withdrawal amount as per current logic, in cents: the
+    #    same amount is stored on the transaction and booked at settlement)
+    fee_amount = ledger_service.withdrawal_fee(req.amount)
     net_amount = req.amount - fee_amount
 
-    # 3. Deduct from Wallet
-    wallet.wallet_balance -= req.amount
-    
-    # 4. Record Transaction
-    txn = models.Transaction(
-        user_id=current_user.id,
-        reference=f"wd_{current_user.id}_{int(time.time())}", # Generate internal ref
-        amount=req.amount,
-        status="processing", # Needs manual/auto payout
-        type="withdrawal"
-    )
-    db.add(txn)
+    # 2. Deduct from Wallet (guarded: fails instead of overdrawing) + Record Transaction
+    reference = f"wd_{current_user.id}_{uuid.uuid4().hex[:16]}" # Generate internal ref
+    balance = await ledger_service.withdraw(db, current_user.id, req.amount, reference)
+    if balance is None:
+        raise HTTPException(status_code=400, detail="Insufficient funds in Wallet Balance")
 
     await db.commit()
+    await push_service.publish_wallet(db, current_user.id, reference)
 
     return {
         "status": "success", 
@@ -151,18 +188,97 @@ async def request_withdrawal(
         "message": "Withdrawal processing. Funds will arrive in 24h."
     }
 
+@router.post("/allocate")
+async def allocate_to_trading(
+    req: AllocationRequest,
+    db: AsyncSession = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """
+    Moves funds from the Wallet Balance (Safe) to the Trading Balance (Active): buys
+    pool units at the current NAV. The pool totals are updated in the same transaction.
+    """
+    balances = await ledger_service.move_to_trading(db, current_user.id, req.amount)
+    if balances is None:
+        raise HTTPException(status_code=400, detail="Insufficient funds in Wallet Balance")
+
+    await db.commit()
+    await push_service.publish_wallet(db, current_user.id)
+
+    wallet_balance, trading_value = balances
+    return {"status": "success", "wallet_balance": wallet_balance, "trading_value": trading_value}
+
+@router.post("/deallocate")
+async def deallocate_from_trading(
+    req: AllocationRequest,
+    db: AsyncSession = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """
+    Moves funds from the Trading Balance back to the Wallet Balance: redeems pool units
+    at the current NAV.
+    """
+    balances = await ledger_service.move_to_trading(db, current_user.id, -req.amount)
+    if balances is None:
+        raise HTTPException(status_code=400, detail="Insufficient funds in Trading Balance")
+
+    await db.commit()
+    await push_service.publish_wallet(db, current_user.id)
+
+    wallet_balance, trading_value = balances
+    return {"status": "success", "wallet_balance": wallet_balance, "trading_value": trading_value}
+
 @router.get("/history")
 async def get_transaction_history(
-    db: AsyncSession = Depends(database.get_db),
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    type: Optional[str] = None,
+    status: Optional[str] = None,
+    format: Literal["json", "ndjson", "csv"] = "json",
+    db: AsyncSession = Depends(database.get_read_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
     """
-    Fetch deposit and withdrawal history for the dashboard.
+    Fetch deposit and withdrawal history for the dashboard, newest first.
+
+    json: one page of `limit` rows (a plain list); the cursor for the next page is in
+          the X-Next-Cursor header (absent on the last page).
+    ndjson / csv: the full statement (from `cursor`, if given), streamed row by row.
+    """
+    try:
+        if cursor is not None:
+            history_service.decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if format != "json":
+        stmt = history_service.history_query(current_user.id, type, status, cursor)
+        media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+        return StreamingResponse(
+            stream_history(stmt, format),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="statement.{format}"'},
+        )
+
+    stmt = history_service.history_query(current_user.id, type, status, cursor, limit + 1)
+    rows = (await db.execute(stmt)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = history_service.encode_cursor(rows[-1])
+    return [history_service.as_dict(row) for row in rows]
+
+async def stream_history(stmt, format):
+    """
+    Streams a statement without loading it: rows come off a server-side cursor in
+    batches. Uses its own session, since the request's is closed once streaming starts.
     """
-    result = await db.execute(
-        select(models.Transaction)
-        .where(models.Transaction.user_id == current_user.id)
-        .order_by(models.Transaction.created_at.desc())
-    )
-    txns = result.scalars().all()
-    return txns
+    if format == "csv":
+        yield history_service.csv_header()
+    async with database.ReadSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=500))
+        async for row in result:
+            if format == "csv":
+                yield history_service.csv_line(row)
+            else:
+                yield history_service.ndjson_line(row)
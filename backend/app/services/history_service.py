@@ -0,0 +1,74 @@
+import base64
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import literal, select, tuple_
+from app import models
+
+# Columns returned by /history (same fields the ORM objects used to serialize to)
+HISTORY_COLUMNS = (
+    models.Transaction.id,
+    models.Transaction.user_id,
+    models.Transaction.reference,
+    models.Transaction.amount,
+    models.Transaction.status,
+    models.Transaction.type,
+    models.Transaction.created_at,
+)
+FIELDS = [c.key for c in HISTORY_COLUMNS]
+
+
+def encode_cursor(row) -> str:
+    """Opaque keyset cursor: the (created_at, id) of the last row on the page."""
+    raw = f"{row.created_at.isoformat()}|{row.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor. Raises ValueError on anything malformed."""
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    created_at, row_id = raw.rsplit("|", 1)
+    return datetime.fromisoformat(created_at), int(row_id)
+
+
+def history_query(user_id: int, type: Optional[str] = None, status: Optional[str] = None,
+                  cursor: Optional[str] = None, limit: Optional[int] = None):
+    """
+    Newest-first history for one user, served by ix_transactions_user_created_id.
+    Keyset pagination: each page starts strictly after the previous page's last
+    (created_at, id), so deep pages cost the same as the first one.
+    """
+    T = models.Transaction
+    stmt = select(*HISTORY_COLUMNS).where(T.user_id == user_id)
+    if type is not None:
+        stmt = stmt.where(T.type == type)
+    if status is not None:
+        stmt = stmt.where(T.status == status)
+    if cursor is not None:
+        created_at, row_id = decode_cursor(cursor)
+        # Bind with the column's own type (tuple_ would fall back to a generic DateTime)
+        stmt = stmt.where(tuple_(T.created_at, T.id) < tuple_(literal(created_at, T.created_at.type), row_id))
+    stmt = stmt.order_by(T.created_at.desc(), T.id.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def as_dict(row) -> dict:
+    return dict(row._mapping)
+
+
+def ndjson_line(row) -> str:
+    return json.dumps(as_dict(row), default=str) + "\n"
+
+
+def csv_header() -> str:
+    return csv_line(FIELDS)
+
+
+def csv_line(values) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
@@ -0,0 +1,276 @@
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP, ROUND_UP
+from sqlalchemy import delete, select, update, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models
+
+POOL_ID = 1
+CENT = Decimal("0.01")
+UNIT = Decimal("0.000000000001")    # trading_units / nav_per_unit scale: Numeric(28, 12)
+WITHDRAWAL_FEE_RATE = Decimal("0.35")   # Profit-share fee, on the amount withdrawn
+
+
+async def adjust_trading_pool(db: AsyncSession, delta: Decimal, units: Decimal = Decimal("0"),
+                              assets: Decimal = None):
+    """
+    Adds `delta` to the materialized pool total, `units` to the units outstanding and
+    `assets` (default: `delta`) to the pool's equity, which keeps the NAV where it was.
+    Must be called inside the same transaction as the wallet change it mirrors.
+    The increments happen in SQL, so concurrent requests never overwrite each other.
+    """
+    P = models.TradingPool
+    await db.execute(
+        update(P)
+        .where(P.id == POOL_ID)
+        .values(total_trading_balance=P.total_trading_balance + delta,
+                total_units=P.total_units + units,
+                equity=P.equity + (delta if assets is None else assets))
+    )
+
+
+async def lock_trading_pool(db: AsyncSession):
+    """
+    Write-locks the pool row (a no-op UPDATE: a row lock on Postgres, the write lock on
+    SQLite) and returns its NAV per unit, which then can't change until the caller commits.
+    """
+    P = models.TradingPool
+    nav = await db.scalar(
+        update(P).where(P.id == POOL_ID).values(nav_per_unit=P.nav_per_unit).returning(P.nav_per_unit)
+    )
+    return Decimal(str(nav)) if nav is not None else None
+
+
+async def ensure_trading_pool(db: AsyncSession):
+    """Creates the pool row (seeded from the full SUMs, at a NAV of 1.00) if it doesn't exist yet."""
+    pool = await db.get(models.TradingPool, POOL_ID)
+    if pool is None:
+        W = models.Wallet
+        total, units = (await db.execute(
+            select(func.coalesce(func.sum(W.trading_balance), 0), func.coalesce(func.sum(W.trading_units), 0))
+        )).one()
+        db.add(models.TradingPool(id=POOL_ID, total_trading_balance=total, total_units=units,
+                                  nav_per_unit=Decimal("1"), equity=units, last_reconciled_at=func.now()))
+        await db.commit()
+
+
+async def reconcile_trading_pool(db: AsyncSession):
+    """
+    Compares the materialized totals (balance and units) with the full SUMs and repairs
+    any drift. The pool row is locked first: every writer also updates that row, so the
+    SUMs can't race with an in-flight allocation. Returns (stored, actual) balance totals.
+    """
+    result = await db.execute(
+        select(models.TradingPool).where(models.TradingPool.id == POOL_ID).with_for_update()
+    )
+    pool = result.scalars().first()
+    W = models.Wallet
+    actual, units = (await db.execute(
+        select(func.coalesce(func.sum(W.trading_balance), 0), func.coalesce(func.sum(W.trading_units), 0))
+    )).one()
+    actual, units = Decimal(str(actual)), Decimal(str(units))
+
+    if pool is None:
+        db.add(models.TradingPool(id=POOL_ID, total_trading_balance=actual, total_units=units,
+                                  nav_per_unit=Decimal("1"), equity=units, last_reconciled_at=func.now()))
+        await db.commit()
+        return None, actual
+
+    stored = Decimal(str(pool.total_trading_balance))
+    if stored != actual:
+        print(f"⚠️ Pool Drift: stored ${stored:,.2f} vs actual ${actual:,.2f}. Repairing.")
+        pool.total_trading_balance = actual
+    stored_units = Decimal(str(pool.total_units)).quantize(UNIT)
+    if stored_units != units.quantize(UNIT):
+        print(f"⚠️ Unit Drift: stored {stored_units} vs actual {units.quantize(UNIT)}. Repairing.")
+        pool.total_units = units
+    pool.last_reconciled_at = func.now()
+    await db.commit()
+    return stored, actual
+
+
+async def register_deposit(db: AsyncSession, user_id: int, reference: str):
+    """
+    Records a deposit reference as pending (amount unknown until Paystack confirms it).
+    The unique reference constraint does the duplicate check: the insert either succeeds
+    or the existing row is returned.
+    """
+    txn = models.Transaction(user_id=user_id, reference=reference, amount=Decimal("0.00"),
+                             status="pending", type="deposit")
+    db.add(txn)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return await db.scalar(select(models.Transaction).where(models.Transaction.reference == reference))
+    return txn
+
+
+async def settle_deposit(db: AsyncSession, user_id: int, reference: str, amount: Decimal):
+    """
+    Credits a confirmed deposit exactly once, whichever of the user's request, the webhook
+    or the reconciler gets here first. The pending -> success flip is a guarded UPDATE
+    (and a deposit nobody registered is inserted, guarded by the unique reference), so
+    only one caller can win it. Returns the new wallet balance if this call credited
+    the wallet, else None. The caller commits.
+    """
+    T = models.Transaction
+    flipped = await db.scalar(
+        update(T)
+        .where(T.reference == reference, T.user_id == user_id, T.status == "pending")
+        .values(status="success", amount=amount)
+        .returning(T.id)
+    )
+    if flipped is None:
+        try:
+            async with db.begin_nested():
+                db.add(T(user_id=user_id, reference=reference, amount=amount, status="success", type="deposit"))
+        except IntegrityError:
+            return None  # Already settled (or failed, or someone else's reference)
+    return await credit_wallet(db, user_id, amount)
+
+
+async def fail_deposit(db: AsyncSession, reference: str):
+    """Marks a still-pending deposit as failed. The caller commits."""
+    await db.execute(
+        update(models.Transaction)
+        .where(models.Transaction.reference == reference, models.Transaction.status == "pending")
+        .values(status="failed")
+    )
+
+
+async def discard_deposit(db: AsyncSession, reference: str, keep_user_id: int = None):
+    """
+    Deletes a still-pending registration of `reference` (anyone's but `keep_user_id`'s):
+    one Paystack doesn't know, or another customer's payment. Deleted rather than failed,
+    so the reference stays free for its real owner. The caller commits.
+    """
+    T = models.Transaction
+    query = delete(T).where(T.reference == reference, T.type == "deposit", T.status == "pending")
+    if keep_user_id is not None:
+        query = query.where(T.user_id != keep_user_id)
+    await db.execute(query)
+
+
+# --- WALLET MOVES ---
+# Each balance change is one UPDATE whose WHERE clause carries the funds check, so two
+# concurrent requests can never both spend the same balance or overwrite each other.
+# They return the new balances (RETURNING), or None when the guard rejected the move.
+# The caller commits.
+
+async def credit_wallet(db: AsyncSession, user_id: int, amount: Decimal):
+    W = models.Wallet
+    balance = await db.scalar(
+        update(W).where(W.user_id == user_id)
+        .values(wallet_balance=W.wallet_balance + amount)
+        .returning(W.wallet_balance)
+    )
+    if balance is None:
+        # Should technically never happen if signup flow works, but safe to check
+        db.add(W(user_id=user_id, wallet_balance=amount, trading_balance=Decimal("0.00")))
+        balance = amount
+    return balance
+
+
+async def debit_wallet(db: AsyncSession, user_id: int, amount: Decimal):
+    W = models.Wallet
+    return await db.scalar(
+        update(W).where(W.user_id == user_id, W.wallet_balance >= amount)
+        .values(wallet_balance=W.wallet_balance - amount)
+        .returning(W.wallet_balance)
+    )
+
+
+async def move_to_trading(db: AsyncSession, user_id: int, amount: Decimal):
+    """
+    Wallet -> trading pool at the current NAV: mints amount / NAV units (a negative amount
+    moves value back and burns units, guarded on the units held). trading_balance tracks
+    the cost: a deallocation removes the burned units' share of it (average cost).
+    The pool row is locked first, so the NAV can't move mid-transaction, and its totals
+    move in the same transaction. Returns (wallet, trading value) or None.
+    """
+    W = models.Wallet
+    nav = await lock_trading_pool(db)
+    if nav is None:
+        return None
+
+    if amount > 0:
+        units = (amount / nav).quantize(UNIT, ROUND_DOWN)   # Rounding favours the pool
+        cost = amount
+        guard = W.wallet_balance >= amount
+    else:
+        # Only this transaction can change the trading columns now (they move under the pool lock)
+        held = (await db.execute(
+            select(W.trading_balance, W.trading_units).where(W.user_id == user_id)
+        )).first()
+        if held is None or not held.trading_units:
+            return None
+        held_units, held_cost = Decimal(str(held.trading_units)), Decimal(str(held.trading_balance))
+        burned = (-amount / nav).quantize(UNIT, ROUND_UP)
+        if burned > held_units and -amount > trading_value(held_units, nav):
+            return None
+        if burned >= held_units or trading_value(held_units - burned, nav) == 0:
+            burned = held_units  # Cashing out the whole (cent-rounded) value burns the dust too
+        units = -burned
+        cost = -held_cost if burned == held_units else -(held_cost * burned / held_units).quantize(CENT)
+        guard = W.trading_units >= burned
+
+    row = (await db.execute(
+        update(W).where(W.user_id == user_id, guard)
+        .values(wallet_balance=W.wallet_balance - amount,
+                trading_balance=W.trading_balance + cost,
+                trading_units=W.trading_units + units)
+        .returning(W.wallet_balance, W.trading_units)
+    )).first()
+    if row is None:
+        return None
+    await adjust_trading_pool(db, cost, units, assets=amount)
+    return row.wallet_balance, trading_value(row.trading_units, nav)
+
+
+def trading_value(units, nav) -> Decimal:
+    """A holding's value at `nav`, in cents (rounded down: never show more than a withdrawal pays)."""
+    return (Decimal(str(units)) * Decimal(str(nav))).quantize(CENT, ROUND_DOWN)
+
+
+async def get_position(db: AsyncSession, user_id: int):
+    """
+    The user's pool position in one query (the wallet row joined to the pool row):
+    units, NAV, live value, cost and PnL. None if the user has no wallet.
+    """
+    W, P = models.Wallet, models.TradingPool
+    row = (await db.execute(
+        select(W.wallet_balance, W.trading_balance, W.trading_units, P.nav_per_unit, P.nav_updated_at)
+        .join(P, P.id == POOL_ID)
+        .where(W.user_id == user_id)
+    )).first()
+    if row is None:
+        return None
+    value = trading_value(row.trading_units, row.nav_per_unit)
+    cost = Decimal(str(row.trading_balance))
+    return {
+        "wallet_balance": row.wallet_balance,
+        "trading_units": Decimal(str(row.trading_units)).quantize(UNIT),
+        "nav_per_unit": Decimal(str(row.nav_per_unit)).quantize(UNIT),
+        "nav_updated_at": row.nav_updated_at,
+        "trading_value": value,
+        "cost_basis": cost,
+        "pnl": value - cost,
+    }
+
+
+def withdrawal_fee(amount: Decimal) -> Decimal:
+    """The fee quoted on a withdrawal, in cents."""
+    return (amount * WITHDRAWAL_FEE_RATE).quantize(CENT, ROUND_HALF_UP)
+
+
+async def withdraw(db: AsyncSession, user_id: int, amount: Decimal, reference: str):
+    """
+    Debits the wallet and records the payout request with its quoted fee (booked when the
+    settlement job settles it). Returns the new balance or None.
+    """
+    balance = await debit_wallet(db, user_id, amount)
+    if balance is None:
+        return None
+    db.add(models.Transaction(user_id=user_id, reference=reference, amount=amount, fee=withdrawal_fee(amount),
+                              status="processing", type="withdrawal"))  # Needs manual/auto payout
+    return balance
@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import hmac
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+import httpx
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models
+from app.services import ledger_service, push_service
+
+# --- SECURITY: Load Paystack Key from Environment Variables ---
+PAYSTACK_SECRET_KEY = os.getenv("PAYSTACK_SECRET_KEY")
+PAYSTACK_BASE_URL = "https://api.paystack.co"
+
+# Pending deposits younger than this are left to the webhook; older than the max age they're failed
+RECONCILE_MIN_AGE = timedelta(seconds=int(os.getenv("DEPOSIT_RECONCILE_MIN_AGE", "60")))
+RECONCILE_MAX_AGE = timedelta(hours=int(os.getenv("DEPOSIT_PENDING_MAX_HOURS", "24")))
+RECONCILE_BATCH = int(os.getenv("DEPOSIT_RECONCILE_BATCH", "50"))
+RECONCILE_CONCURRENCY = 8
+
+_client = None
+_client_lock = threading.Lock()   # start_client runs in a worker thread and on first use
+
+
+class PaystackError(Exception):
+    pass
+
+
+class UnknownReference(PaystackError):
+    """Paystack has no transaction with this reference (404)."""
+
+
+def start_client():
+    """
+    Creates the app-wide pooled client. Loading the CA bundle takes ~0.1s, so the lifespan
+    hook does this in a background thread instead of delaying startup. Locked, so a
+    request that needs the client before that thread is done doesn't build a second one.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.AsyncClient(
+                base_url=PAYSTACK_BASE_URL,
+                headers={"Authorization": f"Bearer {PAYSTACK_SECRET_KEY}"},
+                timeout=httpx.Timeout(10.0, connect=5.0),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+            )
+        return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client():
+    return _client if _client is not None else start_client()
+
+
+async def verify_transaction(reference: str) -> dict:
+    """
+    Paystack's view of one transaction (the `data` object). Raises UnknownReference if
+    Paystack has never seen it, PaystackError if it can't tell us right now.
+    """
+    try:
+        resp = await get_client().get(f"/transaction/verify/{reference}")
+    except httpx.HTTPError as e:
+        raise PaystackError(f"Payment provider unreachable: {e}") from e
+    if resp.status_code == 404:
+        raise UnknownReference(f"Unknown transaction reference: {reference}")
+    if resp.status_code != 200:
+        raise PaystackError(f"Verification failed with payment provider ({resp.status_code})")
+    return resp.json().get("data", {})
+
+
+def amount_paid(data: dict) -> Decimal:
+    # Paystack returns amount in kobo (cents). Convert to dollars/main currency.
+    # We assume 1 Unit = 1 USD for simplicity.
+    return Decimal(str(data["amount"])) / 100
+
+
+def valid_signature(body: bytes, signature: str) -> bool:
+    """Webhook authenticity: x-paystack-signature is HMAC-SHA512(body) keyed with the secret key."""
+    if not PAYSTACK_SECRET_KEY or not signature:
+        return False
+    expected = hmac.new(PAYSTACK_SECRET_KEY.encode(), body, hashlib.sha512).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def customer_email(data: dict):
+    return (data.get("customer") or {}).get("email")
+
+
+async def settle_from_paystack(db: AsyncSession, user_id: int, data: dict):
+    """
+    Applies Paystack's verdict to a deposit. Returns (status, new wallet balance):
+    status is 'success' (credited now or earlier), 'failed', 'pending' (not final yet) or
+    'rejected' (paid by another customer: the user's pending registration is dropped; or
+    no customer email to check: the deposit is failed once Paystack's verdict is final);
+    the balance is only set when this call credited the wallet.
+
+    The user's request, the webhook and the reconciler all come through here, so none of
+    them can skip the ownership check: the paying customer's email must be the user's.
+    """
+    reference = data.get("reference")
+    status = data.get("status")
+    email = customer_email(data)
+    if not email:
+        # Ownership can't be proven, so it's never credited; a final verdict won't change
+        if status in ("success", "failed", "reversed"):
+            await ledger_service.fail_deposit(db, reference)
+            return "rejected", None
+        return "pending", None
+    owner_email = await db.scalar(select(models.User.email).where(models.User.id == user_id))
+    if owner_email is None or owner_email.lower() != email.lower():
+        await ledger_service.discard_deposit(db, reference)
+        return "rejected", None
+    if status == "success":
+        # Anyone else's registration of the reference isn't theirs: free it for the owner
+        await ledger_service.discard_deposit(db, reference, keep_user_id=user_id)
+        return "success", await ledger_service.settle_deposit(db, user_id, reference, amount_paid(data))
+    if status in ("failed", "reversed"):
+        await ledger_service.fail_deposit(db, reference)
+        return "failed", None
+    return "pending", None
+
+
+async def reconcile_pending_deposits(db: AsyncSession):
+    """
+    Batch job: re-verifies deposits still pending after RECONCILE_MIN_AGE (a missed webhook,
+    or a user who closed the page), a few Paystack calls at a time over the pooled client.
+    Deposits pending past RECONCILE_MAX_AGE are failed, references Paystack has never seen
+    are dropped. Returns {status: count}.
+    """
+    now = datetime.now(timezone.utc)
+    T = models.Transaction
+    result = await db.execute(
+        select(T.user_id, T.reference, T.created_at)
+        .where(T.type == "deposit", T.status == "pending", T.created_at < now - RECONCILE_MIN_AGE)
+        .order_by(T.created_at)
+        .limit(RECONCILE_BATCH)
+    )
+    pending = result.all()
+    if not pending:
+        return {}
+
+    gate = asyncio.Semaphore(RECONCILE_CONCURRENCY)
+
+    async def verify(reference):
+        async with gate:
+            try:
+                return await verify_transaction(reference)
+            except UnknownReference:
+                return "unknown"
+            except PaystackError as e:
+                print(f"⚠️ Deposit Reconcile ({reference}): {e}")
+                return None
+
+    verdicts = await asyncio.gather(*(verify(row.reference) for row in pending))
+    counts, changed = {}, []
+    for row, data in zip(pending, verdicts):
+        status = "pending"
+        if data == "unknown":
+            await ledger_service.discard_deposit(db, row.reference)
+            status = "unknown"
+        elif data is not None:
+            status, _ = await settle_from_paystack(db, row.user_id, {**data, "reference": row.reference})
+        created_at = row.created_at if row.created_at.tzinfo else row.created_at.replace(tzinfo=timezone.utc)
+        if status == "pending" and now - created_at > RECONCILE_MAX_AGE:
+            await ledger_service.fail_deposit(db, row.reference)
+            status = "expired"
+        counts[status] = counts.get(status, 0) + 1
+        if status != "pending":
+            changed.append(row)
+    await db.commit()
+    for row in changed:
+        await push_service.publish_wallet(db, row.user_id, row.reference)
+    print(f"💳 Deposit Reconciliation: {counts}")
+    return counts
@@ -1,33 +1,91 @@
 import os
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
+import threading
 from decimal import Decimal
 
-# 1. Get the same DATABASE_URL
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./gapeva.db")
-
-# 2. Fix for Sync Connection: We need "postgresql://" (not asyncpg)
+# 1. Fix for Sync Connection: We need "postgresql://" (not asyncpg)
 #    If the URL has "+asyncpg", we remove it for this specific file.
-if "+asyncpg" in DATABASE_URL:
-    DATABASE_URL = DATABASE_URL.replace("+asyncpg", "")
-#    Ensure it starts with postgresql://
-if DATABASE_URL.startswith("postgres://"):
-    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+def _sync_url(url):
+    if "+asyncpg" in url:
+        url = url.replace("+asyncpg", "")
+    if "+aiosqlite" in url:
+        url = url.replace("+aiosqlite", "")
+    # Ensure it starts with postgresql://
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    return url
+
+# 2. Get the same DATABASE_URL (reads use the read replica if there is one; the NAV
+#    update is the bot's only write and goes to the primary)
+PRIMARY_URL = _sync_url(os.getenv("DATABASE_URL", "sqlite:///./gapeva.db"))
+DATABASE_URL = _sync_url(os.getenv("DATABASE_READ_URL")) if os.getenv("DATABASE_READ_URL") else PRIMARY_URL
+
+# 3. The engines (and SQLAlchemy itself, ~0.3s of imports) are created on first use,
+#    so importing this module doesn't slow down the bot's startup.
+_engine = None
+_write_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """
+    Read-only: on a shared SQLite file the bot can never hold the write lock the API needs.
+    One process, one query at a time: a small pool is plenty.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            from sqlalchemy import create_engine
+            from ..db_config import configure_engine, engine_options, instrument_engine, read_only_url
+            url = read_only_url(DATABASE_URL)
+            _engine = configure_engine(create_engine(url, **engine_options(url, pool_size=2)), read_only=True)
+            instrument_engine(_engine, "bot")
+    return _engine
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine)
+def get_write_engine():
+    """The primary database, for the bot's only write: the NAV update (one row, one statement)."""
+    global _write_engine
+    with _engine_lock:
+        if _write_engine is None:
+            from sqlalchemy import create_engine
+            from ..db_config import configure_engine, engine_options, instrument_engine
+            _write_engine = configure_engine(create_engine(PRIMARY_URL, **engine_options(PRIMARY_URL, pool_size=1)))
+            instrument_engine(_write_engine, "bot")
+    return _write_engine
 
 def get_total_trading_pool():
     """
-    Calculates the sum of ALL users' trading_balances.
+    Reads the materialized pool total (a single-row lookup kept up to date by the API).
+    Falls back to the full SUM if the trading_pool table hasn't been created yet.
     """
-    session = SessionLocal()
     try:
-        result = session.execute(text("SELECT SUM(trading_balance) FROM wallets"))
-        total = result.scalar()
+        from sqlalchemy import text
+        with get_engine().connect() as conn:
+            total = conn.execute(text("SELECT total_trading_balance FROM trading_pool WHERE id = 1")).scalar()
+            if total is None:
+                total = conn.execute(text("SELECT SUM(trading_balance) FROM wallets")).scalar()
         return Decimal(total) if total else Decimal("0.00")
     except Exception as e:
         print(f"❌ DB Error: {e}")
         return Decimal("0.00")
-    finally:
-        session.close()
+
+def record_equity(equity):
+    """
+    Publishes the bot's equity snapshot as the pool's NAV per unit (equity / units
+    outstanding). One UPDATE of the pool row re-prices every user's units, however many
+    there are. Returns the new NAV, or None if it wasn't updated.
+    """
+    if equity is None or equity <= 0:
+        return None  # A failed balance read must never mark everyone's units down to zero
+    try:
+        from sqlalchemy import Numeric, bindparam, text
+        stmt = text(
+            "UPDATE trading_pool SET equity = :equity, "
+            "nav_per_unit = CASE WHEN total_units > 0 THEN :equity / total_units ELSE nav_per_unit END, "
+            "nav_updated_at = CURRENT_TIMESTAMP "
+            "WHERE id = 1 RETURNING nav_per_unit"
+        ).bindparams(bindparam("equity", type_=Numeric(18, 2)))
+        with get_write_engine().begin() as conn:
+            nav = conn.execute(stmt, {"equity": Decimal(str(equity)).quantize(Decimal("0.01"))}).scalar()
+        return Decimal(str(nav)) if nav is not None else None
+    except Exception as e:
+        print(f"❌ NAV Update Error: {e}")
+        return None
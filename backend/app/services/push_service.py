@@ -0,0 +1,130 @@
+"""
+Server-sent events for the dashboard: balance changes, transaction updates and the bot's
+telemetry, pushed over one long-lived GET instead of polling /wallets and /history.
+
+    event: snapshot     {"wallet": ..., "transactions": [...], "bot": ...}  on connect / resync
+    event: balance      the /wallets position, after any change to it
+    event: transaction  one /history row, when it's created or its status changes
+    event: bot          {"online": bool, "symbols": {symbol: {price, rsi, stop, frozen, ...}},
+                         "portfolio": {drawdowns, equity, equity_series}}
+
+Publishers call `publish_wallet` after they commit. It reads the new state from the
+primary (one query), and only for users with an open stream; the fan-out is app.events.
+Bot telemetry is polled from the bot's status listener (BOT_STATUS_URL) by one task per
+worker, only while someone is watching, and published when it changes.
+"""
+import asyncio
+import json
+import os
+import httpx
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import events, models
+from app.database import AsyncSessionLocal
+from app.services import history_service, ledger_service
+
+# The bot's metrics listener, e.g. http://trading_bot:9101/status (empty: no bot telemetry)
+BOT_STATUS_URL = os.getenv("BOT_STATUS_URL", "")
+BOT_STATUS_SECONDS = float(os.getenv("BOT_STATUS_SECONDS", "2"))
+# Comment lines on idle streams, so proxies and load balancers don't close them
+HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+SNAPSHOT_TRANSACTIONS = 20
+
+BOT_TOPIC = "bot"
+bot_status = {"online": False, "symbols": {}, "portfolio": {}}
+
+
+def user_topic(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def sse(event: str, data, event_id: str = None) -> str:
+    """One event in text/event-stream framing: JSON on a single line, encoded like the REST responses."""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+async def publish_wallet(db: AsyncSession, user_id: int, *references: str):
+    """
+    After a commit: pushes the user's balances, and the transactions `references` if given,
+    to their open streams. Costs nothing when the user has none.
+    """
+    topic = user_topic(user_id)
+    if not events.broker.watched(topic):
+        return
+    if references:
+        T = models.Transaction
+        rows = (await db.execute(
+            select(*history_service.HISTORY_COLUMNS).where(T.reference.in_(references))
+        )).all()
+        for row in rows:
+            events.broker.publish(topic, "transaction", history_service.as_dict(row))
+    position = await ledger_service.get_position(db, user_id)
+    if position is not None:
+        events.broker.publish(topic, "balance", position)
+
+
+async def snapshot(db: AsyncSession, user_id: int) -> dict:
+    rows = (await db.execute(
+        history_service.history_query(user_id, limit=SNAPSHOT_TRANSACTIONS)
+    )).all()
+    return {
+        "wallet": await ledger_service.get_position(db, user_id),
+        "transactions": [history_service.as_dict(row) for row in rows],
+        "bot": bot_status,
+    }
+
+
+async def stream(user_id: int, last_event_id: str = None):
+    """
+    The event stream for one client: a snapshot (or, on a reconnect the buffer still
+    covers, just the missed events), then live events. Holds no database connection
+    while idle: snapshots use a short session of their own, on the primary so they're
+    never older than the events that follow them.
+    """
+    subscription, replay = events.broker.subscribe([user_topic(user_id), BOT_TOPIC], last_event_id)
+    try:
+        yield "retry: 3000\n\n"  # Reconnect delay (ms) for EventSource
+        if replay is None:
+            async with AsyncSessionLocal() as db:
+                state = await snapshot(db, user_id)
+            yield sse("snapshot", state, events.broker.event_id(subscription.seq))
+        else:
+            for seq, event, data in replay:
+                yield sse(event, data, events.broker.event_id(seq))
+        while True:
+            item = await subscription.get(HEARTBEAT_SECONDS)
+            if item is None:
+                yield ": ping\n\n"
+            elif item is events.RESYNC:
+                async with AsyncSessionLocal() as db:
+                    state = await snapshot(db, user_id)
+                yield sse("snapshot", state, events.broker.event_id(subscription.seq))
+            else:
+                seq, event, data = item
+                yield sse(event, data, events.broker.event_id(seq))
+    finally:
+        subscription.close()
+
+
+async def watch_bot_status():
+    """
+    Polls the bot's /status every BOT_STATUS_SECONDS while anyone is subscribed and
+    publishes it when it changes (one poller per worker, however many clients).
+    """
+    global bot_status
+    async with httpx.AsyncClient(timeout=httpx.Timeout(2.0)) as client:
+        while True:
+            await asyncio.sleep(BOT_STATUS_SECONDS)
+            if not events.broker.watched(BOT_TOPIC):
+                continue
+            try:
+                response = await client.get(BOT_STATUS_URL)
+                response.raise_for_status()
+                status = {"online": True, **response.json()}
+            except (httpx.HTTPError, ValueError):
+                status = {**bot_status, "online": False}
+            if status != bot_status:
+                bot_status = status
+                events.broker.publish(BOT_TOPIC, "bot", status)
@@ -0,0 +1,275 @@
+"""
+End-of-day settlement, in set-based chunks.
+
+For a UTC day, once it has closed:
+1. Withdrawals still processing that were requested before the day's end are settled
+   (status -> settled, their fee booked), a chunk of rows per UPDATE.
+2. Every wallet gets a balance_rollups row for the day (balances, units, NAV and the day's
+   deposits / withdrawals / fees), one INSERT ... SELECT per range of user ids.
+
+The day's flows are exact (read from its transactions). The balances, units and NAV are a
+snapshot taken when the chunk runs, normally minutes after midnight: allocations aren't
+journaled, so balances at the day's end can't be rebuilt from the transactions. A day
+settled late (after downtime) therefore carries the balances of when it was settled.
+
+Each chunk commits together with the progress it makes on the day's settlement_runs row,
+so the job is resumable: it stops when its time budget runs out and the next run (or
+another API worker) carries on from the recorded cursor. Re-running a finished day, or
+two workers racing on the same chunk, changes nothing: the withdrawal UPDATE is guarded
+on the status, the cursor only moves forward from the value a worker read, and rollup
+rows are inserted with ON CONFLICT DO NOTHING.
+
+Usage (from backend/; defaults to yesterday):
+    python -m app.services.settlement_service --day 2026-01-31 --budget 300
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from sqlalchemy import Date, and_, case, func, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models
+from app.services import ledger_service, push_service
+
+SETTLEMENT_CHUNK = int(os.getenv("SETTLEMENT_CHUNK", "10000"))
+SETTLEMENT_BUDGET_SECONDS = float(os.getenv("SETTLEMENT_BUDGET_SECONDS", "300"))
+WITHDRAWN = ("processing", "settled")   # Withdrawal statuses that left the wallet
+
+
+def _insert(db: AsyncSession, table):
+    """Dialect INSERT, for ON CONFLICT DO NOTHING (Postgres in production, SQLite locally)."""
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    return dialect.insert(table)
+
+
+def day_bounds(day: date):
+    """[start, end) of a UTC day."""
+    start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+async def _start_run(db: AsyncSession, day: date):
+    """Creates the day's run row if needed and returns it (as a Core row: it changes under us)."""
+    R = models.SettlementRun
+    await db.execute(
+        _insert(db, R.__table__)
+        .values(day=day, withdrawals_settled=0, fees=0, rollup_cursor=0, rollup_rows=0)
+        .on_conflict_do_nothing()
+    )
+    await db.commit()
+    return (await db.execute(
+        select(R.rollup_cursor, R.finished_at).where(R.day == day)
+    )).first()
+
+
+async def settle_withdrawals(db: AsyncSession, day: date, deadline: float, chunk: int = SETTLEMENT_CHUNK):
+    """
+    Settles withdrawals requested before the end of `day`, `chunk` rows per UPDATE: the
+    quoted fee is kept (rows from before fees were stored get the current rate), and the
+    run's totals move in the same transaction. Returns (settled, fees booked).
+    """
+    T, R = models.Transaction, models.SettlementRun
+    _, end = day_bounds(day)
+    settled, booked = 0, Decimal("0.00")
+    while time.monotonic() < deadline:
+        # Read off ix_transactions_type_status_created; the outer guard on the status makes a
+        # row that another worker settled first drop out instead of being settled twice
+        batch = (
+            select(T.id)
+            .where(T.type == "withdrawal", T.status == "processing", T.created_at < end)
+            .limit(chunk)
+        )
+        rows = (await db.execute(
+            update(T)
+            .where(T.id.in_(batch), T.status == "processing")
+            .values(status="settled", settled_at=func.now(),
+                    fee=func.coalesce(T.fee, func.round(T.amount * ledger_service.WITHDRAWAL_FEE_RATE, 2)))
+            .returning(T.fee, T.user_id, T.reference)
+            .execution_options(synchronize_session=False)
+        )).all()
+        total = sum((Decimal(str(row.fee)) for row in rows), Decimal("0.00"))
+        if rows:
+            await db.execute(
+                update(R).where(R.day == day)
+                .values(withdrawals_settled=R.withdrawals_settled + len(rows), fees=R.fees + total)
+            )
+        await db.commit()
+        # Status updates for users with a dashboard open (in this process's push channel)
+        for row in rows:
+            await push_service.publish_wallet(db, row.user_id, row.reference)
+        settled, booked = settled + len(rows), booked + total
+        if len(rows) < chunk:
+            break
+    return settled, booked
+
+
+def _rollup_query(day: date, low: int, high: int):
+    """INSERT ... SELECT source for wallets with low < user_id <= high: each wallet's current
+    balances joined to the pool row (NAV) and to its flows for the day, grouped in one pass."""
+    W, T, P = models.Wallet, models.Transaction, models.TradingPool
+    start, end = day_bounds(day)
+    is_withdrawal = and_(T.type == "withdrawal", T.status.in_(WITHDRAWN))
+    flows = (
+        select(
+            T.user_id,
+            func.sum(case((and_(T.type == "deposit", T.status == "success"), T.amount), else_=0)).label("deposits"),
+            func.sum(case((is_withdrawal, T.amount), else_=0)).label("withdrawals"),
+            func.sum(case((is_withdrawal, func.coalesce(T.fee, 0)), else_=0)).label("fees"),
+        )
+        .where(T.user_id > low, T.user_id <= high, T.created_at >= start, T.created_at < end)
+        .group_by(T.user_id)
+        .subquery()
+    )
+    return (
+        select(
+            W.user_id,
+            literal(day, Date()),
+            func.coalesce(W.wallet_balance, 0),
+            func.coalesce(W.trading_balance, 0),
+            W.trading_units,
+            P.nav_per_unit,
+            func.coalesce(flows.c.deposits, 0),
+            func.coalesce(flows.c.withdrawals, 0),
+            func.coalesce(flows.c.fees, 0),
+        )
+        .select_from(W)
+        .join(P, P.id == ledger_service.POOL_ID)
+        .outerjoin(flows, flows.c.user_id == W.user_id)
+        .where(W.user_id > low, W.user_id <= high)
+    )
+
+
+ROLLUP_COLUMNS = ["user_id", "day", "wallet_balance", "trading_balance", "trading_units",
+                  "nav_per_unit", "deposits", "withdrawals", "fees"]
+
+
+async def rollup_balances(db: AsyncSession, day: date, cursor: int, deadline: float,
+                          chunk: int = SETTLEMENT_CHUNK):
+    """
+    Writes the day's balance_rollups rows, `chunk` user ids per INSERT ... SELECT, from
+    the run's cursor (the last user id done). Returns (rows written, finished).
+    """
+    W, R = models.Wallet, models.SettlementRun
+    last = await db.scalar(select(func.max(W.user_id))) or 0
+    await db.commit()   # Don't hold a read transaction open between chunks
+    written = 0
+    while cursor < last:
+        if time.monotonic() >= deadline:
+            return written, False
+        high = cursor + chunk
+        # Claim the chunk first: if another worker already moved the cursor, start over from its value
+        claimed = await db.scalar(
+            update(R).where(R.day == day, R.rollup_cursor == cursor)
+            .values(rollup_cursor=high)
+            .returning(R.rollup_cursor)
+        )
+        if claimed is None:
+            await db.rollback()
+            cursor = await db.scalar(select(R.rollup_cursor).where(R.day == day))
+            await db.commit()
+            continue
+        result = await db.execute(
+            _insert(db, models.BalanceRollup.__table__)
+            .from_select(ROLLUP_COLUMNS, _rollup_query(day, cursor, high))
+            .on_conflict_do_nothing()
+        )
+        await db.execute(update(R).where(R.day == day).values(rollup_rows=R.rollup_rows + result.rowcount))
+        await db.commit()
+        written, cursor = written + result.rowcount, high
+    return written, True
+
+
+async def settle_day(db: AsyncSession, day: date, budget: float = SETTLEMENT_BUDGET_SECONDS,
+                     chunk: int = SETTLEMENT_CHUNK):
+    """
+    Settles `day` (withdrawals, then rollups) within `budget` seconds, resuming a run that
+    was cut short. Returns what this call did: {day, withdrawals, fees, rollup_rows, finished}.
+    """
+    deadline = time.monotonic() + budget
+    summary = {"day": day, "withdrawals": 0, "fees": Decimal("0.00"), "rollup_rows": 0, "finished": True}
+    run = await _start_run(db, day)
+    if run.finished_at is not None:
+        return summary
+
+    summary["withdrawals"], summary["fees"] = await settle_withdrawals(db, day, deadline, chunk)
+    summary["rollup_rows"], summary["finished"] = await rollup_balances(db, day, run.rollup_cursor, deadline, chunk)
+    if summary["finished"]:
+        R = models.SettlementRun
+        await db.execute(update(R).where(R.day == day, R.finished_at.is_(None)).values(finished_at=func.now()))
+        await db.commit()
+    return summary
+
+
+async def settle_pending_days(db: AsyncSession, budget: float = SETTLEMENT_BUDGET_SECONDS):
+    """
+    Settles, oldest first, every day up to yesterday (UTC) that isn't done: unfinished runs
+    and the days after the last finished one (only yesterday on a fresh database). Stops
+    when the budget runs out; the next call resumes. The periodic task calls this.
+    """
+    R = models.SettlementRun
+    deadline = time.monotonic() + budget
+    yesterday = datetime.now(timezone.utc).date() - timedelta(days=1)
+    last_done, first_open = (await db.execute(
+        select(func.max(case((R.finished_at.is_not(None), R.day))),
+               func.min(case((R.finished_at.is_(None), R.day))))
+    )).one()
+    await db.commit()
+    day = min(d for d in (first_open, last_done + timedelta(days=1) if last_done else yesterday) if d)
+
+    summaries = []
+    while day <= yesterday:
+        summary = await settle_day(db, day, max(0.0, deadline - time.monotonic()))
+        summaries.append(summary)
+        if summary["withdrawals"] or summary["rollup_rows"]:
+            state = "done" if summary["finished"] else "budget spent, resuming next run"
+            print(f"🧾 Settlement {day}: {summary['withdrawals']} withdrawals (${summary['fees']:,.2f} fees), "
+                  f"{summary['rollup_rows']} balance rows ({state})")
+        if not summary["finished"]:
+            break
+        day += timedelta(days=1)
+    return summaries
+
+
+async def daily_balances(db: AsyncSession, user_id: int, days: int):
+    """The user's last `days` rollup rows, oldest first (one range scan of the primary key)."""
+    B = models.BalanceRollup
+    since = datetime.now(timezone.utc).date() - timedelta(days=days)
+    rows = (await db.execute(
+        select(B).where(B.user_id == user_id, B.day >= since).order_by(B.day)
+    )).scalars().all()
+    return [
+        {
+            "day": row.day,
+            "wallet_balance": row.wallet_balance,
+            "trading_balance": row.trading_balance,
+            "trading_value": ledger_service.trading_value(row.trading_units, row.nav_per_unit),
+            "deposits": row.deposits,
+            "withdrawals": row.withdrawals,
+            "fees": row.fees,
+        }
+        for row in rows
+    ]
+
+
+async def main(argv=None):
+    from app.database import AsyncSessionLocal, engine
+    parser = argparse.ArgumentParser(description="Run (or resume) the end-of-day settlement")
+    parser.add_argument("--day", type=date.fromisoformat,
+                        default=datetime.now(timezone.utc).date() - timedelta(days=1))
+    parser.add_argument("--budget", type=float, default=SETTLEMENT_BUDGET_SECONDS, help="Seconds")
+    parser.add_argument("--chunk", type=int, default=SETTLEMENT_CHUNK)
+    args = parser.parse_args(argv)
+    try:
+        async with AsyncSessionLocal() as db:
+            summary = await settle_day(db, args.day, args.budget, args.chunk)
+    finally:
+        await engine.dispose()
+    print(summary)
+    return summary["finished"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,123 @@
+"""
+Cold start benchmark: wall time from a fresh interpreter to "ready", for the API and the bot.
+
+    api: import app.main + lifespan startup (migrations, pool row, Paystack client),
+         on a fresh database (first boot) and on an already-migrated one (restart)
+    bot: import trading_engine.bot + QuantitativeBot() with the real ccxt client, starting
+         warm from a markets snapshot on disk (no network)
+
+Each target runs in its own subprocess, `--runs` times; the median is compared with
+the budget and the script exits non-zero if any target is over it (use it in CI).
+
+Usage (from backend/):
+    python -m scripts.cold_start
+    python -m scripts.cold_start --runs 7 --api-budget 1.5 --bot-budget 1.5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+
+API_CHILD = """
+import asyncio, json, time
+t0 = time.perf_counter()
+from app.main import app
+t1 = time.perf_counter()
+async def boot():
+    async with app.router.lifespan_context(app):
+        return time.perf_counter()
+t2 = asyncio.run(boot())
+print(json.dumps({"import": t1 - t0, "startup": t2 - t1}))
+"""
+
+BOT_CHILD = """
+import contextlib, io, json, time
+t0 = time.perf_counter()
+from trading_engine import bot as bot_module
+t1 = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    bot = bot_module.QuantitativeBot()
+t2 = time.perf_counter()
+bot.io_pool.shutdown(wait=True)
+bot.checkpoints.close()
+print(json.dumps({"import": t1 - t0, "startup": t2 - t1}))
+"""
+
+SYMBOL = 'BTC/USDT'
+MARKET = {
+    'id': 'BTCUSDT', 'symbol': SYMBOL, 'base': 'BTC', 'quote': 'USDT', 'baseId': 'BTC', 'quoteId': 'USDT',
+    'type': 'spot', 'spot': True, 'margin': False, 'swap': False, 'future': False, 'option': False,
+    'active': True, 'contract': False, 'taker': 0.001, 'maker': 0.001,
+    'precision': {'amount': 0.00001, 'price': 0.01},
+    'limits': {'amount': {'min': 0.00001, 'max': 9000.0}, 'price': {'min': 0.01, 'max': 1000000.0},
+               'cost': {'min': 5.0, 'max': None}},
+    'info': {},
+}
+
+
+def run_child(code, cwd, env):
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-c', code], cwd=cwd, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"child failed:\n{proc.stderr[-2000:]}")
+    phases = json.loads(proc.stdout.strip().splitlines()[-1])
+    return {'wall': wall, **phases}
+
+
+def measure_api(tmp, runs):
+    env = {**os.environ, 'DATABASE_URL': f"sqlite+aiosqlite:///{tmp}/api.db",
+           'POOL_RECONCILE_SECONDS': '3600', 'DEPOSIT_RECONCILE_SECONDS': '3600'}
+    env.pop('DATABASE_READ_URL', None)
+    first = run_child(API_CHILD, BACKEND_DIR, env)
+    restarts = [run_child(API_CHILD, BACKEND_DIR, env) for _ in range(runs)]
+    return first, restarts
+
+
+def measure_bot(tmp, runs):
+    cache_file = os.path.join(tmp, 'bot_cache.json')
+    with open(cache_file, 'w') as f:
+        json.dump({'markets': {'value': {SYMBOL: MARKET}, 'loaded_at': time.time()}}, f)
+    env = {**os.environ, 'BOT_CACHE_FILE': cache_file, 'BOT_STATE_FILE': os.path.join(tmp, 'bot_state.jsonl'),
+           'DATABASE_URL': f"sqlite:///{tmp}/api.db", 'PYTHONPATH': REPO_DIR}
+    env.pop('DATABASE_READ_URL', None)
+    return [run_child(BOT_CHILD, REPO_DIR, env) for _ in range(runs)]
+
+
+def summarize(name, samples, budget=None):
+    median = {k: statistics.median(s[k] for s in samples) for k in ('wall', 'import', 'startup')}
+    verdict = '' if budget is None else (' ✅' if median['wall'] <= budget else f' ❌ over budget ({budget:.2f}s)')
+    print(f"{name:<18} {median['wall'] * 1000:7.0f}ms wall | import {median['import'] * 1000:6.0f}ms | "
+          f"startup {median['startup'] * 1000:6.0f}ms{verdict}")
+    return budget is None or median['wall'] <= budget
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold start time of the API and the trading bot")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--api-budget', type=float, default=float(os.getenv("API_COLD_START_BUDGET", "2.0")),
+                        help="Seconds, median wall time of an API restart")
+    parser.add_argument('--bot-budget', type=float, default=float(os.getenv("BOT_COLD_START_BUDGET", "2.0")),
+                        help="Seconds, median wall time of a bot start")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='gapeva_cold_') as tmp:
+        first, restarts = measure_api(tmp, args.runs)
+        bot = measure_bot(tmp, args.runs)
+
+    print(f"\n--- ⏱️ COLD START (median of {args.runs}) ---")
+    summarize('api (first boot)', [first])
+    ok = summarize('api (restart)', restarts, args.api_budget)
+    ok = summarize('bot', bot, args.bot_budget) and ok
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,145 @@
+"""
+Ledger concurrency stress test: many simultaneous withdrawals, allocations and duplicate
+deposit settlements against one wallet, then checks that no update was lost.
+
+Invariants checked at the end:
+    wallet_balance  == start - successful withdrawals - net allocated
+    trading_balance == net allocated == materialized pool total
+    trading_units == pool units outstanding == net allocated (the NAV stays at 1.00)
+    no balance below zero, and a deposit settled N times concurrently is credited once
+
+Usage (from backend/; uses a throwaway SQLite DB unless DATABASE_URL is set):
+    python -m scripts.ledger_stress --ops 2000 --concurrency 100
+    python -m scripts.ledger_stress --naive     # the old read-modify-write pattern, for comparison
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from decimal import Decimal
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+_tmp = tempfile.mkdtemp(prefix="gapeva_stress_")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_tmp}/stress.db")
+
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from app import database, models
+from app.services import ledger_service
+
+START = Decimal("1000.00")
+UNIT = Decimal("1.00")
+
+
+async def naive_withdraw(db, user_id, amount, reference):
+    """The pre-ledger-service pattern: SELECT, compare and subtract in Python, then write back."""
+    wallet = (await db.execute(select(models.Wallet).where(models.Wallet.user_id == user_id))).scalars().first()
+    if wallet.wallet_balance < amount:
+        return None
+    await asyncio.sleep(0)  # Let other requests interleave, as real I/O would
+    wallet.wallet_balance -= amount
+    db.add(models.Transaction(user_id=user_id, reference=reference, amount=amount,
+                              status="processing", type="withdrawal"))
+    return wallet.wallet_balance
+
+
+async def run_op(user_id, kind, naive, tally):
+    for attempt in range(20):
+        try:
+            async with database.AsyncSessionLocal() as db:
+                if kind == "withdraw":
+                    ref = f"wd_{user_id}_{uuid.uuid4().hex[:16]}"
+                    op = naive_withdraw if naive else ledger_service.withdraw
+                    ok = await op(db, user_id, UNIT, ref) is not None
+                elif kind == "allocate":
+                    ok = await ledger_service.move_to_trading(db, user_id, UNIT) is not None
+                else:
+                    ok = await ledger_service.move_to_trading(db, user_id, -UNIT) is not None
+                await db.commit()
+            if ok:
+                tally[kind] += 1
+            return
+        except OperationalError:
+            # SQLite allows one writer at a time; a busy database is retried, not counted
+            tally["retries"] += 1
+            await asyncio.sleep(0.01 * (attempt + 1))
+    tally["gave_up"] += 1
+
+
+async def settle_once(user_id, reference, tally):
+    async with database.AsyncSessionLocal() as db:
+        credited = await ledger_service.settle_deposit(db, user_id, reference, Decimal("50.00"))
+        await db.commit()
+    if credited is not None:
+        tally["credited"] += 1
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent ledger operations vs. balance invariants")
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--naive", action="store_true", help="Use the old read-modify-write withdrawals")
+    args = parser.parse_args(argv)
+
+    database.engine.echo = False
+    async with database.engine.begin() as conn:
+        await conn.run_sync(database.Base.metadata.drop_all)
+        await conn.run_sync(database.Base.metadata.create_all)
+    async with database.AsyncSessionLocal() as db:
+        user = models.User(full_name="Stress", email="stress@gapeva.io", phone="+10000000000", hashed_password="x")
+        db.add(user)
+        await db.flush()
+        db.add(models.Wallet(user_id=user.id, wallet_balance=START, trading_balance=Decimal("0.00")))
+        db.add(models.Transaction(user_id=user.id, reference="dep_race", amount=0, status="pending", type="deposit"))
+        await db.commit()
+        user_id = user.id
+        await ledger_service.ensure_trading_pool(db)
+
+    rng = random.Random(0)
+    kinds = rng.choices(["withdraw", "allocate", "deallocate"], weights=[2, 2, 1], k=args.ops)
+    tally = dict.fromkeys(["withdraw", "allocate", "deallocate", "retries", "gave_up", "credited"], 0)
+    gate = asyncio.Semaphore(args.concurrency)
+
+    async def guarded(coro):
+        async with gate:
+            await coro
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(guarded(run_op(user_id, kind, args.naive, tally)) for kind in kinds),
+        *(guarded(settle_once(user_id, "dep_race", tally)) for _ in range(20)),
+    )
+    elapsed = time.perf_counter() - started
+
+    async with database.AsyncSessionLocal() as db:
+        wallet = await db.scalar(select(models.Wallet).where(models.Wallet.user_id == user_id))
+        pool = await db.get(models.TradingPool, ledger_service.POOL_ID)
+    allocated = (tally["allocate"] - tally["deallocate"]) * UNIT
+    expected_wallet = START + tally["credited"] * Decimal("50.00") - tally["withdraw"] * UNIT - allocated
+
+    checks = {
+        "wallet balance": wallet.wallet_balance == expected_wallet,
+        "trading balance": wallet.trading_balance == allocated,
+        "pool total": pool.total_trading_balance == allocated,
+        "pool units": wallet.trading_units == allocated and pool.total_units == allocated,
+        "no negative balance": wallet.wallet_balance >= 0 and wallet.trading_balance >= 0,
+        "deposit credited once": tally["credited"] == 1,
+    }
+    print(f"\n--- 🧮 LEDGER STRESS ({'naive' if args.naive else 'guarded'}) ---")
+    print(f"{args.ops} ops, concurrency {args.concurrency}: {elapsed:.2f}s ({args.ops / elapsed:,.0f} ops/s) | {tally}")
+    print(f"Wallet ${wallet.wallet_balance} (expected ${expected_wallet}) | "
+          f"Trading ${wallet.trading_balance} | Pool ${pool.total_trading_balance} | "
+          f"Units {wallet.trading_units} / {pool.total_units} @ {pool.nav_per_unit}")
+    for name, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+    return all(checks.values())
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
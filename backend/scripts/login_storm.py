@@ -0,0 +1,95 @@
+"""
+Login-storm benchmark: latency of an unrelated endpoint while many logins hash at once.
+
+Runs the app in-process (httpx ASGI transport) against a throwaway SQLite database:
+a probe task hits GET / every few milliseconds, first on an idle server, then during
+`--logins` concurrent logins. With hashing on the event loop the probe's p99 grows to
+the length of the whole storm; with the hash pool it should stay flat.
+
+Usage (from backend/):
+    python -m scripts.login_storm --logins 200
+    HASH_WORKERS=0 python -m scripts.login_storm   # baseline: Argon2 on the event loop
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+_tmp = tempfile.mkdtemp(prefix="gapeva_bench_")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_tmp}/bench.db")
+
+import httpx
+
+from app import auth, database
+from app.main import app
+from app.services import ledger_service
+
+EMAIL, PASSWORD = "storm@gapeva.io", "correct horse battery"
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(p * len(samples)))] * 1000 if samples else 0.0
+
+
+async def probe(client, stop, interval):
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/")
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def measure(client, seconds=None, logins=0, interval=0.005):
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe(client, stop, interval))
+    statuses = {}
+    if logins:
+        async def login():
+            r = await client.post("/api/v1/auth/login", data={"username": EMAIL, "password": PASSWORD})
+            statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+        await asyncio.gather(*(login() for _ in range(logins)))
+    else:
+        await asyncio.sleep(seconds)
+    stop.set()
+    return await prober, statuses
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="p99 of GET / during a login storm")
+    parser.add_argument("--logins", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    database.engine.echo = False
+    async with database.engine.begin() as conn:
+        await conn.run_sync(database.Base.metadata.create_all)
+    async with database.AsyncSessionLocal() as db:
+        await ledger_service.ensure_trading_pool(db)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/api/v1/auth/signup", json={
+            "email": EMAIL, "full_name": "Storm", "phone": "+10000000000", "password": PASSWORD})
+
+        idle, _ = await measure(client, seconds=1.0)
+        started = time.perf_counter()
+        storm, statuses = await measure(client, logins=args.logins)
+        elapsed = time.perf_counter() - started
+    auth.hash_pool.shutdown()
+
+    mode = f"{auth.hash_pool.workers} hash workers" if auth.hash_pool.workers else "inline hashing"
+    print(f"\n--- 🔐 LOGIN STORM ({mode}) ---")
+    print(f"Logins: {args.logins} in {elapsed:.2f}s | Responses: {statuses}")
+    print(f"GET / idle:  p50 {percentile(idle, 0.5):.1f}ms | p99 {percentile(idle, 0.99):.1f}ms")
+    print(f"GET / storm: p50 {percentile(storm, 0.5):.1f}ms | p99 {percentile(storm, 0.99):.1f}ms "
+          f"(max {percentile(storm, 1.0):.1f}ms)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
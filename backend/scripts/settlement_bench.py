@@ -0,0 +1,121 @@
+"""
+Settlement benchmark: seeds a million wallets (and a day of deposits and withdrawals)
+with set-based INSERT ... SELECT, then times the end-of-day settlement against a budget.
+
+Checks at the end:
+    every wallet has exactly one rollup row for the day
+    every withdrawal of the day is settled, and the run's fees match the rows' fees
+    a second run is a no-op (finished days are skipped)
+
+Usage (from backend/; uses a throwaway SQLite DB unless DATABASE_URL is set):
+    python -m scripts.settlement_bench --wallets 1000000 --budget 300
+    python -m scripts.settlement_bench --wallets 200000 --budget 2    # cut short, then resumed
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+_tmp = tempfile.mkdtemp(prefix="gapeva_settlement_")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_tmp}/settlement.db")
+
+from sqlalchemy import func, select, text
+
+from app import database, models
+from app.services import ledger_service, settlement_service
+
+DAY = date(2026, 1, 31)
+
+
+async def seed(wallets, per_wallet):
+    """Users and wallets 1..n, plus `per_wallet` transactions each spread over the day."""
+    started = time.perf_counter()
+    numbers = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :count) "
+    day = DAY.isoformat()
+    async with database.engine.begin() as conn:
+        await conn.execute(text(numbers +
+            "INSERT INTO users (id, full_name, email, phone, hashed_password, is_active) "
+            "SELECT i, 'User ' || i, 'user' || i || '@gapeva.io', '+1000', 'x', 1 FROM n"), {"count": wallets})
+        await conn.execute(text(numbers +
+            "INSERT INTO wallets (id, user_id, wallet_balance, trading_balance, trading_units) "
+            "SELECT i, i, 100 + i % 900, i % 50, i % 50 FROM n"), {"count": wallets})
+        # Deposits and withdrawals, alternating; every third withdrawal left processing the day before
+        await conn.execute(text(numbers +
+            "INSERT INTO transactions (user_id, reference, amount, status, type, fee, created_at) "
+            "SELECT 1 + i % :wallets, 'ref_' || i, 1 + i % 97, "
+            "       CASE i % 2 WHEN 0 THEN 'success' ELSE 'processing' END, "
+            "       CASE i % 2 WHEN 0 THEN 'deposit' ELSE 'withdrawal' END, "
+            "       CASE i % 2 WHEN 0 THEN NULL ELSE round((1 + i % 97) * 0.35, 2) END, "
+            "       CASE i % 6 WHEN 1 THEN :before ELSE :day || ' ' || printf('%02d:%02d:%02d', i % 24, i % 60, i % 60) END "
+            "FROM n"),
+            {"count": wallets * per_wallet, "wallets": wallets,
+             "day": day, "before": f"{DAY - timedelta(days=1)} 23:00:00"})
+        await conn.execute(text(
+            "INSERT INTO trading_pool (id, total_trading_balance, total_units, nav_per_unit, equity) "
+            "SELECT 1, SUM(trading_balance), SUM(trading_units), 1.05, SUM(trading_units) * 1.05 FROM wallets"))
+    return time.perf_counter() - started
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the end-of-day settlement at scale")
+    parser.add_argument("--wallets", type=int, default=1_000_000)
+    parser.add_argument("--transactions", type=int, default=1, help="Per wallet, for the day")
+    parser.add_argument("--budget", type=float, default=300.0, help="Seconds per settlement run")
+    parser.add_argument("--chunk", type=int, default=settlement_service.SETTLEMENT_CHUNK)
+    args = parser.parse_args(argv)
+
+    database.engine.echo = False
+    async with database.engine.begin() as conn:
+        await conn.run_sync(database.Base.metadata.drop_all)
+        await conn.run_sync(database.Base.metadata.create_all)
+    seeded = await seed(args.wallets, args.transactions)
+    print(f"🌱 Seeded {args.wallets:,} wallets, {args.wallets * args.transactions:,} transactions in {seeded:.1f}s")
+
+    runs = []
+    async with database.AsyncSessionLocal() as db:
+        while True:
+            started = time.perf_counter()
+            summary = await settlement_service.settle_day(db, DAY, args.budget, args.chunk)
+            runs.append(time.perf_counter() - started)
+            print(f"🧾 Run {len(runs)}: {runs[-1]:.2f}s | {summary['withdrawals']:,} withdrawals settled, "
+                  f"${summary['fees']:,.2f} fees, {summary['rollup_rows']:,} rollup rows, "
+                  f"{'finished' if summary['finished'] else 'budget spent'}")
+            if summary["finished"] or len(runs) > 1000:
+                break
+        started = time.perf_counter()
+        again = await settlement_service.settle_day(db, DAY, args.budget, args.chunk)
+        rerun = time.perf_counter() - started
+
+        T, B, R = models.Transaction, models.BalanceRollup, models.SettlementRun
+        rollups, users = (await db.execute(
+            select(func.count(), func.count(func.distinct(B.user_id))).where(B.day == DAY)
+        )).one()
+        left = await db.scalar(select(func.count()).where(T.type == "withdrawal", T.status == "processing"))
+        fees = await db.scalar(select(func.coalesce(func.sum(T.fee), 0)).where(T.status == "settled"))
+        run = (await db.execute(select(R).where(R.day == DAY))).scalars().one()
+
+    total = sum(runs)
+    checks = {
+        "one rollup row per wallet": rollups == users == args.wallets == run.rollup_rows,
+        "withdrawals settled": left == 0,
+        "fees booked": Decimal(str(fees)).quantize(ledger_service.CENT) == Decimal(str(run.fees)).quantize(ledger_service.CENT),
+        "re-run is a no-op": again["withdrawals"] == again["rollup_rows"] == 0,
+        "each run within budget": all(r <= args.budget * 1.1 + 1 for r in runs),
+    }
+    print(f"\n--- 🧾 SETTLEMENT ({args.wallets:,} wallets, chunk {args.chunk:,}) ---")
+    print(f"{total:.2f}s over {len(runs)} run(s) ({args.wallets / total:,.0f} wallets/s) | "
+          f"re-run {rerun * 1000:.1f}ms")
+    for name, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+    await database.engine.dispose()
+    return all(checks.values())
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
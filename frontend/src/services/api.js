@@ -47,4 +47,16 @@ export const walletService = {
   getHistory: () => api.get('/api/v1/wallets/history'),
 };
 
+// 6. Live updates (server-sent events): snapshot, balance, transaction and bot events.
+//    EventSource reconnects by itself and resumes from the last event it received.
+//    Returns a function that closes the stream.
+export const subscribeToEvents = (handlers) => {
+  const token = localStorage.getItem('access_token');
+  const source = new EventSource(`${API_URL}/api/v1/events?access_token=${encodeURIComponent(token)}`);
+  Object.entries(handlers).forEach(([event, handler]) => {
+    source.addEventListener(event, (e) => handler(JSON.parse(e.data)));
+  });
+  return () => source.close();
+};
+
 export default api;
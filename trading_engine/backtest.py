@@ -0,0 +1,424 @@
+"""
+Vectorized backtester for the Apex strategy.
+
+Indicators and signals are computed as whole columns (pandas/NumPy). The only Python
+loop runs once per *trade*: it jumps to the next entry with a binary search and finds
+the exit (trailing stop, trend reversal, momentum crash or RiskManager panic) with
+array scans over growing chunks, so a million bars run in seconds.
+
+The panic switch sees one equity sample per bar close, against the same rolling 24h
+peak as RiskManager; `--check-risk` replays the equity curve through a real
+RiskManager and fails if the two disagree on any panic.
+
+Usage:
+    python -m trading_engine.backtest candles.csv [--capital 10000] [--fee 0.001] [--check-risk]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from trading_engine import strategy
+from trading_engine.strategy import DEFAULT_PARAMS
+from trading_engine.candles import read_series
+from trading_engine.risk_manager import DRAWDOWN_WINDOWS, RiskManager
+from trading_engine.timeframes import bar_open
+
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+MIN_ORDER_USDT = 5.0        # Bot only buys with more than $5 free
+MIN_ORDER_BTC = 0.0001      # Bot only sells more than 0.0001 BTC
+INVEST_FRACTION = 0.99      # Bot invests 99% of available USDT
+PANIC_WINDOW_MS = DRAWDOWN_WINDOWS['24h'] * 1000    # RiskManager's default panic_window
+
+
+# --- BATCH INDICATORS ---
+# Column versions of trading_engine.indicators (same pandas_ta formulas).
+
+def ema(close, length):
+    """SMA-seeded EMA (pandas_ta.ema default)."""
+    values = pd.Series(close, dtype='float64')
+    if len(values) < length:
+        return np.full(len(values), np.nan)
+    seeded = values.copy()
+    seeded.iloc[:length - 1] = np.nan
+    seeded.iloc[length - 1] = values.iloc[:length].mean()
+    return seeded.ewm(span=length, adjust=False).mean().to_numpy()
+
+
+def rma(values, length):
+    """Wilder's average (pandas_ta.rma)."""
+    return pd.Series(values, dtype='float64').ewm(alpha=1.0 / length, min_periods=length).mean().to_numpy()
+
+
+def rsi(close, length=14):
+    change = np.diff(np.asarray(close, dtype='float64'), prepend=np.nan)
+    gain = rma(np.where(np.isnan(change), np.nan, np.maximum(change, 0.0)), length)
+    loss = rma(np.where(np.isnan(change), np.nan, -np.minimum(change, 0.0)), length)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return 100.0 * gain / (gain + loss)
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = np.full(len(line), np.nan)
+    valid = np.flatnonzero(~np.isnan(line))
+    if len(valid):
+        signal_line[valid[0]:] = ema(line[valid[0]:], signal)
+    return line, signal_line
+
+
+def atr(high, low, close, length=14):
+    prev_close = np.roll(np.asarray(close, dtype='float64'), 1)
+    true_range = np.maximum.reduce([high - low, np.abs(high - prev_close), np.abs(prev_close - low)])
+    true_range[0] = np.nan
+    return rma(true_range, length)
+
+
+def bb_upper(close, length=20, std=2.0):
+    rolling = pd.Series(close, dtype='float64').rolling(length)
+    return (rolling.mean() + std * rolling.std(ddof=0)).to_numpy()
+
+
+def compute_indicators(bars, params=DEFAULT_PARAMS, cache=None):
+    """
+    Returns a dict of indicator columns keyed like IndicatorEngine snapshots.
+    If a `cache` dict is given, each column is stored under its own parameters
+    (e.g. ('ema', 50)) so parameter sets sharing a length reuse the column.
+    The cache must only ever be used with one `bars` dataset.
+    """
+    high, low, close = bars['high'], bars['low'], bars['close']
+    cache = {} if cache is None else cache
+
+    def column(key, build):
+        if key not in cache:
+            cache[key] = build()
+        return cache[key]
+
+    macd_line, macd_signal = column(('macd', params.macd_fast, params.macd_slow, params.macd_signal),
+                                    lambda: macd(close, params.macd_fast, params.macd_slow, params.macd_signal))
+    return {
+        'close': close,
+        'EMA_50': column(('ema', params.ema_fast), lambda: ema(close, params.ema_fast)),
+        'EMA_200': column(('ema', params.ema_slow), lambda: ema(close, params.ema_slow)),
+        'RSI': column(('rsi', params.rsi_length), lambda: rsi(close, params.rsi_length)),
+        'MACD': macd_line,
+        'MACD_SIGNAL': macd_signal,
+        'ATR': column(('atr', params.atr_length), lambda: atr(high, low, close, params.atr_length)),
+        'BB_UPPER': column(('bb_upper', params.bb_length, params.bb_std),
+                           lambda: bb_upper(close, params.bb_length, params.bb_std)),
+    }
+
+
+def to_columns(ohlcv):
+    """Accepts a DataFrame, a (n, 6) array or a list of ccxt rows; returns float64 columns."""
+    if isinstance(ohlcv, pd.DataFrame):
+        return {c: ohlcv[c].to_numpy(dtype='float64') for c in OHLCV_COLUMNS}
+    if isinstance(ohlcv, dict):
+        return {c: np.asarray(ohlcv[c], dtype='float64') for c in OHLCV_COLUMNS}
+    array = np.asarray(ohlcv, dtype='float64')
+    return {c: array[:, i] for i, c in enumerate(OHLCV_COLUMNS)}
+
+
+def resample(cols, timeframe):
+    """Aggregates OHLCV columns into `timeframe` bars aligned like the exchange's (see timeframes.py)."""
+    ts = cols['timestamp']
+    if len(ts) == 0:
+        return cols
+    bucket = bar_open(ts, timeframe)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(bucket)) + 1))
+    ends = np.concatenate((starts[1:], [len(ts)])) - 1
+    return {
+        'timestamp': bucket[starts],
+        'open': cols['open'][starts],
+        'high': np.maximum.reduceat(cols['high'], starts),
+        'low': np.minimum.reduceat(cols['low'], starts),
+        'close': cols['close'][ends],
+        'volume': np.add.reduceat(cols['volume'], starts),
+    }
+
+
+def load_ohlcv(path):
+    """
+    Loads a CSV of timestamp(ms),open,high,low,close,volume, or a local candle store
+    series directory (e.g. `.candles/BTC-USDT/1h`, memory-mapped: no parsing).
+    """
+    if os.path.isdir(path):
+        return read_series(path)
+    df = pd.read_csv(path)
+    if 'timestamp' not in df.columns:
+        df = pd.read_csv(path, header=None, names=OHLCV_COLUMNS)
+    return to_columns(df)
+
+
+# --- RESULTS ---
+
+@dataclass
+class BacktestResult:
+    equity: np.ndarray              # Mark-to-market equity at every bar close
+    stops: np.ndarray               # Active trailing stop per bar (NaN when flat)
+    trades: pd.DataFrame            # One row per round trip
+    stats: dict = field(default_factory=dict)
+    panic_bars: list = field(default_factory=list)  # Bars where the panic switch fired
+
+    def report(self):
+        s = self.stats
+        print("\n--- 📈 APEX BACKTEST ---")
+        print(f"🕰️ Bars:          {s['bars']:,}")
+        print(f"💰 Final Equity:  ${s['final_equity']:,.2f}")
+        print(f"📊 Total Return:  {s['total_return'] * 100:.2f}%  (CAGR {s['cagr'] * 100:.2f}%)")
+        print(f"📉 Max Drawdown:  {s['max_drawdown'] * 100:.2f}%")
+        print(f"🔁 Trades:        {s['trades']}  (Win Rate {s['win_rate'] * 100:.1f}%)")
+        print(f"🔄 Turnover:      {s['turnover']:.2f}x  |  Fees: ${s['fees']:,.2f}")
+        print(f"🚨 Panic Sells:   {s['panics']}")
+
+
+# --- ENGINE ---
+
+def window_max(values, lo, hi):
+    """
+    max(values[lo[i]:hi[i]]) for every i (ranges must be non-empty), from a sparse table:
+    level k holds the max of each 2**k run, and any range is covered by two overlapping runs.
+    O(n log w) for ranges up to w long, whatever their starts.
+    """
+    length = hi - lo
+    level = np.frexp(length)[1] - 1         # floor(log2(length)), exact for integers
+    out = np.empty(len(lo))
+    table = np.asarray(values, dtype='float64')
+    for k in range(int(level.max()) + 1 if len(lo) else 0):
+        if k:
+            span = 1 << (k - 1)
+            table = np.maximum(table[:-span], table[span:])
+        sel = level == k
+        out[sel] = np.maximum(table[lo[sel]], table[hi[sel] - (1 << k)])
+    return out
+
+
+def _peaks(equity, timestamps, start, end, floor):
+    """
+    Rolling panic-window peak of `equity` at bars start..end-1: the max over every sample
+    at most 24h older (RollingMax with one sample per minute-aligned bar), never reaching
+    back before `floor` (RiskManager drops its peaks when it freezes).
+    """
+    lo = np.maximum(np.searchsorted(timestamps, timestamps[start:end] - PANIC_WINDOW_MS, side='left'), floor)
+    base = int(lo[0])
+    return window_max(equity[base:end], lo - base, np.arange(start, end) + 1 - base)
+
+
+def _panics(equity, timestamps, i, floor, params):
+    """True if RiskManager would panic on the equity sample at bar `i`."""
+    peak = _peaks(equity, timestamps, i, i + 1, floor)[0]
+    return (peak - equity[i]) / peak >= params.panic_threshold
+
+
+def _find_exit(cols, ind_exit, start, entry_price, stop, qty, cash, equity, floor, params, stops):
+    """
+    Scans forward from bar `start` for the first exit of an open position.
+    The trailing stop only moves up, and only while price is above entry (like the bot).
+    The stop is checked intrabar against the low; signal and panic exits fill at the close.
+    Marks the position to market in `equity` as it goes (the panic peak reads it back).
+    Returns (bar, reason, fill_price) or (None, 'open', None) at end of data.
+    """
+    n = len(cols['close'])
+    chunk = 256
+    while start < n:
+        end = min(n, start + chunk)
+        close = cols['close'][start:end]
+
+        # 1. Trailing stop path (stop_after[j] = stop after bar j's close)
+        candidate = np.where(close > entry_price, strategy.stop_level(close, ind_exit['ATR'][start:end], params), -np.inf)
+        stop_after = np.maximum.accumulate(np.maximum(candidate, stop))
+        stop_active = np.concatenate(([stop], stop_after[:-1]))
+        stop_hit = cols['low'][start:end] < stop_active
+
+        # 2. RiskManager drawdown from the rolling 24h peak equity
+        equity[start:end] = cash + qty * close
+        peaks = _peaks(equity, cols['timestamp'], start, end, floor)
+        panic = (peaks - equity[start:end]) / peaks >= params.panic_threshold
+
+        hit = stop_hit | panic | ind_exit['signal'][start:end]
+        stops[start:end] = stop_active
+        if hit.any():
+            j = int(np.argmax(hit))
+            stops[start + j + 1:end] = np.nan
+            if stop_hit[j]:
+                return start + j, 'stop', min(cols['open'][start + j], stop_active[j])
+            if panic[j]:
+                return start + j, 'panic', close[j]
+            return start + j, 'signal', close[j]
+
+        stop = stop_after[-1]
+        start = end
+        chunk *= 2
+    return None, 'open', None
+
+
+def run_backtest(ohlcv, params=DEFAULT_PARAMS, initial_capital=10_000.0, fee=0.001, indicators=None):
+    """
+    Simulates the Apex bot over `ohlcv` on bar closes.
+    `fee` is the taker fee per side. Pre-computed `indicators` (see compute_indicators)
+    can be passed in to share columns across runs.
+    """
+    cols = to_columns(ohlcv)
+    n = len(cols['close'])
+    ind = indicators if indicators is not None else compute_indicators(cols, params)
+
+    buy = np.asarray(strategy.buy_signal(ind, params), dtype=bool)
+    ind_exit = {
+        'ATR': ind['ATR'],
+        'signal': np.asarray(strategy.trend_reversal(ind) | strategy.momentum_crash(ind, params), dtype=bool),
+    }
+    entries = np.flatnonzero(buy)
+    timestamps = cols['timestamp']
+    cooldown_ms = params.cooldown_period * 1000
+
+    equity = np.full(n, float(initial_capital))
+    stops = np.full(n, np.nan)
+    trades = []
+    panic_bars = []
+
+    cash = float(initial_capital)
+    floor = 0           # Oldest bar the panic peak may look back to (moves to each thaw)
+    pos = 0             # First bar we may enter on
+    fees = notional = 0.0
+
+    while pos < n and cash > MIN_ORDER_USDT:
+        k = np.searchsorted(entries, pos)
+        if k == len(entries):
+            break
+        e = int(entries[k])
+        equity[pos:e] = cash
+
+        # ENTRY at the signal bar close
+        entry_price = cols['close'][e]
+        qty = (cash * INVEST_FRACTION) / entry_price
+        cost = qty * entry_price
+        entry_fee = cost * fee
+        cash_left = cash - cost - entry_fee
+        stop = strategy.stop_level(entry_price, ind['ATR'][e], params)
+        equity[e] = cash_left + qty * entry_price
+
+        if _panics(equity, timestamps, e, floor, params):
+            # The entry fee alone crossed the threshold: sold again at the same close
+            x, reason, fill = e, 'panic', entry_price
+        else:
+            x, reason, fill = _find_exit(cols, ind_exit, e + 1, entry_price, stop, qty, cash_left,
+                                         equity, floor, params, stops)
+
+        if x is None:
+            # Still in position at the end of the data: mark to market, no exit fill
+            fill = cols['close'][-1]
+            trades.append((timestamps[e], entry_price, timestamps[-1], fill, qty, reason,
+                           qty * (fill - entry_price) - entry_fee))
+            fees += entry_fee
+            notional += cost
+            cash = cash_left + qty * fill
+            pos = n
+            break
+
+        proceeds = qty * fill
+        exit_fee = proceeds * fee if qty > MIN_ORDER_BTC else 0.0
+        cash = cash_left + proceeds - exit_fee
+        equity[x] = cash
+        fees += entry_fee + exit_fee
+        notional += cost + proceeds
+        trades.append((timestamps[e], entry_price, timestamps[x], fill, qty, reason,
+                       proceeds - exit_fee - cost - entry_fee))
+        pos = x + 1
+
+        # A losing stop or signal exit can itself leave equity past the threshold: the
+        # next check panics with nothing left to sell, but the freeze is the same
+        if reason == 'panic' or _panics(equity, timestamps, x, floor, params):
+            # Emergency sell -> freeze, then the high-water mark restarts at the thaw
+            panic_bars.append(x)
+            pos = int(np.searchsorted(timestamps, timestamps[x] + cooldown_ms, side='right'))
+            floor = pos
+
+    if pos < n:
+        equity[pos:] = cash
+
+    trade_table = pd.DataFrame(trades, columns=['entry_time', 'entry_price', 'exit_time', 'exit_price', 'qty', 'reason', 'pnl'])
+    return BacktestResult(equity=equity, stops=stops, trades=trade_table,
+                          stats=summarize(equity, trade_table, timestamps, initial_capital, fees, notional),
+                          panic_bars=panic_bars)
+
+
+def check_risk(ohlcv, result, params=DEFAULT_PARAMS):
+    """
+    Replays `result.equity` through RiskManager.check_panic_condition, one sample per bar
+    close, and returns the bars where only one of the two panicked ([] when they agree).
+    Frozen bars are skipped and a fresh RiskManager starts at each thaw: its freeze clock
+    is wall time, and freezing drops every peak anyway.
+    """
+    timestamps = to_columns(ohlcv)['timestamp']
+    cooldown_ms = params.cooldown_period * 1000
+    threshold = Decimal(str(params.panic_threshold))
+
+    def fresh():
+        risk = RiskManager(None, panic_threshold=threshold, cooldown_period=params.cooldown_period)
+        risk.publish = lambda: None     # No status board here
+        return risk
+
+    risk, panics, thaw = fresh(), [], 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i, value in enumerate(result.equity):
+            if i < thaw:
+                continue
+            if risk.check_panic_condition(Decimal(str(value)), now=timestamps[i] / 1000):
+                panics.append(i)
+                thaw = int(np.searchsorted(timestamps, timestamps[i] + cooldown_ms, side='right'))
+                risk = fresh()
+    return sorted(set(panics) ^ set(result.panic_bars))
+
+
+def summarize(equity, trades, timestamps, initial_capital, fees=0.0, notional=0.0):
+    final = float(equity[-1]) if len(equity) else float(initial_capital)
+    running_peak = np.maximum.accumulate(equity) if len(equity) else np.array([initial_capital])
+    drawdown = 1.0 - equity / running_peak if len(equity) else np.zeros(1)
+    years = (timestamps[-1] - timestamps[0]) / (365.25 * 24 * 3600 * 1000) if len(timestamps) > 1 else 0
+    total_return = final / initial_capital - 1.0
+    return {
+        'bars': int(len(equity)),
+        'final_equity': final,
+        'total_return': total_return,
+        'cagr': (final / initial_capital) ** (1 / years) - 1.0 if years > 0 and final > 0 else 0.0,
+        'max_drawdown': float(drawdown.max()),
+        'trades': int(len(trades)),
+        'win_rate': float((trades['pnl'] > 0).mean()) if len(trades) else 0.0,
+        'turnover': notional / float(np.mean(equity)) if len(equity) else 0.0,
+        'fees': fees,
+        'panics': int((trades['reason'] == 'panic').sum()) if len(trades) else 0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest the Apex strategy on an OHLCV CSV")
+    parser.add_argument('csv', help="timestamp(ms),open,high,low,close,volume (or a candle store directory)")
+    parser.add_argument('--capital', type=float, default=10_000.0)
+    parser.add_argument('--fee', type=float, default=0.001)
+    parser.add_argument('--check-risk', action='store_true',
+                        help="Also replay the equity curve through RiskManager; exit 1 if their panics differ")
+    args = parser.parse_args(argv)
+
+    ohlcv = load_ohlcv(args.csv)
+    result = run_backtest(ohlcv, initial_capital=args.capital, fee=args.fee)
+    result.report()
+    if args.check_risk:
+        mismatched = check_risk(ohlcv, result)
+        if mismatched:
+            print(f"❌ RiskManager disagrees on {len(mismatched)} bar(s), first at {mismatched[0]}")
+            sys.exit(1)
+        print(f"✅ RiskManager agrees on all {len(result.panic_bars)} panic(s)")
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -1,88 +1,321 @@
-import ccxt
-import pandas as pd
-import pandas_ta as ta
 import time
+import threading
 import sys
 import os
-import requests
-import numpy as np
+import atexit
+import shutil
+import tempfile
 from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
 
 # --- PATH SETUP ---
 # CRITICAL: Allows the bot to see the 'backend' folder
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from trading_engine.risk_manager import RiskManager
+from trading_engine.cache import TTLCache
+from trading_engine.checkpoint import Checkpointer
+from trading_engine.execution import Executor
+from trading_engine.indicators import IndicatorEngine
+from trading_engine.timeframes import FETCH_LIMIT, TimeframeSet, bar_open
+from trading_engine import strategy
+from trading_engine.feeds import MarketState, BinanceStreamFeed, ReplayFeed
+from trading_engine import telemetry
 # CONNECT TO DATABASE: Fetches the total capital allocated by users
-from backend.app.services.pool_service import get_total_trading_pool
+from backend.app.services.pool_service import get_total_trading_pool, record_equity
 
 class QuantitativeBot:
-    def __init__(self):
+    def __init__(self, exchange=None):
         # 1. API CONFIGURATION
         self.api_key = os.getenv("BINANCE_API_KEY", "YOUR_KEY")
         self.secret = os.getenv("BINANCE_SECRET", "YOUR_SECRET")
         
-        self.exchange = ccxt.binance({
-            'apiKey': self.api_key,
-            'secret': self.secret,
-            'enableRateLimit': True,
-            'options': {'defaultType': 'spot'} 
-        })
+        # poll: REST every 15s | stream: WebSocket events (REST fallback) | replay: offline file
+        self.feed_mode = os.getenv("FEED_MODE", "poll")
+        self.replay_bars = None
+
+        # Any ccxt-compatible client can be injected (e.g. trading_engine.simulator).
+        # ccxt loads every exchange class on import (~0.5s), so it's only imported when needed.
+        if exchange is None and self.feed_mode == 'replay':
+            # Fully offline: balances, fills and fees come from the simulator, whose clock
+            # follows the replayed ticks (see run_stream)
+            from trading_engine.simulator import SimulatedExchange
+            self.replay_bars = ReplayFeed.load_csv(os.getenv("REPLAY_FILE", "candles.csv"))
+            exchange = SimulatedExchange(
+                self.replay_bars, timeframe=os.getenv("BASE_TIMEFRAME") or strategy.DEFAULT_PARAMS.timeframe,
+                ticks_per_bar=ReplayFeed.TICKS_PER_BAR, warmup_bars=0,
+            )
+        elif exchange is None:
+            import ccxt
+            exchange = ccxt.binance({
+                'apiKey': self.api_key,
+                'secret': self.secret,
+                'enableRateLimit': True,
+                # Spot only: skips the (much larger) futures exchangeInfo downloads in load_markets
+                'options': {'defaultType': 'spot', 'fetchMarkets': {'types': ['spot']}}
+            })
+        self.exchange = exchange
         
         # 2. STRATEGY SETTINGS (The "Apex" Config)
+        self.params = strategy.DEFAULT_PARAMS
         self.symbol = 'BTC/USDT'
-        self.timeframe = '1h'       # 1H gives cleaner signals than 15m
-        self.risk_manager = RiskManager(self.exchange)
+        self.timeframe = self.params.timeframe  # 1H gives cleaner signals than 15m
+        # Only BASE_TIMEFRAME candles are fetched; the strategy timeframe and any extra
+        # TIMEFRAMES (comma-separated, e.g. "4h,1d") are resampled from them in-process
+        self.base_timeframe = os.getenv("BASE_TIMEFRAME") or self.timeframe
+        self.timeframes = [tf for tf in os.getenv("TIMEFRAMES", "").split(",") if tf]
+        # Closed candles are kept on disk (trading_engine.candles), so a warm-up only downloads
+        # what's new since the last run. Opened lazily: it needs NumPy. Empty = disabled
+        # (always, in replay: replayed candles must not end up in the live store).
+        self.candle_root = os.getenv("CANDLE_STORE", ".candles") if self.feed_mode != 'replay' else ""
+        self.candles = None
+        # Pool-sized orders are sliced (twap | iceberg | pov) instead of sent as one market order
+        self.executor = Executor(
+            self.exchange,
+            style=os.getenv("EXECUTION_STYLE", "twap"),
+            duration=float(os.getenv("EXECUTION_DURATION", "300")),
+            clip_notional=float(os.getenv("EXECUTION_CLIP_USDT", "1000")),
+            participation=float(os.getenv("EXECUTION_PARTICIPATION", "0.1")),
+        )
+        self.risk_manager = RiskManager(
+            self.exchange,
+            panic_threshold=Decimal(str(self.params.panic_threshold)),
+            cooldown_period=self.params.cooldown_period,
+            executor=self.executor,
+        )
+        # One indicator engine per timeframe: self.indicators['4h'].latest
+        self.indicators = TimeframeSet(
+            lambda: IndicatorEngine(
+                self.params.ema_fast, self.params.ema_slow, self.params.rsi_length,
+                self.params.macd_fast, self.params.macd_slow, self.params.macd_signal,
+                self.params.atr_length, self.params.bb_length, self.params.bb_std,
+            ),
+            self.timeframe, self.base_timeframe, self.timeframes,
+        )
+        # Base candles used to warm up: 200 bars on the longest timeframe
+        self.history_limit = self.indicators.warmup_bars(200)
         
         # 3. STATE TRACKING
         self.entry_price = 0.0
         self.trailing_stop_price = 0.0
         self.in_position = False
+        self.usdt = 0.0
+        self.btc = 0.0
+        self.fng = 50
+        self.account_synced_at = 0.0
+
+        # 4. MARKET DATA MODE (self.feed_mode, above)
+        self.account_ttl = 60       # Seconds between REST balance syncs in stream mode
+        self.stream_timeout = 30    # Seconds of feed silence before a REST cycle
+
+        # 5. CONCURRENT I/O
+        # Per-call deadlines (seconds): late inputs are marked stale and replaced by the last value
+        # ('nav' is never waited on: the equity snapshot is written in the background)
+        self.deadlines = {'balance': 5.0, 'ticker': 3.0, 'pool': 2.0, 'candles': 5.0, 'fng': 2.0, 'nav': 2.0}
+        self.io_pool = ThreadPoolExecutor(max_workers=len(self.deadlines), thread_name_prefix='bot-io')
+        self.inflight = {}
+        self.last_inputs = {}
+        self.last_cycle = {}
+        self.indicators_lock = threading.Lock()  # fetch_data may outlive its deadline
+
+        # 6. CACHED EXTERNAL DATA (TTL + refresh-ahead + on-disk snapshot)
+        # A replay never reads or writes the live bot's files: no cache snapshot, and its
+        # checkpoints go to a throwaway directory (removed on exit)
+        state_file = os.getenv("BOT_STATE_FILE", ".bot_state.jsonl")
+        cache_file = os.getenv("BOT_CACHE_FILE", ".bot_cache.json")
+        if self.feed_mode == 'replay':
+            replay_dir = tempfile.mkdtemp(prefix='apex_replay_')
+            atexit.register(shutil.rmtree, replay_dir, True)
+            state_file, cache_file = os.path.join(replay_dir, 'state.jsonl'), None
+        self.cache = TTLCache(cache_file)
+        # Replays have no Fear & Greed history: neutral, and no network call
+        self.cache.register('fng', self._load_fear_greed if self.feed_mode != 'replay' else lambda: 50,
+                            ttl=60 * 60, max_stale=24 * 60 * 60)
+        self.cache.register('markets', self._load_markets, ttl=6 * 60 * 60, max_stale=24 * 60 * 60,
+                            on_load=self._apply_markets)
+        self.cache.register('fees', self._load_trading_fees, ttl=24 * 60 * 60)
+        self.cache.get('markets')
+        telemetry.STATUS.attach('cache', self.cache.stats)
+
+        # 7. WARM START (bot, risk and indicator state survive restarts)
+        self.checkpoints = Checkpointer(state_file)
+        self._checkpointed_bars = None
+        self.restore_state()
+
+        # 8. DEFERRED WARM-UP: the pool DB connection (and SQLAlchemy import) is opened in the
+        #    background; the first cycle picks up this call if it's still in flight
+        self._submit('pool', get_total_trading_pool)
         
         print("🚀 Gapeva Tier-3 'Apex': INITIALIZED")
-        print("🔗 Database Link: CONNECTED")
+        print("🔗 Database Link: CONNECTING")
         print("🎯 Strategy: Trend Following + Dynamic ATR Trailing Stop")
 
     def get_fundamentals(self):
         """Fetches Fear & Greed but allows trading in High Greed (Momentum)"""
-        try:
-            url = "https://api.alternative.me/fng/?limit=1"
-            response = requests.get(url, timeout=5)
-            data = response.json()
-            value = int(data['data'][0]['value'])
-            return value
-        except:
-            return 50
+        # The index changes once a day: served from cache, refreshed in the background
+        return self.cache.get('fng', default=50)
+
+    def _load_fear_greed(self):
+        import requests  # Deferred: only needed once the cached index expires
+        url = "https://api.alternative.me/fng/?limit=1"
+        response = requests.get(url, timeout=5)
+        data = response.json()
+        return int(data['data'][0]['value'])
+
+    def _load_markets(self):
+        # Only the traded pair is kept: the full exchange snapshot is megabytes of JSON
+        # to parse on every start, for thousands of markets the bot never touches
+        markets = self.exchange.load_markets(reload=True)
+        return {self.symbol: markets[self.symbol]} if self.symbol in markets else markets
+
+    def _apply_markets(self, markets):
+        # Also primes ccxt from the on-disk snapshot, so startup skips the markets download
+        self.exchange.set_markets(markets)
+
+    def _load_trading_fees(self):
+        fees = self.exchange.fetch_trading_fees()
+        fee = fees.get(self.symbol, {})
+        return {self.symbol: {'maker': fee.get('maker'), 'taker': fee.get('taker')}}
+
+    def get_trading_fee(self, side='taker'):
+        """Our fee rate on `self.symbol` (falls back to Binance's 0.1% base rate)."""
+        fees = self.cache.get('fees', default={}) or {}
+        return fees.get(self.symbol, {}).get(side) or 0.001
 
     def fetch_data(self):
-        """Fetches OHLCV and calculates Advanced Indicators"""
+        """
+        Syncs OHLCV into the streaming indicator engine.
+        History is only loaded to warm up (or after a gap), from the local candle store
+        topped up with whatever closed since; afterwards we fetch the last 2 candles and
+        update the indicators in O(1).
+        """
         try:
-            bars = self.exchange.fetch_ohlcv(self.symbol, timeframe=self.timeframe, limit=200)
-            df = pd.DataFrame(bars, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            
-            # --- INDICATORS ---
-            # 1. Trend: EMA 50 & 200
-            df['EMA_50'] = ta.ema(df['close'], length=50)
-            df['EMA_200'] = ta.ema(df['close'], length=200)
-            
-            # 2. Momentum: RSI & MACD
-            df['RSI'] = ta.rsi(df['close'], length=14)
-            macd = ta.macd(df['close'])
-            df['MACD'] = macd['MACD_12_26_9']
-            df['MACD_SIGNAL'] = macd['MACDs_12_26_9']
-            
-            # 3. Volatility: ATR (Average True Range) for Dynamic Stops
-            df['ATR'] = ta.atr(df['high'], df['low'], df['close'], length=14)
-            
-            # 4. Bollinger Bands (for Volatility Breakouts)
-            bb = ta.bbands(df['close'], length=20, std=2)
-            df['BB_UPPER'] = bb['BBU_20_2.0']
-            
-            return df
+            last_ts = self.indicators.last_timestamp
+            if last_ts is not None:
+                bars = self.exchange.fetch_ohlcv(self.symbol, timeframe=self.base_timeframe, limit=2)
+                # No overlap with what we have -> we missed candles, rebuild from scratch
+                if bars and bars[0][0] > last_ts:
+                    with self.indicators_lock:
+                        self.indicators.reset()
+                    last_ts = None
+                else:
+                    self._store_candles(bars)
+
+            if last_ts is None:
+                bars = self._history()
+
+            with self.indicators_lock, telemetry.ANALYZE.time():
+                return self.indicators.seed(bars)
         except Exception as e:
             print(f"⚠️ Data Error: {e}")
-            return pd.DataFrame()
+            return {}
+
+    def _candle_store(self):
+        if self.candles is None and self.candle_root:
+            from trading_engine.candles import CandleStore
+            self.candles = CandleStore(self.candle_root)
+        return self.candles
+
+    def _history(self):
+        """`history_limit` closed candles plus the forming one, downloading as little as possible."""
+        store = self._candle_store()
+        if store is not None:
+            try:
+                now = self.exchange.milliseconds()
+                step = self.exchange.parse_timeframe(self.base_timeframe) * 1000
+                # Long warm-ups (extra timeframes) are paginated from `since` on first use
+                store.sync(self.exchange, self.symbol, self.base_timeframe,
+                           since=now - (self.history_limit + 1) * step, now=now / 1000)
+                closed = store.tail(self.symbol, self.base_timeframe, self.history_limit)
+                recent = self.exchange.fetch_ohlcv(self.symbol, timeframe=self.base_timeframe, limit=2)
+                # Enough history, and no hole between the store and the live candles
+                if len(closed) >= self.history_limit - 1 and recent and closed[-1][0] + step >= recent[0][0]:
+                    # Same window as a plain fetch, so EMAs seed from the same first candle
+                    return (closed + [r for r in recent if r[0] > closed[-1][0]])[-self.history_limit:]
+            except Exception as e:
+                print(f"⚠️ Candle Store Error: {e}")
+        return self._fetch_history()
+
+    def _fetch_history(self):
+        """
+        Plain REST warm-up, same window as the store path. One call returns at most
+        FETCH_LIMIT candles, so longer warm-ups (e.g. 1m base with 4h indicators) are
+        paged forward from `since` up to the forming candle.
+        """
+        if self.history_limit <= FETCH_LIMIT:
+            return self.exchange.fetch_ohlcv(self.symbol, timeframe=self.base_timeframe, limit=self.history_limit)
+        step = self.exchange.parse_timeframe(self.base_timeframe) * 1000
+        forming = bar_open(self.exchange.milliseconds(), self.base_timeframe)
+        since = forming - (self.history_limit - 1) * step
+        bars = []
+        while since <= forming:
+            page = self.exchange.fetch_ohlcv(self.symbol, timeframe=self.base_timeframe, since=since, limit=FETCH_LIMIT)
+            page = [r for r in page if not bars or r[0] > bars[-1][0]]
+            if not page:
+                break
+            bars.extend(page)
+            since = page[-1][0] + step
+        if len(bars) < self.history_limit:
+            # e.g. a recent listing: the slowest indicators start cold
+            print(f"⚠️ Warm-up: only {len(bars)}/{self.history_limit} {self.base_timeframe} candles available")
+        return bars[-self.history_limit:]
+
+    def _store_candles(self, bars):
+        """Adds candles that closed since the last cycle to the store (no extra requests)."""
+        store = self._candle_store()
+        if store is None:
+            return
+        try:
+            store.append(self.symbol, self.base_timeframe, bars, now=self.exchange.milliseconds() / 1000)
+        except Exception as e:
+            print(f"⚠️ Candle Store Error: {e}")
+
+    def bot_state(self):
+        return {
+            'symbol': self.symbol,
+            'in_position': self.in_position,
+            'entry_price': self.entry_price,
+            'trailing_stop_price': self.trailing_stop_price,
+        }
+
+    def save_state(self):
+        """Checkpoints whatever changed since the last call. Cheap when nothing did."""
+        try:
+            self.checkpoints.save('bot', self.bot_state())
+            self.checkpoints.save('risk', self.risk_manager.state())
+            self.checkpoints.save('execution', self.executor.state())
+            # Indicator state only changes when a candle closes
+            if self.indicators.closed_bars != self._checkpointed_bars:
+                with self.indicators_lock:
+                    self.checkpoints.save('indicators', self.indicators.state())
+                    self._checkpointed_bars = self.indicators.closed_bars
+        except Exception as e:
+            print(f"⚠️ Checkpoint Error: {e}")
+
+    def restore_state(self):
+        started = time.perf_counter()
+        try:
+            saved = self.checkpoints.load()
+        except Exception as e:
+            print(f"⚠️ Checkpoint Unreadable, starting cold: {e}")
+            return
+
+        bot = saved.get('bot')
+        if bot and bot.get('symbol') == self.symbol:
+            self.in_position = bot['in_position']
+            self.entry_price = bot['entry_price']
+            self.trailing_stop_price = bot['trailing_stop_price']
+        if 'risk' in saved:
+            self.risk_manager.restore(saved['risk'])
+        if 'execution' in saved:
+            self.executor.restore(saved['execution'])
+        if 'indicators' in saved and self.indicators.restore(saved['indicators']):
+            self._checkpointed_bars = self.indicators.closed_bars
+
+        if saved:
+            print(f"♻️ Warm Start: restored {', '.join(saved)} in {(time.perf_counter() - started) * 1000:.1f}ms "
+                  f"(In Position: {self.in_position}, Stop: ${self.trailing_stop_price:.2f}, "
+                  f"Frozen: {self.risk_manager.is_frozen})")
 
     def update_trailing_stop(self, current_price, atr):
         """
@@ -90,86 +323,229 @@ class QuantitativeBot:
         Moves UP only, never down. Locks in profit as price rises.
         """
         # Tight Stop: 2x ATR (Approx 2-3% wiggle room)
-        new_stop = current_price - (atr * 2.0)
+        new_stop = strategy.stop_level(current_price, atr, self.params)
         
         if new_stop > self.trailing_stop_price:
             self.trailing_stop_price = new_stop
             print(f"🛡️ Trailing Stop Moved Up: ${self.trailing_stop_price:.2f}")
 
+    def fetch_balance(self):
+        balance = self.exchange.fetch_balance()
+        return float(balance['total']['USDT']), float(balance['total']['BTC'])
+
+    def fetch_price(self):
+        return float(self.exchange.fetch_ticker(self.symbol)['last'])
+
+    def _submit(self, name, source):
+        """Starts `source` in the I/O pool, unless the previous call for `name` is still running."""
+        future = self.inflight.get(name)
+        if future is None or future.done():
+            future = self.io_pool.submit(self._timed_input, name, source)
+            self.inflight[name] = future
+        return future
+
+    @staticmethod
+    def _timed_input(name, source):
+        with telemetry.INPUT[name].time():
+            return source()
+
+    def fan_out(self, names):
+        """
+        Issues the named inputs concurrently and waits for each one until its deadline,
+        so a cycle takes about as long as its slowest call (capped by the deadlines).
+        Returns (values, stale): late or failed inputs fall back to their last known
+        value (None if never fetched) and are listed in `stale`.
+        """
+        sources = {
+            'balance': self.fetch_balance,
+            'ticker': self.fetch_price,
+            'pool': get_total_trading_pool,
+            'candles': self.fetch_data,
+            'fng': self.get_fundamentals,
+        }
+        started = time.monotonic()
+        futures = {name: self._submit(name, sources[name]) for name in names}
+
+        values, stale = {}, []
+        for name, future in futures.items():
+            remaining = started + self.deadlines[name] - time.monotonic()
+            try:
+                value = future.result(timeout=max(0.0, remaining))
+            except Exception:
+                value = None
+            if value is None or value == {}:
+                stale.append(name)
+                value = self.last_inputs.get(name)
+            else:
+                self.last_inputs[name] = value
+            values[name] = value
+
+        self.last_cycle = {'latency': time.monotonic() - started, 'stale': stale}
+        if stale:
+            print(f"⚠️ Stale Inputs: {', '.join(stale)} (using last known values)")
+        return values, stale
+
+    def audit(self, values, stale, price=None):
+        """Solvency log + account state from fan-out results. Returns (usdt, btc, price) or None."""
+        # Never trade on an old price
+        if price is None:
+            if 'ticker' in stale:
+                print("Sync Error: no fresh price")
+                return None
+            price = values['ticker']
+        if values['balance'] is None:
+            print("Sync Error: balance unavailable")
+            return None
+
+        # 1. Get Reality (Binance) + 2. Get Truth (Database)
+        usdt, btc = values['balance']
+        db_pool_val = values['pool'] if values['pool'] is not None else Decimal("0.00")
+
+        # Calculate Total Equity
+        total_equity_val = Decimal(str(usdt)) + (Decimal(str(btc)) * Decimal(str(price)))
+
+        # 3. Audit Log
+        print(f"\n--- 🏦 SOLVENCY CHECK ---")
+        print(f"👥 User Deposits (DB): ${db_pool_val:,.2f}")
+        print(f"📉 Binance Equity:     ${total_equity_val:,.2f}")
+
+        self.usdt, self.btc = usdt, btc
+        if 'balance' in stale:
+            # A stale balance is still good enough for risk and exit checks,
+            # but never size a new entry from it
+            self.usdt = usdt = 0.0
+        else:
+            self.account_synced_at = time.time()
+            # Re-prices every user's pool units (one row write; skipped if the last one is in flight).
+            # Never from a replay: its equity is simulated.
+            if self.feed_mode != 'replay':
+                self._submit('nav', lambda: record_equity(total_equity_val))
+        return usdt, btc, price
+
+    def check_risk(self, usdt, btc, price):
+        """B. RISK CHECK (Panic Switch). Returns True if trading may continue."""
+        with telemetry.RISK.time():
+            return self._check_risk(usdt, btc, price)
+
+    def _check_risk(self, usdt, btc, price):
+        total_equity_val = Decimal(str(usdt)) + (Decimal(str(btc)) * Decimal(str(price)))
+
+        if self.risk_manager.check_panic_condition(total_equity_val):
+            self.risk_manager.trigger_emergency_sell([self.symbol])
+            self.in_position = False
+            self.account_synced_at = 0.0
+            telemetry.STATUS.report(self.symbol, price=float(price), frozen=True, in_position=False)
+            return False
+
+        if self.risk_manager.is_frozen:
+            print("❄️ FROZEN. Waiting for market to stabilize.")
+            telemetry.STATUS.report(self.symbol, price=float(price), frozen=True, in_position=self.in_position)
+            return False
+
+        return True
+
     def execute_strategy(self):
-        # A. SYNC MONEY (DATABASE + BINANCE)
-        try:
-            # 1. Get Reality (Binance)
-            balance = self.exchange.fetch_balance()
-            usdt = float(balance['total']['USDT'])
-            btc = float(balance['total']['BTC'])
-            ticker = self.exchange.fetch_ticker(self.symbol)
-            price = float(ticker['last'])
-            
-            # 2. Get Truth (Database)
-            # This connects to Gapeva DB to see how much users have deposited
-            db_pool_val = get_total_trading_pool() 
-            
-            # Calculate Total Equity
-            total_equity_val = Decimal(str(usdt)) + (Decimal(str(btc)) * Decimal(str(price)))
-            
-            # 3. Audit Log
-            print(f"\n--- 🏦 SOLVENCY CHECK ---")
-            print(f"👥 User Deposits (DB): ${db_pool_val:,.2f}")
-            print(f"📉 Binance Equity:     ${total_equity_val:,.2f}")
-            
-            # B. RISK CHECK (Panic Switch)
-            if self.risk_manager.check_panic_condition(total_equity_val):
-                self.risk_manager.trigger_emergency_sell()
-                self.in_position = False
-                return
+        """One polling cycle: concurrent REST/DB/HTTP fan-out, risk check, decision."""
+        with telemetry.CYCLE.time():
+            self._execute_strategy()
 
-            if self.risk_manager.is_frozen:
-                print("❄️ FROZEN. Waiting for market to stabilize.")
-                return
+    def _execute_strategy(self):
+        with telemetry.SYNC.time():
+            values, stale = self.fan_out(['balance', 'ticker', 'pool', 'candles', 'fng'])
+            account = self.audit(values, stale)
+        if account is None: return
+        usdt, btc, price = account
 
+        try:
+            if not self.check_risk(usdt, btc, price): return
         except Exception as e:
             print(f"Sync Error: {e}")
             return
 
-        # C. ANALYZE MARKET
-        df = self.fetch_data()
-        if df.empty: return
-        
-        curr = df.iloc[-1]
-        fng = self.get_fundamentals()
+        self.work_orders()
+
+        # C. ANALYZE MARKET (stale candles fall back to the last indicator snapshot)
+        curr = values['candles']
+        if not curr: return
         
+        self.fng = values['fng'] if values['fng'] is not None else 50
+        self.evaluate(curr, price, usdt, btc, self.fng)
+
+    def on_tick(self, price):
+        """
+        Streaming mode: runs stop/exit (and entry) checks on every price update.
+        Balances come from the last REST sync and are refreshed every `account_ttl`
+        seconds, or right after we trade.
+        """
+        with telemetry.CYCLE.time():
+            self._on_tick(price)
+
+    def _on_tick(self, price):
+        synced = False
+        if time.time() - self.account_synced_at > self.account_ttl:
+            with telemetry.SYNC.time():
+                values, stale = self.fan_out(['balance', 'pool', 'fng'])
+                account = self.audit(values, stale, price)
+            if account is None: return
+            self.fng = values['fng'] if values['fng'] is not None else 50
+            synced = True
+
+        # While frozen only re-check the thaw timer on account syncs, not every tick
+        if self.risk_manager.is_frozen and not synced: return
+
+        try:
+            if not self.check_risk(self.usdt, self.btc, price): return
+        except Exception as e:
+            print(f"Risk Check Error: {e}")
+            return
+
+        self.work_orders()
+
+        curr = self.indicators.latest
+        if not curr: return
+        self.evaluate(curr, price, self.usdt, self.btc, self.fng, verbose=synced)
+
+    def work_orders(self):
+        """Advances sliced orders (throttled inside the executor); resyncs balances after one finishes."""
+        with telemetry.EXECUTE.time():
+            finished = self.executor.step()
+        if finished:
+            self.account_synced_at = 0.0
+
+    def evaluate(self, curr, price, usdt, btc, fng, verbose=True):
         # D. TRADING LOGIC (APEX STRATEGY)
         
         # --- BUY CONDITIONS ---
-        bullish_trend = curr['EMA_50'] > curr['EMA_200']
-        momentum_up = curr['MACD'] > curr['MACD_SIGNAL']
-        safe_entry = curr['RSI'] < 75
-        volatility_breakout = curr['close'] > curr['BB_UPPER'] 
-        
-        buy_signal = (bullish_trend and momentum_up and safe_entry) or (volatility_breakout and momentum_up)
+        # Trend (EMA 50 > 200) + Momentum (MACD) + RSI cap, or a Bollinger breakout with momentum
+        with telemetry.DECIDE.time():
+            buy_signal = strategy.buy_signal(curr, self.params)
 
-        # --- SELL CONDITIONS ---
-        stop_hit = price < self.trailing_stop_price
-        trend_reversal = curr['EMA_50'] < curr['EMA_200']
-        momentum_crash = (curr['MACD'] < curr['MACD_SIGNAL']) and (curr['RSI'] > 75)
-        
-        sell_signal = stop_hit or trend_reversal or momentum_crash
+            # --- SELL CONDITIONS ---
+            stop_hit = price < self.trailing_stop_price
+            trend_reversal = strategy.trend_reversal(curr)
+            momentum_crash = strategy.momentum_crash(curr, self.params)
+
+            sell_signal = stop_hit or trend_reversal or momentum_crash
 
         # E. EXECUTION
-        print(f"📊 Price: ${price} | RSI: {curr['RSI']:.1f} | F&G: {fng} | Stop: ${self.trailing_stop_price:.2f}")
+        if verbose:
+            print(f"📊 Price: ${price} | RSI: {curr['RSI']:.1f} | F&G: {fng} | Stop: ${self.trailing_stop_price:.2f}")
 
         # ENTRY
         if buy_signal and usdt > 5 and not self.in_position:
             print("🟢 APEX BUY SIGNAL DETECTED")
-            qty = (usdt * 0.99) / price # Invest 99% of available USDT
+            # Invest 99% of available USDT (slippage buffer), net of our taker fee
+            budget = usdt * 0.99 / (1 + self.get_trading_fee())
+            qty = budget / price
             try:
-                self.exchange.create_market_buy_order(self.symbol, qty)
+                with telemetry.EXECUTE.time():
+                    self.executor.submit(self.symbol, 'buy', qty, budget=budget)
                 self.in_position = True
                 self.entry_price = price
+                self.account_synced_at = 0.0
                 # Initialize Trailing Stop
-                self.trailing_stop_price = price - (curr['ATR'] * 2.0)
-                print(f"✅ BOUGHT at ${price}. Initial Stop: ${self.trailing_stop_price}")
+                self.trailing_stop_price = strategy.stop_level(price, curr['ATR'], self.params)
+                print(f"✅ BUYING at ${price}. Initial Stop: ${self.trailing_stop_price}")
             except Exception as e:
                 print(f"❌ Buy Failed: {e}")
 
@@ -183,20 +559,97 @@ class QuantitativeBot:
             if sell_signal and btc > 0.0001:
                 print(f"🔴 EXIT SIGNAL (Stop Hit: {stop_hit}, Reversal: {trend_reversal})")
                 try:
-                    self.exchange.create_market_sell_order(self.symbol, btc)
+                    # An entry still being worked is abandoned; fills after the balance read stay as dust
+                    with telemetry.EXECUTE.time():
+                        if stop_hit:
+                            # A stop is protection, not a trade: immediate sweeps (like a panic
+                            # exit), never a passive schedule the price can run away from
+                            report = self.executor.liquidate(self.symbol, btc)
+                        else:
+                            self.executor.cancel(self.symbol)
+                            self.executor.submit(self.symbol, 'sell', btc)
+                    if stop_hit and report['status'] != 'closed':
+                        # Part of it is still held: keep the position and its stop, so the next
+                        # check (after a balance resync) sweeps the rest
+                        self.account_synced_at = 0.0
+                        raise RuntimeError(f"stop exit partially filled ({report['filled']:.6f}/{btc:.6f})")
                     self.in_position = False
                     self.trailing_stop_price = 0.0
-                    print(f"✅ SOLD at ${price}")
+                    self.account_synced_at = 0.0
+                    fee = self.get_trading_fee()
+                    pnl = price * (1 - fee) / (self.entry_price * (1 + fee)) - 1 if self.entry_price else 0.0
+                    print(f"✅ SELLING at ${price} | PnL after fees: {pnl:+.2%}")
                 except Exception as e:
                     print(f"❌ Sell Failed: {e}")
         
-        else:
+        elif verbose:
             print("⏳ Scanning for High-Probability Setup...")
 
-    def run(self):
+        telemetry.STATUS.report(self.symbol, price=float(price), rsi=float(curr['RSI']),
+                                stop=float(self.trailing_stop_price), frozen=self.risk_manager.is_frozen,
+                                in_position=self.in_position)
+
+    def make_feed(self):
+        """Builds the market-data feed selected by FEED_MODE (stream | replay | poll)."""
+        if self.feed_mode == 'replay':
+            return ReplayFeed(self.symbol, self.replay_bars or os.getenv("REPLAY_FILE", "candles.csv"),
+                              speed=float(os.getenv("REPLAY_SPEED", "0")))
+        return BinanceStreamFeed(self.symbol, self.base_timeframe,
+                                 config={'apiKey': self.api_key, 'secret': self.secret,
+                                         'options': {'defaultType': 'spot'}})
+
+    def run_stream(self):
+        """
+        Event-driven loop. Falls back to one REST cycle whenever the feed goes quiet
+        for `stream_timeout` seconds, and to full polling if the feed dies.
+        In replay mode the exchange is the simulator: it's moved to each replayed tick,
+        and nothing is fetched from the network.
+        """
+        feed = self.make_feed().start()
+        market = MarketState(self.indicators, self.exchange.parse_timeframe(self.base_timeframe) * 1000)
+        if self.feed_mode != 'replay':
+            self.fetch_data()  # Warm up indicators over REST once
+        print(f"📡 Streaming Mode: {type(feed).__name__}")
+
+        try:
+            while True:
+                event = feed.get(timeout=self.stream_timeout)
+                if event is None:
+                    print("⚠️ Feed silent. Running REST cycle.")
+                    self.execute_strategy()
+                    self.save_state()
+                    continue
+                if event['type'] == 'error':
+                    print(f"⚠️ Feed Down ({event['error']}). Falling back to polling.")
+                    break
+                if self.feed_mode == 'replay' and event['type'] == 'ticker':
+                    self.exchange.seek(event['timestamp'])
+                with self.indicators_lock, telemetry.ANALYZE.time():
+                    changed = market.apply(event)
+                if not changed:
+                    if market.needs_resync:
+                        if self.feed_mode == 'replay':
+                            # A hole in the file: warm up again from the bars after it
+                            with self.indicators_lock:
+                                self.indicators.reset()
+                        else:
+                            self.fetch_data()
+                        market.needs_resync = False
+                    continue
+                if event['type'] == 'ticker':
+                    self.on_tick(market.price)
+                self.save_state()
+        finally:
+            feed.stop()
+
+        if self.feed_mode != 'replay':
+            self.run_polling()
+
+    def run_polling(self):
         while True:
             try:
                 self.execute_strategy()
+                self.save_state()
                 time.sleep(15) # 15s Pulse
             except KeyboardInterrupt:
                 print("🛑 Bot Stopped by User")
@@ -205,6 +658,20 @@ class QuantitativeBot:
                 print(f"⚠️ Critical Loop Error: {e}")
                 time.sleep(30)
 
+    def run(self):
+        if self.feed_mode == 'poll':
+            return self.run_polling()
+        try:
+            self.run_stream()
+        except KeyboardInterrupt:
+            print("🛑 Bot Stopped by User")
+
 if __name__ == "__main__":
-    bot = QuantitativeBot()
-    bot.run()
+    telemetry.serve(int(os.getenv("METRICS_PORT", "9101")))
+    # Several pairs in SYMBOLS (comma-separated) -> one async multi-symbol engine
+    if len(os.getenv("SYMBOLS", "").split(",")) > 1:
+        from trading_engine.engine import main
+        main()
+    else:
+        bot = QuantitativeBot()
+        bot.run()
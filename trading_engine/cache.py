@@ -0,0 +1,138 @@
+import json
+import os
+import threading
+import time
+
+
+class CacheEntry:
+    def __init__(self, loader, ttl, refresh_ahead, max_stale, on_load):
+        self.loader = loader
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.max_stale = max_stale
+        self.on_load = on_load
+        self.value = None
+        self.loaded_at = None       # Wall-clock, so snapshots survive restarts
+        self.refreshing = False
+        self.failed_at = None       # Last failed synchronous load (for retry backoff)
+        self.lock = threading.Lock()
+
+
+class TTLCache:
+    """
+    Read-through cache for slow-changing external data.
+
+    Each key has its own loader and TTL:
+    - age < refresh_ahead * ttl          -> cached value
+    - refresh_ahead * ttl <= age < ttl   -> cached value, refreshed in the background
+    - ttl <= age < ttl + max_stale       -> stale value (stale-while-revalidate)
+    - missing / older than that          -> loaded synchronously
+    If a synchronous load fails, the last value (however old) is served rather than nothing,
+    and the loader isn't retried for `retry_after` seconds.
+    With `snapshot_path`, loaded values are persisted so a restart starts warm.
+    """
+    def __init__(self, snapshot_path=None, retry_after=60):
+        self.snapshot_path = snapshot_path
+        self.retry_after = retry_after
+        self.entries = {}
+        self._snapshot = self._read_snapshot()
+        self._write_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def register(self, key, loader, ttl, refresh_ahead=0.8, max_stale=None, on_load=None):
+        """
+        `on_load(value)` runs after every load, including one restored from the snapshot
+        (e.g. to push cached markets into the ccxt client).
+        """
+        entry = CacheEntry(loader, ttl, refresh_ahead, ttl if max_stale is None else max_stale, on_load)
+        saved = self._snapshot.get(key)
+        if saved is not None:
+            entry.value, entry.loaded_at = saved['value'], saved['loaded_at']
+            if on_load is not None:
+                on_load(entry.value)
+        self.entries[key] = entry
+        return self
+
+    def get(self, key, default=None):
+        entry = self.entries[key]
+        age = None if entry.loaded_at is None else time.time() - entry.loaded_at
+
+        if age is not None and age < entry.ttl + entry.max_stale:
+            self.hits += 1
+            if age >= entry.ttl * entry.refresh_ahead:
+                self._refresh_in_background(key, entry)
+            return entry.value
+
+        self.misses += 1
+        fallback = entry.value if entry.value is not None else default
+        if entry.failed_at is not None and time.time() - entry.failed_at < self.retry_after:
+            return fallback
+        try:
+            return self._load(key, entry)
+        except Exception as e:
+            entry.failed_at = time.time()
+            print(f"⚠️ Cache Load Error ({key}): {e}")
+            return fallback
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"size": len(self.entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0}
+
+    def invalidate(self, key):
+        self.entries[key].loaded_at = None
+        self.entries[key].failed_at = None
+
+    def _load(self, key, entry):
+        with entry.lock:
+            value = entry.loader()
+            entry.value, entry.loaded_at, entry.failed_at = value, time.time(), None
+        if entry.on_load is not None:
+            entry.on_load(value)
+        self._write_snapshot()
+        return value
+
+    def _refresh_in_background(self, key, entry):
+        with entry.lock:
+            if entry.refreshing:
+                return
+            entry.refreshing = True
+
+        def refresh():
+            try:
+                self._load(key, entry)
+            except Exception as e:
+                print(f"⚠️ Cache Refresh Error ({key}): {e}")
+            finally:
+                entry.refreshing = False
+
+        threading.Thread(target=refresh, name=f"cache-{key}", daemon=True).start()
+
+    # --- SNAPSHOT ---
+
+    def _read_snapshot(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return {}
+        try:
+            with open(self.snapshot_path) as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️ Cache Snapshot Unreadable: {e}")
+            return {}
+
+    def _write_snapshot(self):
+        if not self.snapshot_path:
+            return
+        data = {
+            key: {'value': entry.value, 'loaded_at': entry.loaded_at}
+            for key, entry in self.entries.items() if entry.loaded_at is not None
+        }
+        with self._write_lock:
+            tmp = f"{self.snapshot_path}.tmp"
+            try:
+                with open(tmp, 'w') as f:
+                    json.dump(data, f, default=str)
+                os.replace(tmp, self.snapshot_path)  # Atomic: never a half-written snapshot
+            except Exception as e:
+                print(f"⚠️ Cache Snapshot Failed: {e}")
@@ -0,0 +1,280 @@
+"""
+Local OHLCV store: one directory per (symbol, timeframe), one memory-mapped float64 file
+per column.
+
+    .candles/BTC-USDT/1h/meta.json         {"count": n, "generation": g, "holes": [...]}
+    .candles/BTC-USDT/1h/g{g}/timestamp.f8 (open.f8, high.f8, ... volume.f8)
+
+- Only closed candles are stored, in timestamp order, without duplicates.
+- Appends write the new rows at the end of each column file, then publish the new row
+  count in meta.json (atomic rename). Rows past `count` (a crash mid-append) are ignored
+  and truncated on the next write. Appends aren't fsynced (candles can be downloaded
+  again): if a power loss leaves a column shorter than `count`, the series is cut back
+  to the rows every column has.
+- `sync()` fetches only the candles after the last stored one, then looks for gaps
+  (consecutive timestamps more than one bar apart) and backfills them. Backfilled rows are
+  merged into a new generation directory, which meta.json then points to, so readers
+  never see a half-rewritten file. Gaps the exchange has no data for (maintenance
+  windows) are remembered as holes and not requested again.
+- `columns()` returns read-only memmap slices: no copy, and the OS page cache is shared
+  between the live bot, backtests and optimizer workers.
+
+Usage:
+    python -m trading_engine.candles sync BTC/USDT 1h --since 2024-01-01
+    python -m trading_engine.candles info BTC/USDT 1h
+    python -m trading_engine.backtest .candles/BTC-USDT/1h
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from trading_engine.timeframes import FETCH_LIMIT, timeframe_ms
+
+COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+
+class CandleSeries:
+    """One (symbol, timeframe) on disk. Not thread-safe on its own: CandleStore locks around it."""
+    def __init__(self, path, timeframe):
+        self.path = path
+        self.step = timeframe_ms(timeframe)
+        self.meta = {'count': 0, 'generation': 0, 'holes': []}
+        meta_path = os.path.join(path, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta.update(json.load(f))
+        if self.meta['count']:
+            on_disk = min(os.path.getsize(self._column_path(c)) // 8 for c in COLUMNS)
+            self.meta['count'] = min(self.meta['count'], on_disk)
+        self._maps = None   # (count, generation, {column: memmap})
+        # Kept in memory: the live bot appends every cycle and shouldn't re-map to read it
+        self.last_timestamp = int(self.columns()['timestamp'][-1]) if len(self) else None
+
+    def __len__(self):
+        return self.meta['count']
+
+    def _column_path(self, column, generation=None):
+        generation = self.meta['generation'] if generation is None else generation
+        return os.path.join(self.path, f"g{generation}", f"{column}.f8")
+
+    def _publish(self, durable=False, **changes):
+        meta = {**self.meta, **changes}
+        tmp = os.path.join(self.path, 'meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.path, 'meta.json'))  # Atomic: the commit point
+        self.meta = meta
+
+    def columns(self):
+        """{column: read-only float64 memmap} over the stored rows (re-mapped after writes)."""
+        count, generation = self.meta['count'], self.meta['generation']
+        if self._maps is None or self._maps[:2] != (count, generation):
+            if count == 0:
+                maps = {c: np.empty(0, dtype='float64') for c in COLUMNS}
+            else:
+                maps = {c: np.memmap(self._column_path(c), dtype='float64', mode='r', shape=(count,))
+                        for c in COLUMNS}
+            self._maps = (count, generation, maps)
+        return self._maps[2]
+
+    def append(self, rows):
+        """Appends closed candles newer than the last stored one. Returns how many were added."""
+        last = self.last_timestamp
+        array = np.asarray([r[:6] for r in rows if last is None or r[0] > last], dtype='float64')
+        if len(array) == 0:
+            return 0
+        array = array[np.argsort(array[:, 0], kind='stable')]
+        array = array[np.concatenate(([True], np.diff(array[:, 0]) > 0))]  # Drop duplicates
+
+        os.makedirs(os.path.dirname(self._column_path('timestamp')), exist_ok=True)
+        size = self.meta['count'] * 8
+        for i, column in enumerate(COLUMNS):
+            with open(self._column_path(column), 'ab') as f:
+                f.truncate(size)    # Drop rows from an append that never got published
+                f.write(np.ascontiguousarray(array[:, i]).tobytes())
+        self._publish(count=self.meta['count'] + len(array))
+        self.last_timestamp = int(array[-1, 0])
+        return len(array)
+
+    def merge(self, rows):
+        """Inserts candles anywhere in the series (gap backfill): rewrites into a new generation."""
+        if not rows:
+            return 0
+        stored = np.column_stack([self.columns()[c] for c in COLUMNS]) if len(self) else np.empty((0, 6))
+        incoming = np.asarray([r[:6] for r in rows], dtype='float64')
+        merged = np.concatenate((stored, incoming))
+        # Stable sort keeps the stored row first when a timestamp is both stored and fetched
+        merged = merged[np.argsort(merged[:, 0], kind='stable')]
+        merged = merged[np.concatenate(([True], np.diff(merged[:, 0]) > 0))]
+        added = len(merged) - len(stored)
+        if added == 0:
+            return 0
+
+        old_generation, generation = self.meta['generation'], self.meta['generation'] + 1
+        os.makedirs(os.path.dirname(self._column_path('timestamp', generation)), exist_ok=True)
+        for i, column in enumerate(COLUMNS):
+            with open(self._column_path(column, generation), 'wb') as f:
+                f.write(np.ascontiguousarray(merged[:, i]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        # Durable before the old generation is deleted: meta.json must never point at it
+        self._publish(durable=True, count=len(merged), generation=generation)
+        self.last_timestamp = int(merged[-1, 0])
+        # Open memmaps of the old files stay valid after unlinking (POSIX)
+        shutil.rmtree(os.path.join(self.path, f"g{old_generation}"), ignore_errors=True)
+        return added
+
+    def gaps(self):
+        """Missing ranges [(first missing timestamp, next stored timestamp)], known holes excluded."""
+        ts = self.columns()['timestamp']
+        if len(ts) < 2:
+            return []
+        holes = {tuple(h) for h in self.meta['holes']}
+        idx = np.flatnonzero(np.diff(ts) > self.step)
+        gaps = [(int(ts[i]) + self.step, int(ts[i + 1])) for i in idx]
+        return [g for g in gaps if g not in holes]
+
+    def mark_hole(self, gap):
+        self._publish(holes=self.meta['holes'] + [list(gap)])
+
+
+class CandleStore:
+    """
+    Candle series under one root directory. Thread-safe: the bot syncs from its I/O
+    pool while other threads read.
+    """
+    def __init__(self, root=".candles"):
+        self.root = root
+        self.series = {}
+        self.lock = threading.RLock()
+
+    def get(self, symbol, timeframe):
+        key = (symbol, timeframe)
+        with self.lock:
+            if key not in self.series:
+                path = os.path.join(self.root, symbol.replace('/', '-'), timeframe)
+                os.makedirs(path, exist_ok=True)
+                self.series[key] = CandleSeries(path, timeframe)
+            return self.series[key]
+
+    def columns(self, symbol, timeframe, start=None, end=None):
+        """
+        Zero-copy view of [start, end) (ms timestamps, None = open-ended):
+        {column: read-only float64 array}.
+        """
+        with self.lock:
+            cols = self.get(symbol, timeframe).columns()
+        ts = cols['timestamp']
+        lo = 0 if start is None else int(np.searchsorted(ts, start, 'left'))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, end, 'left'))
+        return {c: cols[c][lo:hi] for c in COLUMNS}
+
+    def tail(self, symbol, timeframe, limit):
+        """Last `limit` closed candles as ccxt rows ([ts, o, h, l, c, v])."""
+        with self.lock:
+            cols = self.get(symbol, timeframe).columns()
+            rows = np.column_stack([cols[c][-limit:] for c in COLUMNS]).tolist()
+        for row in rows:
+            row[0] = int(row[0])
+        return rows
+
+    def append(self, symbol, timeframe, rows, now=None):
+        """Stores the closed candles among `rows` (e.g. the live bot's latest fetch)."""
+        with self.lock:
+            series = self.get(symbol, timeframe)
+            return series.append(self._closed(rows, series.step, now))
+
+    def sync(self, exchange, symbol, timeframe, since=None, now=None, backfill=True, limit=FETCH_LIMIT):
+        """
+        Brings the series up to date: fetches only candles after the last stored one
+        (or from `since` for an empty series), then backfills gaps, including the range
+        from `since` to the first stored candle. Returns the number of candles added.
+        """
+        with self.lock:
+            series = self.get(symbol, timeframe)
+            last = series.last_timestamp
+            start = last + series.step if last is not None else since
+            added = series.append(self._fetch_range(exchange, symbol, timeframe, start, None, now, limit))
+            if backfill:
+                gaps = series.gaps()
+                first = int(series.columns()['timestamp'][0]) if len(series) else None
+                if since is not None and first is not None and since < first:
+                    gaps.insert(0, (since, first))  # History requested from further back
+                for gap in gaps:
+                    rows = self._fetch_range(exchange, symbol, timeframe, gap[0], gap[1], now, limit)
+                    filled = series.merge(rows)
+                    if filled == 0:
+                        series.mark_hole(gap)   # Exchange has nothing there: don't ask again
+                    added += filled
+            return added
+
+    def _fetch_range(self, exchange, symbol, timeframe, start, end, now, limit):
+        """Closed candles from `start` up to `end` (exclusive), paginated."""
+        step = timeframe_ms(timeframe)
+        rows = []
+        while True:
+            page = exchange.fetch_ohlcv(symbol, timeframe=timeframe, since=start, limit=limit)
+            batch = [r for r in self._closed(page, step, now)
+                     if (start is None or r[0] >= start) and (end is None or r[0] < end)]
+            if not batch:
+                return rows
+            rows.extend(batch)
+            start = batch[-1][0] + step
+            if len(page) < limit or (end is not None and start >= end):
+                return rows  # Caught up (a full page means there may be more)
+
+    @staticmethod
+    def _closed(rows, step, now=None):
+        now_ms = (time.time() if now is None else now) * 1000
+        return [r for r in rows if r[0] + step <= now_ms]
+
+
+def read_series(path):
+    """Opens a series directory directly (e.g. `.candles/BTC-USDT/1h`) as memmapped columns."""
+    return CandleSeries(path, os.path.basename(os.path.normpath(path))).columns()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync or inspect the local OHLCV store")
+    parser.add_argument('command', choices=['sync', 'info'])
+    parser.add_argument('symbol')
+    parser.add_argument('timeframe')
+    parser.add_argument('--root', default=os.getenv("CANDLE_STORE", ".candles"))
+    parser.add_argument('--since', help="First candle for an empty series (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    store = CandleStore(args.root)
+    if args.command == 'sync':
+        import ccxt
+        exchange = ccxt.binance({'enableRateLimit': True, 'options': {'defaultType': 'spot'}})
+        since = None
+        if args.since:
+            since = int(datetime.strptime(args.since, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp() * 1000)
+        started = time.perf_counter()
+        added = store.sync(exchange, args.symbol, args.timeframe, since=since)
+        print(f"⬇️ {args.symbol} {args.timeframe}: +{added} candles in {time.perf_counter() - started:.1f}s")
+
+    series = store.get(args.symbol, args.timeframe)
+    ts = series.columns()['timestamp']
+    if len(ts):
+        first, last = (datetime.fromtimestamp(t / 1000, timezone.utc).isoformat() for t in (ts[0], ts[-1]))
+        print(f"🗄️ {series.path}: {len(ts):,} candles, {first} .. {last}, "
+              f"{len(series.gaps())} gaps, {len(series.meta['holes'])} known holes")
+    else:
+        print(f"🗄️ {series.path}: empty")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import json
+import os
+import time
+
+
+class Checkpointer:
+    """
+    Crash-safe, append-only state journal.
+
+    Each `save(kind, state)` appends one JSON line (only if that state changed since the
+    last write) and fsyncs it, so a crash loses at most the record being written. A torn
+    last line is dropped (and truncated away) on load. Once the journal holds `compact_every` records it
+    is rewritten atomically with just the latest record of each kind.
+    """
+    def __init__(self, path, compact_every=1000):
+        self.path = path
+        self.compact_every = compact_every
+        self.latest = {}
+        self.records = 0
+        self._file = None
+
+    def load(self):
+        """
+        Replays the journal and returns {kind: latest state}. A torn last line is cut off
+        the file, so the next save() starts on a fresh line instead of appending to it.
+        """
+        self.latest, self.records = {}, 0
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                data = f.read()
+            good = 0    # End of the last complete line
+            for line in data.splitlines(keepends=True):
+                if not line.endswith(b"\n"):
+                    break  # Torn write from a crash
+                good += len(line)
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self.latest[record['kind']] = record['state']
+                self.records += 1
+            if good < len(data):
+                with open(self.path, 'r+b') as f:
+                    f.truncate(good)
+                    os.fsync(f.fileno())
+        return dict(self.latest)
+
+    def save(self, kind, state):
+        """Appends `state` under `kind` if it changed. Returns True if a record was written."""
+        if self.latest.get(kind) == state:
+            return False
+        if self._file is None:
+            self._file = open(self.path, 'a')
+        self._file.write(json.dumps({'kind': kind, 'at': time.time(), 'state': state}) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.latest[kind] = state
+        self.records += 1
+        if self.records >= self.compact_every:
+            self.compact()
+        return True
+
+    def compact(self):
+        """Rewrites the journal with one record per kind (write to temp file, then atomic rename)."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            for kind, state in self.latest.items():
+                f.write(json.dumps({'kind': kind, 'at': time.time(), 'state': state}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self.records = len(self.latest)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,253 @@
+"""
+Multi-symbol Apex engine.
+
+One process, one async ccxt client and one shared rate-limit budget for N symbols.
+Each cycle makes one balance call and one batched ticker call for the whole portfolio,
+then syncs every symbol's candles concurrently, so cycle latency stays roughly flat as
+symbols are added (until the shared budget is the bottleneck).
+
+Usage:
+    SYMBOLS=BTC/USDT,ETH/USDT,SOL/USDT python -m trading_engine.engine
+"""
+import asyncio
+import os
+import sys
+import time
+from decimal import Decimal
+
+import ccxt.async_support as ccxt_async
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from trading_engine import strategy
+from trading_engine.indicators import IndicatorEngine
+from trading_engine.rate_limiter import TokenBucket, RateLimitedExchange
+from trading_engine.risk_manager import RiskManager
+from trading_engine import telemetry
+from backend.app.services.pool_service import get_total_trading_pool, record_equity
+
+QUOTE = 'USDT'
+
+
+class SymbolTrader:
+    """Per-symbol position state and indicators."""
+    def __init__(self, symbol, params=strategy.DEFAULT_PARAMS, history_limit=200):
+        self.symbol = symbol
+        self.base = symbol.split('/')[0]
+        self.params = params
+        self.history_limit = history_limit
+        self.indicators = IndicatorEngine(
+            params.ema_fast, params.ema_slow, params.rsi_length,
+            params.macd_fast, params.macd_slow, params.macd_signal,
+            params.atr_length, params.bb_length, params.bb_std,
+        )
+
+        # STATE TRACKING
+        self.entry_price = 0.0
+        self.trailing_stop_price = 0.0
+        self.in_position = False
+
+    async def sync_candles(self, exchange):
+        """Same as QuantitativeBot.fetch_data: full history only for warm-up or after a gap."""
+        try:
+            last_ts = self.indicators.last_timestamp
+            if last_ts is not None:
+                bars = await exchange.fetch_ohlcv(self.symbol, timeframe=self.params.timeframe, limit=2)
+                if bars and bars[0][0] > last_ts:
+                    self.indicators.reset()
+                    last_ts = None
+            if last_ts is None:
+                bars = await exchange.fetch_ohlcv(self.symbol, timeframe=self.params.timeframe,
+                                                  limit=self.history_limit)
+            return self.indicators.seed(bars)
+        except Exception as e:
+            print(f"⚠️ [{self.symbol}] Data Error: {e}")
+            return {}
+
+    def decide(self, price, base_amount):
+        """
+        Apex rules for one symbol. Returns 'buy', 'sell' or None.
+        Also ratchets the trailing stop while in position.
+        """
+        curr = self.indicators.latest
+        if not curr:
+            return None
+
+        if not self.in_position:
+            return 'buy' if strategy.buy_signal(curr, self.params) else None
+
+        if price > self.entry_price:
+            new_stop = strategy.stop_level(price, curr['ATR'], self.params)
+            if new_stop > self.trailing_stop_price:
+                self.trailing_stop_price = new_stop
+                print(f"🛡️ [{self.symbol}] Trailing Stop Moved Up: ${self.trailing_stop_price:.2f}")
+
+        stop_hit = price < self.trailing_stop_price
+        sell_signal = stop_hit or strategy.trend_reversal(curr) or strategy.momentum_crash(curr, self.params)
+        return 'sell' if sell_signal and base_amount > 0.0001 else None
+
+    async def buy(self, exchange, spend, price):
+        qty = spend / price
+        try:
+            await exchange.create_market_buy_order(self.symbol, qty)
+            telemetry.ORDERS.inc(side='buy', kind='market')
+            self.in_position = True
+            self.entry_price = price
+            self.trailing_stop_price = strategy.stop_level(price, self.indicators.latest['ATR'], self.params)
+            print(f"✅ [{self.symbol}] BOUGHT {qty:.6f} at ${price}. Initial Stop: ${self.trailing_stop_price:.2f}")
+        except Exception as e:
+            telemetry.REJECTIONS.inc(reason=type(e).__name__)
+            print(f"❌ [{self.symbol}] Buy Failed: {e}")
+
+    async def sell(self, exchange, amount, price):
+        try:
+            await exchange.create_market_sell_order(self.symbol, amount)
+            telemetry.ORDERS.inc(side='sell', kind='market')
+            self.in_position = False
+            self.trailing_stop_price = 0.0
+            print(f"✅ [{self.symbol}] SOLD {amount} at ${price}")
+        except Exception as e:
+            telemetry.REJECTIONS.inc(reason=type(e).__name__)
+            print(f"❌ [{self.symbol}] Sell Failed: {e}")
+
+
+class PortfolioEngine:
+    """
+    Trades several symbols concurrently.
+    Capital allocation: each symbol may hold at most `weights[symbol]` of total equity
+    (equal weights by default); entries in the same cycle draw from one USDT pool so
+    they can never overspend the free balance.
+    """
+    def __init__(self, symbols, params=strategy.DEFAULT_PARAMS, weights=None,
+                 weight_per_minute=1200, burst=100, pulse=15):
+        self.symbols = list(symbols)
+        self.params = params
+        self.weights = weights or {s: 1.0 / len(self.symbols) for s in self.symbols}
+        self.pulse = pulse
+
+        raw = ccxt_async.binance({
+            'apiKey': os.getenv("BINANCE_API_KEY", "YOUR_KEY"),
+            'secret': os.getenv("BINANCE_SECRET", "YOUR_SECRET"),
+            'enableRateLimit': False,   # The shared bucket below does the limiting
+            'options': {'defaultType': 'spot'},
+        })
+        self.bucket = TokenBucket(rate=weight_per_minute / 60.0, capacity=burst)
+        self.exchange = RateLimitedExchange(raw, self.bucket)
+        self.nav_task = None    # Background NAV write (one pool row) from the last cycle
+        self.risk_manager = RiskManager(
+            self.exchange,
+            panic_threshold=Decimal(str(params.panic_threshold)),
+            cooldown_period=params.cooldown_period,
+        )
+        self.traders = {s: SymbolTrader(s, params) for s in self.symbols}
+
+        print(f"🚀 Gapeva Multi-Symbol 'Apex': {', '.join(self.symbols)}")
+
+    async def cycle(self):
+        ex = self.exchange
+
+        # A. SYNC MONEY: one balance call + one batched ticker call for every symbol
+        try:
+            balance, tickers, db_pool_val = await asyncio.gather(
+                ex.fetch_balance(),
+                ex.fetch_tickers(self.symbols),
+                asyncio.to_thread(get_total_trading_pool),
+            )
+        except Exception as e:
+            print(f"Sync Error: {e}")
+            return
+
+        totals = balance.get('total', {})
+        usdt = float(totals.get(QUOTE, 0) or 0)
+        holdings = {s: float(totals.get(t.base, 0) or 0) for s, t in self.traders.items()}
+        prices = {s: float(tickers[s]['last']) for s in self.symbols if s in tickers}
+        exposure = {s: holdings[s] * prices.get(s, 0.0) for s in self.symbols}
+        total_equity_val = Decimal(str(usdt)) + sum(Decimal(str(v)) for v in exposure.values())
+
+        print(f"\n--- 🏦 SOLVENCY CHECK ---")
+        print(f"👥 User Deposits (DB): ${db_pool_val:,.2f}")
+        print(f"📉 Binance Equity:     ${total_equity_val:,.2f}")
+        # Re-prices every user's pool units; never waited on, skipped while the last one runs
+        if self.nav_task is None or self.nav_task.done():
+            self.nav_task = asyncio.create_task(asyncio.to_thread(record_equity, total_equity_val))
+
+        # B. RISK CHECK (Panic Switch) on the whole portfolio
+        if self.risk_manager.check_panic_condition(total_equity_val):
+            await self.risk_manager.trigger_emergency_sell_async(self.symbols)
+            for trader in self.traders.values():
+                trader.in_position = False
+                trader.trailing_stop_price = 0.0
+            self.report(prices)
+            return
+        if self.risk_manager.is_frozen:
+            print("❄️ FROZEN. Waiting for market to stabilize.")
+            self.report(prices)
+            return
+
+        # C. ANALYZE MARKET (all symbols at once)
+        active = [t for s, t in self.traders.items() if s in prices]
+        await asyncio.gather(*(t.sync_candles(ex) for t in active))
+
+        # D. DECIDE, reserving USDT for entries so they can't overspend together
+        available = usdt
+        orders = []
+        for trader in active:
+            price = prices[trader.symbol]
+            action = trader.decide(price, holdings[trader.symbol])
+            curr = trader.indicators.latest
+            if curr:
+                print(f"📊 [{trader.symbol}] ${price} | RSI: {curr['RSI']:.1f} | Stop: ${trader.trailing_stop_price:.2f}")
+
+            if action == 'buy':
+                budget = float(total_equity_val) * self.weights[trader.symbol] - exposure[trader.symbol]
+                spend = min(budget, available) * 0.99
+                if spend > 5:
+                    available -= spend
+                    orders.append(trader.buy(ex, spend, price))
+            elif action == 'sell':
+                orders.append(trader.sell(ex, holdings[trader.symbol], price))
+
+        # E. EXECUTION (concurrently)
+        if orders:
+            await asyncio.gather(*orders)
+        self.report(prices)
+
+    def report(self, prices):
+        """Publishes each symbol's state on the status board (GET /status on the metrics port)."""
+        for symbol, trader in self.traders.items():
+            if symbol not in prices:
+                continue
+            curr = trader.indicators.latest
+            fields = {'rsi': float(curr['RSI'])} if curr else {}
+            telemetry.STATUS.report(symbol, price=prices[symbol], stop=float(trader.trailing_stop_price),
+                                    frozen=self.risk_manager.is_frozen, in_position=trader.in_position, **fields)
+
+    async def run(self):
+        try:
+            await self.exchange.load_markets()
+            while True:
+                started = time.perf_counter()
+                try:
+                    await self.cycle()
+                except Exception as e:
+                    print(f"⚠️ Critical Loop Error: {e}")
+                elapsed = time.perf_counter() - started
+                telemetry.CYCLE.observe(elapsed)
+                print(f"⏱️ Cycle: {elapsed * 1000:.0f}ms for {len(self.symbols)} symbols "
+                      f"(throttled {self.bucket.waited:.1f}s total)")
+                await asyncio.sleep(max(0.0, self.pulse - elapsed))
+        finally:
+            await self.exchange.close()
+
+
+def main():
+    symbols = [s.strip() for s in os.getenv("SYMBOLS", "BTC/USDT").split(",") if s.strip()]
+    engine = PortfolioEngine(symbols, weight_per_minute=int(os.getenv("RATE_LIMIT_WEIGHT_PER_MIN", "1200")))
+    try:
+        asyncio.run(engine.run())
+    except KeyboardInterrupt:
+        print("🛑 Engine Stopped by User")
+
+
+if __name__ == "__main__":
+    main()
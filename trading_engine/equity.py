@@ -0,0 +1,82 @@
+from array import array
+from collections import deque
+
+
+class RollingMax:
+    """
+    Maximum over a sliding time window, amortized O(1) per sample (monotonic deque).
+
+    Samples inside the same `resolution`-second bucket collapse into one entry, so the
+    deque never holds more than window / resolution entries, however fast samples arrive.
+    """
+    def __init__(self, window, resolution=60):
+        self.window = window
+        self.resolution = resolution
+        self.entries = deque()      # (bucket start, value), values strictly decreasing
+
+    def push(self, ts, value):
+        bucket = ts - ts % self.resolution
+        entries = self.entries
+        while entries and entries[-1][1] <= value:
+            entries.pop()
+        if not entries or entries[-1][0] != bucket:
+            entries.append((bucket, value))
+        # Evict whole buckets that are out of the window
+        while entries[0][0] + self.resolution <= ts - self.window:
+            entries.popleft()
+        return entries[0][1]
+
+    @property
+    def value(self):
+        return self.entries[0][1] if self.entries else None
+
+    def reset(self):
+        self.entries.clear()
+
+    def state(self):
+        return [list(e) for e in self.entries]
+
+    def restore(self, state):
+        self.entries = deque(tuple(e) for e in state)
+
+
+class EquitySeries:
+    """
+    Fixed-size ring buffer of (timestamp, equity), one point per `resolution` seconds
+    (the last sample in each bucket wins). Backed by two `array('d')`, so 7 days at
+    one-minute resolution is ~160KB regardless of the tick rate.
+    """
+    def __init__(self, span=7 * 24 * 60 * 60, resolution=60):
+        self.resolution = resolution
+        self.capacity = int(span // resolution) + 1
+        self.times = array('d', bytes(8 * self.capacity))
+        self.values = array('d', bytes(8 * self.capacity))
+        self.size = 0
+        self.head = 0               # Index of the newest point
+
+    def push(self, ts, value):
+        bucket = ts - ts % self.resolution
+        if self.size and self.times[self.head] - self.times[self.head] % self.resolution == bucket:
+            self.times[self.head], self.values[self.head] = ts, value
+            return
+        self.head = (self.head + 1) % self.capacity if self.size else 0
+        self.times[self.head], self.values[self.head] = ts, value
+        self.size = min(self.size + 1, self.capacity)
+
+    def __len__(self):
+        return self.size
+
+    def points(self, since=None):
+        """[(timestamp, equity)], oldest first, optionally only those at or after `since`."""
+        result = []
+        for k in range(self.size):
+            i = (self.head - k) % self.capacity
+            if since is not None and self.times[i] < since:
+                break
+            result.append((self.times[i], self.values[i]))
+        result.reverse()
+        return result
+
+    @property
+    def last(self):
+        return (self.times[self.head], self.values[self.head]) if self.size else None
@@ -0,0 +1,321 @@
+"""
+Sliced order execution.
+
+A large parent order is worked as a series of small limit child orders instead of one
+market order, so a pool-sized trade doesn't walk the book. Fills are tracked across
+calls to `step()` (one per bot cycle or tick); nothing here blocks between children.
+
+Styles (how much of the parent may be filled by now):
+    twap       equal slices spread evenly over `duration` seconds
+    iceberg    all of it, but never more than one `clip` showing at a time
+    pov        `participation` x the market volume traded since arrival
+
+Children rest at the touch (best bid for buys, best ask for sells) and are cancelled and
+re-posted when the book moves `reprice_bps` away or after `child_ttl` seconds. Once the
+schedule is over, whatever is left crosses the spread with IOC orders capped at
+`max_cross_bps` past the touch. Every finished parent reports its realized slippage
+against the arrival mid.
+
+`liquidate()` is the emergency fast path: immediate IOC sweeps, each floored at
+`max_impact` below the best bid.
+"""
+import math
+import time
+from collections import deque
+
+from trading_engine import telemetry
+
+STYLES = ('twap', 'iceberg', 'pov')
+DONE = ('closed', 'canceled', 'expired', 'rejected')
+
+
+class ParentOrder:
+    def __init__(self, id, symbol, side, amount, style, started_at, duration, arrival,
+                 budget=None, volume_start=None):
+        self.id = id
+        self.symbol = symbol
+        self.side = side
+        self.amount = amount
+        self.style = style
+        self.started_at = started_at
+        self.duration = duration
+        self.arrival = arrival          # Mid price when the order arrived
+        self.budget = budget            # Quote cap for buys (fees and price drift included)
+        self.volume_start = volume_start
+        self.filled = 0.0
+        self.cost = 0.0
+        self.children = 0
+        self.working = None             # The one resting child: {id, price, filled, cost, placed_at}
+        self.status = 'working'
+
+    @property
+    def remaining(self):
+        return max(0.0, self.amount - self.filled)
+
+    def state(self):
+        return dict(vars(self))
+
+    @classmethod
+    def from_state(cls, state):
+        order = cls.__new__(cls)
+        vars(order).update(state)
+        return order
+
+
+class Executor:
+    """
+    Works parent orders for one (sync) ccxt client.
+    Times come from `exchange.milliseconds()`, so a simulator can replay them.
+    """
+    def __init__(self, exchange, style='twap', duration=300, clip_notional=1_000.0,
+                 participation=0.1, reprice_bps=5.0, child_ttl=30, max_cross_bps=20.0,
+                 step_interval=2.0):
+        if style not in STYLES:
+            raise ValueError(f"Unknown execution style {style!r} (expected one of {', '.join(STYLES)})")
+        self.exchange = exchange
+        self.style = style
+        self.duration = duration
+        self.clip_notional = clip_notional
+        self.participation = participation
+        self.reprice_bps = reprice_bps
+        self.child_ttl = child_ttl
+        self.max_cross_bps = max_cross_bps
+        self.step_interval = step_interval  # Minimum seconds between two steps of the same parent
+
+        self.parents = {}
+        self.reports = deque(maxlen=100)
+        self._next_id = 1
+        self._last_step = 0.0
+
+    def now(self):
+        return self.exchange.milliseconds() / 1000.0
+
+    # --- PUBLIC API ---
+
+    def submit(self, symbol, side, amount, budget=None, style=None):
+        """
+        Starts working a parent order and places its first child right away. If that
+        placement raises, the parent is never registered: the caller sees the failure and
+        nothing keeps trading behind its back.
+        """
+        book = self.exchange.fetch_order_book(symbol, limit=5)
+        bid, ask = book['bids'][0][0], book['asks'][0][0]
+        style = style or self.style
+        volume_start = self._volume(symbol) if style == 'pov' else None
+        parent = ParentOrder(str(self._next_id), symbol, side, amount, style, self.now(),
+                             self.duration, (bid + ask) / 2, budget, volume_start)
+        self._next_id += 1
+        print(f"📐 EXECUTION: {side.upper()} {amount:.6f} {symbol} via {style.upper()} "
+              f"(arrival ${parent.arrival:,.2f})")
+        self._work(parent, bid, ask)
+        if parent.status == 'working':
+            self.parents[parent.id] = parent
+        return parent
+
+    def active(self, symbol=None):
+        return [p for p in self.parents.values() if symbol in (None, p.symbol)]
+
+    def step(self, force=False):
+        """Advances every working parent. Returns the reports of parents that finished."""
+        now = self.now()
+        if not self.parents or (not force and now - self._last_step < self.step_interval):
+            return []
+        self._last_step = now
+        finished = []
+        for parent in list(self.parents.values()):
+            try:
+                book = self.exchange.fetch_order_book(parent.symbol, limit=5)
+                report = self._work(parent, book['bids'][0][0], book['asks'][0][0])
+            except Exception as e:
+                print(f"⚠️ Execution Error ({parent.symbol} #{parent.id}): {e}")
+                continue
+            if report:
+                finished.append(report)
+        return finished
+
+    def cancel(self, symbol=None):
+        """Stops working parents (cancelling their resting child). Returns their reports."""
+        reports = []
+        for parent in self.active(symbol):
+            try:
+                self._pull_child(parent)
+            except Exception as e:
+                print(f"⚠️ Cancel Failed ({parent.symbol} #{parent.id}): {e}")
+            parent.status = 'canceled'
+            reports.append(self._finish(parent))
+        return reports
+
+    def liquidate(self, symbol, amount, max_impact=0.01, rounds=5):
+        """
+        Emergency sell with bounded impact: up to `rounds` immediate IOC sweeps, each
+        priced `max_impact` below the best bid at that moment. Whatever the book can't
+        absorb inside that band is left unsold (and reported) rather than dumped.
+        """
+        self.cancel(symbol)
+        book = self.exchange.fetch_order_book(symbol, limit=5)
+        bid, ask = book['bids'][0][0], book['asks'][0][0]
+        parent = ParentOrder(f"L{self._next_id}", symbol, 'sell', amount, 'liquidation', self.now(),
+                             0, (bid + ask) / 2)
+        self._next_id += 1
+        min_amount, _ = self._limits(symbol)
+
+        for i in range(rounds):
+            if parent.remaining <= min_amount:
+                break
+            if i:
+                bid = self.exchange.fetch_order_book(symbol, limit=5)['bids'][0][0]
+            try:
+                order = self._send(parent, parent.remaining, bid * (1 - max_impact), {'timeInForce': 'IOC'})
+                parent.children += 1
+                self._record(parent, order, {'filled': 0.0, 'cost': 0.0})
+            except Exception as e:
+                print(f"❌ Liquidation Sweep {i + 1} Failed: {e}")
+
+        if parent.remaining > min_amount:
+            print(f"⚠️ LIQUIDATION PARTIAL: {parent.remaining:.6f} {symbol} left above the "
+                  f"{max_impact * 100:.1f}% impact floor")
+        parent.status = 'closed' if parent.remaining <= min_amount else 'partial'
+        return self._finish(parent)
+
+    def slippage(self):
+        """Fill-weighted average slippage (bps, positive = cost) over the recent reports."""
+        notional = sum(r['notional'] for r in self.reports)
+        if not notional:
+            return 0.0
+        return sum(r['slippage_bps'] * r['notional'] for r in self.reports) / notional
+
+    def state(self):
+        return {'parents': [p.state() for p in self.parents.values()], 'next_id': self._next_id}
+
+    def restore(self, state):
+        self.parents = {p['id']: ParentOrder.from_state(p) for p in state.get('parents', [])}
+        self._next_id = state.get('next_id', 1)
+
+    # --- PARENT LIFECYCLE ---
+
+    def _work(self, parent, bid, ask):
+        """One scheduling pass for `parent`. Returns its report if it finished."""
+        now = self.now()
+        if parent.working:
+            self._poll_child(parent, bid, ask, now)
+        if parent.working:
+            return None
+
+        buy = parent.side == 'buy'
+        touch = ask if buy else bid
+        min_amount, min_cost = self._limits(parent.symbol)
+        remaining = parent.remaining
+        if buy and parent.budget is not None:
+            remaining = min(remaining, (parent.budget - parent.cost) / ask)
+        if remaining <= min_amount or remaining * touch < min_cost:
+            parent.status = 'closed'
+            return self._finish(parent)
+
+        clip = self.clip_notional / touch
+        if now >= parent.started_at + parent.duration:
+            # Schedule over: take what's left, but never further than max_cross_bps past the touch
+            cap = touch * (1 + self.max_cross_bps / 1e4 if buy else 1 - self.max_cross_bps / 1e4)
+            self._place(parent, remaining, cap, now, {'timeInForce': 'IOC'})
+            return None
+
+        qty = min(remaining, clip, self._target(parent, now, clip) - parent.filled)
+        if qty <= min_amount or qty * touch < min_cost:
+            return None  # Ahead of schedule
+        self._place(parent, qty, bid if buy else ask, now)
+        return None
+
+    def _target(self, parent, now, clip):
+        """How much of `parent` may be filled by `now` under its style."""
+        if parent.style == 'iceberg':
+            return parent.amount
+        if parent.style == 'pov':
+            traded = max(0.0, self._volume(parent.symbol) - parent.volume_start)
+            return self.participation * traded
+        slices = max(1, math.ceil(parent.amount / clip))
+        elapsed = max(0.0, now - parent.started_at)
+        done = min(slices, int(elapsed / (parent.duration / slices)) + 1) if parent.duration else slices
+        return parent.amount * done / slices
+
+    def _send(self, parent, amount, price, params=None):
+        """Sends one limit child order, counting it (and any rejection) in the bot metrics."""
+        try:
+            # ccxt iterates params: None raises TypeError on a real exchange
+            order = self.exchange.create_order(parent.symbol, 'limit', parent.side, amount, price, params or {})
+        except Exception as e:
+            telemetry.REJECTIONS.inc(reason=type(e).__name__)
+            raise
+        telemetry.ORDERS.inc(side=parent.side, kind=parent.style)
+        return order
+
+    def _place(self, parent, amount, price, now, params=None):
+        order = self._send(parent, amount, price, params)
+        parent.children += 1
+        child = {'id': order['id'], 'price': price, 'filled': 0.0, 'cost': 0.0, 'placed_at': now}
+        self._record(parent, order, child)
+        if order.get('status') not in DONE:
+            parent.working = child
+
+    def _poll_child(self, parent, bid, ask, now):
+        child = parent.working
+        order = self.exchange.fetch_order(child['id'], parent.symbol)
+        self._record(parent, order, child)
+        if order.get('status') in DONE:
+            parent.working = None
+            return
+        # The book moved away from our price, or the child sat too long: re-post at the touch
+        band = self.reprice_bps / 1e4
+        moved = bid > child['price'] * (1 + band) if parent.side == 'buy' else ask < child['price'] * (1 - band)
+        if moved or now - child['placed_at'] >= self.child_ttl:
+            self._pull_child(parent)
+
+    def _pull_child(self, parent):
+        child = parent.working
+        if child is None:
+            return
+        try:
+            self.exchange.cancel_order(child['id'], parent.symbol)
+        finally:
+            # Fills that landed before the cancel still count
+            self._record(parent, self.exchange.fetch_order(child['id'], parent.symbol), child)
+            parent.working = None
+
+    @staticmethod
+    def _record(parent, order, child):
+        """Adds the fills `order` gained since `child` was last seen to the parent."""
+        filled = float(order.get('filled') or 0.0)
+        cost = order.get('cost')
+        cost = float(cost) if cost is not None else filled * float(order.get('average') or order.get('price') or 0.0)
+        parent.filled += filled - child['filled']
+        parent.cost += cost - child['cost']
+        child['filled'], child['cost'] = filled, cost
+
+    def _finish(self, parent):
+        self.parents.pop(parent.id, None)
+        avg = parent.cost / parent.filled if parent.filled else 0.0
+        sign = 1 if parent.side == 'buy' else -1
+        slippage = sign * (avg - parent.arrival) / parent.arrival * 1e4 if parent.filled else 0.0
+        report = {
+            'id': parent.id, 'symbol': parent.symbol, 'side': parent.side, 'style': parent.style,
+            'status': parent.status, 'amount': parent.amount, 'filled': parent.filled,
+            'avg_price': avg, 'arrival': parent.arrival, 'notional': parent.cost,
+            'slippage_bps': slippage, 'children': parent.children,
+            'seconds': self.now() - parent.started_at,
+        }
+        self.reports.append(report)
+        print(f"📐 EXECUTION DONE: {parent.side.upper()} {parent.filled:.6f}/{parent.amount:.6f} {parent.symbol} "
+              f"@ ${avg:,.2f} | Slippage {slippage:+.1f}bps vs arrival | {parent.children} children "
+              f"({parent.status})")
+        return report
+
+    # --- MARKET INFO ---
+
+    def _limits(self, symbol):
+        """(min amount, min notional) for `symbol`, from the loaded markets when available."""
+        market = (getattr(self.exchange, 'markets', None) or {}).get(symbol, {})
+        limits = market.get('limits', {})
+        return (limits.get('amount', {}).get('min') or 0.0001,
+                limits.get('cost', {}).get('min') or 5.0)
+
+    def _volume(self, symbol):
+        """Rolling base volume from the ticker; POV uses its change since arrival."""
+        return float(self.exchange.fetch_ticker(symbol).get('baseVolume') or 0.0)
@@ -0,0 +1,204 @@
+import asyncio
+import csv
+import queue
+import threading
+import time
+
+
+# --- EVENTS ---
+# Every feed pushes plain dicts into a queue:
+#   {'type': 'ticker', 'symbol': ..., 'price': float, 'timestamp': ms}
+#   {'type': 'kline',  'symbol': ..., 'candle': [ts, open, high, low, close, volume]}
+#   {'type': 'error',  'error': str}   (the feed gave up; caller should fall back)
+
+def ticker_event(symbol, price, timestamp=None):
+    return {'type': 'ticker', 'symbol': symbol, 'price': float(price),
+            'timestamp': timestamp if timestamp is not None else int(time.time() * 1000)}
+
+
+def kline_event(symbol, candle):
+    return {'type': 'kline', 'symbol': symbol, 'candle': list(candle)}
+
+
+class MarketState:
+    """
+    In-memory view of the market, updated by feed events.
+    Klines go straight into the streaming IndicatorEngine, tickers update the last price.
+    """
+    def __init__(self, indicators, timeframe_ms):
+        self.indicators = indicators
+        self.timeframe_ms = timeframe_ms
+        self.price = 0.0
+        self.price_timestamp = 0
+        self.needs_resync = False   # Set when a kline gap is detected
+
+    def apply(self, event):
+        """Applies one event. Returns True if the price or indicators changed."""
+        if event['type'] == 'ticker':
+            if event['timestamp'] < self.price_timestamp:
+                return False
+            self.price = event['price']
+            self.price_timestamp = event['timestamp']
+            return True
+
+        if event['type'] == 'kline':
+            candle = event['candle']
+            last_ts = self.indicators.last_timestamp
+            # A jump of more than one candle means we missed closes: don't guess, resync over REST
+            if last_ts is not None and candle[0] > last_ts + self.timeframe_ms:
+                self.needs_resync = True
+                return False
+            self.indicators.update(candle)
+            if candle[0] >= self.price_timestamp:
+                self.price = float(candle[4])
+            return True
+
+        return False
+
+
+class Feed:
+    """Base class: runs a producer in a background thread and exposes a blocking `get`."""
+    def __init__(self):
+        self.events = queue.Queue(maxsize=10000)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    @property
+    def alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def get(self, timeout=None):
+        """Next event, or None if nothing arrived within `timeout` seconds."""
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _emit(self, event):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            # Consumer is behind: drop the oldest event, the newest price matters more
+            try:
+                self.events.get_nowait()
+            except queue.Empty:
+                pass
+            self.events.put_nowait(event)
+
+    def _run(self):
+        raise NotImplementedError
+
+
+class BinanceStreamFeed(Feed):
+    """
+    Live WebSocket feed (ccxt.pro): pushes ticker and kline updates for one symbol.
+    Reconnects with exponential backoff and reports an 'error' event after too many failures.
+    """
+    def __init__(self, symbol, timeframe, config=None, max_failures=5):
+        super().__init__()
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.config = config or {}
+        self.max_failures = max_failures
+
+    def _run(self):
+        try:
+            asyncio.run(self._main())
+        except Exception as e:
+            self._emit({'type': 'error', 'error': str(e)})
+
+    async def _main(self):
+        import ccxt.pro as ccxtpro  # Only needed in stream mode
+
+        exchange = ccxtpro.binance(self.config)
+        try:
+            await asyncio.gather(self._watch_ticker(exchange), self._watch_klines(exchange))
+        finally:
+            await exchange.close()
+
+    async def _watch(self, name, watch, handle):
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                handle(await watch())
+                failures = 0
+            except Exception as e:
+                failures += 1
+                if failures > self.max_failures:
+                    raise RuntimeError(f"{name} stream failed {failures} times: {e}")
+                await asyncio.sleep(min(2 ** failures, 30))
+
+    async def _watch_ticker(self, exchange):
+        def handle(ticker):
+            if ticker.get('last') is not None:
+                self._emit(ticker_event(self.symbol, ticker['last'], ticker.get('timestamp')))
+        await self._watch('Ticker', lambda: exchange.watch_ticker(self.symbol), handle)
+
+    async def _watch_klines(self, exchange):
+        def handle(candles):
+            for candle in candles:
+                self._emit(kline_event(self.symbol, candle))
+        await self._watch('Kline', lambda: exchange.watch_ohlcv(self.symbol, self.timeframe), handle)
+
+
+class ReplayFeed(Feed):
+    """
+    Offline feed for testing: replays recorded OHLCV rows (list or CSV file with
+    timestamp,open,high,low,close,volume). Each bar is expanded into ticks
+    (open -> low/high -> close), each preceded by the forming kline so far.
+    `speed` is bars per second; 0 replays as fast as the consumer can take it.
+    Tick timestamps are spread over the bar like SimulatedExchange.milliseconds() with
+    ticks_per_bar=TICKS_PER_BAR, so the simulator can seek() to each tick.
+    """
+    TICKS_PER_BAR = 4
+
+    def __init__(self, symbol, bars, speed=0):
+        super().__init__()
+        self.symbol = symbol
+        self.bars = self.load_csv(bars) if isinstance(bars, str) else bars
+        self.speed = speed
+        # Replay must not drop events, so block instead of evicting
+        self.events = queue.Queue(maxsize=1000)
+
+    @staticmethod
+    def load_csv(path):
+        with open(path, newline='') as f:
+            rows = csv.reader(f)
+            return [
+                [int(float(r[0]))] + [float(v) for v in r[1:6]]
+                for r in rows if r and r[0][0].isdigit()
+            ]
+
+    def _emit(self, event):
+        while not self._stop.is_set():
+            try:
+                self.events.put(event, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _run(self):
+        step = self.bars[1][0] - self.bars[0][0] if len(self.bars) > 1 else 0
+        for ts, o, h, l, c, v in (bar[:6] for bar in self.bars):
+            if self._stop.is_set():
+                return
+            # Bullish bars tend to visit the low first, bearish bars the high first
+            path = (o, l, h, c) if c >= o else (o, h, l, c)
+            high = low = o
+            for i, price in enumerate(path):
+                high, low = max(high, price), min(low, price)
+                self._emit(kline_event(self.symbol, [ts, o, high, low, price, v * (i + 1) / len(path)]))
+                self._emit(ticker_event(self.symbol, price, ts + step * i // len(path)))
+            if self.speed:
+                time.sleep(1.0 / self.speed)
+        self._emit({'type': 'error', 'error': 'Replay finished'})
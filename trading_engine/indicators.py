@@ -0,0 +1,261 @@
+import math
+from collections import deque
+
+NAN = float('nan')
+
+
+class EMA:
+    """
+    Exponential Moving Average, seeded with the SMA of the first `length` values.
+    Matches pandas_ta.ema (sma=True, adjust=False).
+    """
+    def __init__(self, length):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.count = 0
+        self.value = NAN
+        self._seed_sum = 0.0
+
+    def peek(self, x):
+        """Value the EMA would have if `x` were the next sample (no state change)."""
+        n = self.count + 1
+        if n < self.length:
+            return NAN
+        if n == self.length:
+            return (self._seed_sum + x) / self.length
+        return self.value + self.alpha * (x - self.value)
+
+    def push(self, x):
+        value = self.peek(x)
+        if self.count < self.length:
+            self._seed_sum += x
+        self.count += 1
+        self.value = value
+        return value
+
+    def state(self):
+        return [self.count, self.value, self._seed_sum]
+
+    def restore(self, state):
+        self.count, self.value, self._seed_sum = state
+
+
+class RMA:
+    """
+    Wilder's Moving Average.
+    Matches pandas_ta.rma, i.e. ewm(alpha=1/length, adjust=True, min_periods=length).
+    """
+    def __init__(self, length):
+        self.length = length
+        self.decay = 1.0 - (1.0 / length)
+        self.count = 0
+        self.value = NAN
+        self._num = 0.0
+        self._den = 0.0
+
+    def peek(self, x):
+        if self.count + 1 < self.length:
+            return NAN
+        return (self._num * self.decay + x) / (self._den * self.decay + 1.0)
+
+    def push(self, x):
+        value = self.peek(x)
+        self._num = self._num * self.decay + x
+        self._den = self._den * self.decay + 1.0
+        self.count += 1
+        self.value = value
+        return value
+
+    def state(self):
+        return [self.count, self.value, self._num, self._den]
+
+    def restore(self, state):
+        self.count, self.value, self._num, self._den = state
+
+
+class RollingStats:
+    """
+    Rolling mean and population standard deviation (ddof=0) over `length` values.
+    Uses a sliding Welford update and re-syncs from the window every `length`
+    pushes so floating-point drift never accumulates.
+    """
+    def __init__(self, length):
+        self.length = length
+        self.window = deque(maxlen=length)
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._pushes = 0
+
+    def _slide(self, x):
+        """Returns (mean, m2) after adding `x` (and evicting the oldest value when full)."""
+        n = len(self.window)
+        if n < self.length:
+            delta = x - self.mean
+            mean = self.mean + delta / (n + 1)
+            return mean, self._m2 + delta * (x - mean)
+        old = self.window[0]
+        mean = self.mean + (x - old) / self.length
+        return mean, self._m2 + (x - old) * (x - mean + old - self.mean)
+
+    def peek(self, x):
+        if len(self.window) + 1 < self.length:
+            return NAN, NAN
+        mean, m2 = self._slide(x)
+        return mean, math.sqrt(max(m2, 0.0) / self.length)
+
+    def push(self, x):
+        result = self.peek(x)
+        self.mean, self._m2 = self._slide(x)
+        self.window.append(x)
+        self._pushes += 1
+        if self._pushes % self.length == 0:
+            self._resync()
+        return result
+
+    def _resync(self):
+        n = len(self.window)
+        self.mean = sum(self.window) / n
+        self._m2 = sum((v - self.mean) ** 2 for v in self.window)
+
+    def state(self):
+        return [list(self.window), self._pushes]
+
+    def restore(self, state):
+        window, self._pushes = state
+        self.window = deque(window, maxlen=self.length)
+        self.mean, self._m2 = 0.0, 0.0
+        if self.window:
+            self._resync()
+
+
+class IndicatorEngine:
+    """
+    Streaming version of the Apex indicator set (EMA 50/200, RSI 14, MACD 12/26/9,
+    ATR 14, Bollinger 20/2).
+
+    Feed it ccxt OHLCV rows ([timestamp, open, high, low, close, volume]) in order.
+    A row with the same timestamp as the forming candle replaces it; a row with a
+    newer timestamp closes the forming candle and commits it into the rolling state.
+    Both cases are O(1). Values match the pandas_ta defaults over the same history.
+    """
+    def __init__(self, ema_fast=50, ema_slow=200, rsi_length=14,
+                 macd_fast=12, macd_slow=26, macd_signal=9,
+                 atr_length=14, bb_length=20, bb_std=2.0):
+        self.ema_fast = EMA(ema_fast)
+        self.ema_slow = EMA(ema_slow)
+        self.rsi_gain = RMA(rsi_length)
+        self.rsi_loss = RMA(rsi_length)
+        self.macd_fast = EMA(macd_fast)
+        self.macd_slow = EMA(macd_slow)
+        self.macd_signal = EMA(macd_signal)
+        self.atr = RMA(atr_length)
+        self.bb = RollingStats(bb_length)
+        self.bb_std = bb_std
+
+        self.prev_close = None      # Close of the last committed candle
+        self.forming = None         # Latest (possibly still open) candle
+        self.latest = {}            # Indicator snapshot for `forming`
+        self.closed_bars = 0        # Candles committed so far
+
+    @property
+    def last_timestamp(self):
+        return self.forming[0] if self.forming is not None else None
+
+    def reset(self):
+        self.__init__(
+            self.ema_fast.length, self.ema_slow.length, self.rsi_gain.length,
+            self.macd_fast.length, self.macd_slow.length, self.macd_signal.length,
+            self.atr.length, self.bb.length, self.bb_std,
+        )
+
+    def update(self, candle):
+        """Applies one OHLCV row and returns the indicator snapshot for the latest candle."""
+        ts = candle[0]
+        if self.forming is not None:
+            if ts < self.forming[0]:
+                return self.latest  # Stale row, already past it
+            if ts > self.forming[0]:
+                self._evaluate(self.forming, commit=True)
+                self.closed_bars += 1
+        self.forming = candle
+        self.latest = self._evaluate(candle, commit=False)
+        return self.latest
+
+    def seed(self, bars):
+        for bar in bars:
+            self.update(bar)
+        return self.latest
+
+    def _parts(self):
+        return {
+            'ema_fast': self.ema_fast, 'ema_slow': self.ema_slow,
+            'rsi_gain': self.rsi_gain, 'rsi_loss': self.rsi_loss,
+            'macd_fast': self.macd_fast, 'macd_slow': self.macd_slow, 'macd_signal': self.macd_signal,
+            'atr': self.atr, 'bb': self.bb,
+        }
+
+    def state(self):
+        """Compact, JSON-serializable snapshot of the rolling state (for checkpoints)."""
+        return {
+            'lengths': [p.length for p in self._parts().values()],
+            'parts': {name: part.state() for name, part in self._parts().items()},
+            'prev_close': self.prev_close,
+            'forming': self.forming,
+            'closed_bars': self.closed_bars,
+        }
+
+    def restore(self, state):
+        """Loads a snapshot from `state()`. Returns False (and keeps a clean engine) if the
+        snapshot was taken with different indicator lengths."""
+        if state.get('lengths') != [p.length for p in self._parts().values()]:
+            return False
+        for name, part in self._parts().items():
+            part.restore(state['parts'][name])
+        self.prev_close = state['prev_close']
+        self.forming = state['forming']
+        self.closed_bars = state['closed_bars']
+        self.latest = self._evaluate(self.forming, commit=False) if self.forming else {}
+        return True
+
+    def _evaluate(self, candle, commit):
+        ts, o, h, l, c, v = candle[:6]
+        o, h, l, c, v = float(o), float(h), float(l), float(c), float(v)
+        step = 'push' if commit else 'peek'
+
+        # 1. Trend
+        ema_fast = getattr(self.ema_fast, step)(c)
+        ema_slow = getattr(self.ema_slow, step)(c)
+
+        # 2. Momentum
+        rsi = NAN
+        true_range = None
+        if self.prev_close is not None:
+            change = c - self.prev_close
+            gain = getattr(self.rsi_gain, step)(max(change, 0.0))
+            loss = getattr(self.rsi_loss, step)(-min(change, 0.0))
+            if gain + loss > 0:
+                rsi = 100.0 * gain / (gain + loss)
+            true_range = max(h - l, abs(h - self.prev_close), abs(self.prev_close - l))
+
+        macd = getattr(self.macd_fast, step)(c) - getattr(self.macd_slow, step)(c)
+        macd_signal = getattr(self.macd_signal, step)(macd) if not math.isnan(macd) else NAN
+
+        # 3. Volatility
+        atr = getattr(self.atr, step)(true_range) if true_range is not None else NAN
+        bb_mid, bb_dev = getattr(self.bb, step)(c)
+
+        if commit:
+            self.prev_close = c
+
+        return {
+            'timestamp': ts, 'open': o, 'high': h, 'low': l, 'close': c, 'volume': v,
+            'EMA_50': ema_fast,
+            'EMA_200': ema_slow,
+            'RSI': rsi,
+            'MACD': macd,
+            'MACD_SIGNAL': macd_signal,
+            'ATR': atr,
+            'BB_MIDDLE': bb_mid,
+            'BB_UPPER': bb_mid + self.bb_std * bb_dev,
+            'BB_LOWER': bb_mid - self.bb_std * bb_dev,
+        }
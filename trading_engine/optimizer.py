@@ -0,0 +1,289 @@
+"""
+Parallel parameter sweep + walk-forward evaluation of the Apex strategy.
+
+- The price history is written once per timeframe to a column-major .npy file and
+  memory-mapped read-only by every worker, so the dataset is never copied per process.
+- Each worker keeps an indicator column cache (see backtest.compute_indicators), and
+  tasks are ordered so parameter sets sharing indicator lengths land on the same worker.
+- Every finished parameter set is appended to a JSONL results file; re-running with the
+  same file skips what is already done, so an interrupted sweep resumes where it stopped.
+
+Usage:
+    python -m trading_engine.optimizer candles.csv --out sweep.jsonl [--samples 200] [--folds 4]
+"""
+import argparse
+import dataclasses
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from trading_engine import backtest
+from trading_engine.strategy import ApexParams
+
+# Default search space around the hard-coded Apex config
+DEFAULT_GRID = {
+    'timeframe': ['1h'],
+    'ema_fast': [20, 50, 100],
+    'ema_slow': [100, 200],
+    'rsi_cap': [70.0, 75.0, 80.0],
+    'atr_mult': [1.5, 2.0, 3.0],
+    'bb_length': [20],
+    'bb_std': [2.0, 2.5],
+    'panic_threshold': [0.03, 0.05, 0.08],
+}
+
+MAX_CACHED_COLUMNS = 32     # Per worker, per timeframe
+
+
+# --- SEARCH SPACE ---
+
+def grid_params(grid=DEFAULT_GRID):
+    keys = sorted(grid)
+    for values in itertools.product(*(grid[k] for k in keys)):
+        params = dict(zip(keys, values))
+        if params.get('ema_fast', 0) < params.get('ema_slow', 1):
+            yield ApexParams(**params)
+
+
+def random_params(grid=DEFAULT_GRID, samples=100, seed=0):
+    combos = list(grid_params(grid))
+    return random.Random(seed).sample(combos, min(samples, len(combos)))
+
+
+def params_key(params):
+    return json.dumps(dataclasses.asdict(params), sort_keys=True)
+
+
+def walk_forward_splits(n, folds=4, train_fraction=0.7):
+    """
+    Rolling walk-forward windows over `n` bars: the data is cut into `folds` windows and
+    each window is split into a train part and the test part that follows it.
+    """
+    size = n // folds
+    for k in range(folds):
+        start, end = k * size, (k + 1) * size if k < folds - 1 else n
+        cut = start + int((end - start) * train_fraction)
+        yield (start, cut), (cut, end)
+
+
+# --- SHARED DATA ---
+
+def write_shared(cols, directory):
+    """Writes OHLCV columns as one (6, n) array so each column is a contiguous mmap slice."""
+    path = os.path.join(directory, f"ohlcv_{len(cols['close'])}_{os.getpid()}_{id(cols)}.npy")
+    np.save(path, np.vstack([cols[c] for c in backtest.OHLCV_COLUMNS]))
+    return path
+
+
+def open_shared(path):
+    array = np.load(path, mmap_mode='r')
+    return {c: array[i] for i, c in enumerate(backtest.OHLCV_COLUMNS)}
+
+
+_worker = {}
+
+
+def _init_worker(paths):
+    _worker['data'] = {tf: open_shared(path) for tf, path in paths.items()}
+    _worker['cache'] = {tf: {} for tf in paths}
+
+
+def _slice(columns, start, end):
+    return {k: v[start:end] for k, v in columns.items()}
+
+
+def _evaluate_task(task):
+    params, splits, capital, fee = task
+    try:
+        return evaluate(params, splits, capital, fee)
+    except Exception as e:
+        return {'params': dataclasses.asdict(params), 'error': str(e)}
+
+
+def evaluate(params, splits, capital=10_000.0, fee=0.001):
+    """Runs one parameter set over every walk-forward window (inside a worker)."""
+    cols = _worker['data'][params.timeframe]
+    cache = _worker['cache'][params.timeframe]
+    while len(cache) > MAX_CACHED_COLUMNS:
+        cache.pop(next(iter(cache)))
+
+    # Indicators are causal, so computing them once over the full history and slicing
+    # gives each window fully warmed-up values without any lookahead
+    ind = backtest.compute_indicators(cols, params, cache)
+
+    row = {'params': dataclasses.asdict(params), 'folds': []}
+    for (train_start, train_end), (test_start, test_end) in splits:
+        fold = {}
+        for name, (start, end) in (('train', (train_start, train_end)), ('test', (test_start, test_end))):
+            result = backtest.run_backtest(_slice(cols, start, end), params, capital, fee,
+                                           indicators=_slice(ind, start, end))
+            fold[name] = {k: result.stats[k] for k in ('total_return', 'max_drawdown', 'trades', 'turnover')}
+        row['folds'].append(fold)
+    return row
+
+
+# --- RESULTS ---
+
+def load_results(path):
+    """Reads completed rows; a torn last line from a crash is ignored."""
+    rows = []
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return rows
+
+
+def _score(stats, metric):
+    """A parameter set's score on one window: a stats key, or 'calmar' (return / drawdown)."""
+    if metric == 'calmar':
+        return stats['total_return'] / stats['max_drawdown'] if stats['max_drawdown'] > 0 else 0.0
+    return stats[metric]
+
+
+def walk_forward(rows, metric='total_return'):
+    """
+    Out-of-sample performance of the selection itself: on each fold, the parameter set with
+    the best `metric` on the train window is picked, and only that pick's test window is
+    reported. The test windows never influence a choice, so they stay out-of-sample.
+    Returns (picks, summary): one row per fold, and the picks' aggregated test results.
+    """
+    folds = max((len(row['folds']) for row in rows), default=0)
+    rows = [row for row in rows if len(row['folds']) == folds]   # Skip leftovers from another --folds
+    picks, chosen = [], set()
+    for k in range(folds):
+        best = max(rows, key=lambda row: _score(row['folds'][k]['train'], metric))
+        chosen.add(json.dumps(best['params'], sort_keys=True))
+        train, test = best['folds'][k]['train'], best['folds'][k]['test']
+        picks.append({
+            'fold': k,
+            **best['params'],
+            'train_score': _score(train, metric),
+            'test_return': test['total_return'],
+            'test_drawdown': test['max_drawdown'],
+            'test_trades': test['trades'],
+            'test_turnover': test['turnover'],
+        })
+    df = pd.DataFrame(picks)
+    if not len(df):
+        return df, {}
+    returns = df['test_return'].to_numpy(dtype=float)
+    summary = {
+        'folds': folds,
+        'selection_metric': metric,
+        'test_return': float(returns.mean()),
+        'compounded_return': float(np.prod(1 + returns) - 1),
+        'worst_fold_return': float(returns.min()),
+        'max_test_drawdown': float(df['test_drawdown'].max()),
+        'distinct_params': len(chosen),   # 1 = the same set won every fold
+    }
+    return df, summary
+
+
+def rank(rows, metric='test_return'):
+    """
+    Flattens result rows into a table ranked by mean performance across the folds.
+    Diagnostic only (how stable each set is): choosing parameters from this ranking by a
+    test metric makes the test windows in-sample; walk_forward() is the honest estimate.
+    """
+    table = []
+    for row in rows:
+        folds = row['folds']
+        mean = lambda part, key: float(np.mean([f[part][key] for f in folds]))
+        test_return, test_dd = mean('test', 'total_return'), mean('test', 'max_drawdown')
+        table.append({
+            **row['params'],
+            'train_return': mean('train', 'total_return'),
+            'test_return': test_return,
+            'test_drawdown': test_dd,
+            'test_calmar': test_return / test_dd if test_dd > 0 else 0.0,
+            'test_trades': mean('test', 'trades'),
+            'test_turnover': mean('test', 'turnover'),
+            'worst_fold_return': min(f['test']['total_return'] for f in folds),
+        })
+    df = pd.DataFrame(table)
+    return df.sort_values(metric, ascending=False).reset_index(drop=True) if len(df) else df
+
+
+def optimize(ohlcv, param_sets, out_path, folds=4, train_fraction=0.7, workers=None,
+             capital=10_000.0, fee=0.001):
+    """
+    Sweeps `param_sets` across a process pool and returns every result row in `out_path`.
+    Already-finished sets found there are skipped (resume).
+    """
+    base = backtest.to_columns(ohlcv)
+    done = {params_key(ApexParams(**row['params'])) for row in load_results(out_path)}
+
+    # Group by indicator lengths so neighbours share cached columns
+    todo = [p for p in dict.fromkeys(param_sets) if params_key(p) not in done]
+    todo.sort(key=lambda p: (p.timeframe, p.ema_fast, p.ema_slow, p.bb_length, p.bb_std, p.atr_length))
+    print(f"🧪 Sweep: {len(todo)} parameter sets to run ({len(done)} already done)")
+    if not todo:
+        return load_results(out_path)
+
+    with tempfile.TemporaryDirectory(prefix='apex_sweep_') as tmp:
+        datasets = {tf: backtest.resample(base, tf) for tf in {p.timeframe for p in todo}}
+        paths = {tf: write_shared(cols, tmp) for tf, cols in datasets.items()}
+        splits = {tf: list(walk_forward_splits(len(cols['close']), folds, train_fraction))
+                  for tf, cols in datasets.items()}
+
+        workers = workers or os.cpu_count() or 1
+        tasks = [(p, splits[p.timeframe], capital, fee) for p in todo]
+        # Contiguous chunks keep neighbouring (cache-sharing) parameter sets on one worker
+        chunksize = max(1, len(tasks) // (workers * 4))
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(paths,)) as pool, \
+                open(out_path, 'a') as out:
+            for i, row in enumerate(pool.map(_evaluate_task, tasks, chunksize=chunksize), 1):
+                if 'error' in row:
+                    print(f"❌ {row['params']}: {row['error']}")
+                    continue
+                out.write(json.dumps(row) + "\n")
+                out.flush()
+                if i % 10 == 0 or i == len(todo):
+                    print(f"⏳ {i}/{len(todo)} done")
+
+    return load_results(out_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Walk-forward parameter sweep for the Apex strategy")
+    parser.add_argument('csv', help="Base OHLCV candles: timestamp(ms),open,high,low,close,volume")
+    parser.add_argument('--out', default='apex_sweep.jsonl', help="Results file (append-only, resumable)")
+    parser.add_argument('--samples', type=int, default=0, help="Random samples from the grid (0 = full grid)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--folds', type=int, default=4)
+    parser.add_argument('--train-fraction', type=float, default=0.7)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--metric', default='total_return', choices=['total_return', 'calmar'],
+                        help="Train-window score each fold's parameters are selected by")
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    param_sets = (random_params(DEFAULT_GRID, args.samples, args.seed) if args.samples
+                  else list(grid_params(DEFAULT_GRID)))
+    rows = optimize(backtest.load_ohlcv(args.csv), param_sets, args.out, args.folds,
+                    args.train_fraction, args.workers)
+    picks, summary = walk_forward(rows, args.metric)
+    print("\n--- 🧪 WALK-FORWARD (selected on train, scored on test) ---")
+    print(picks.to_string())
+    print(summary)
+    print(f"\n--- Diagnostic: mean across folds, top {args.top} by test return ---")
+    print(rank(rows).head(args.top).to_string())
+    return picks, summary
+
+
+if __name__ == "__main__":
+    main()
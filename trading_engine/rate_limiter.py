@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+# Request weights for the ccxt calls the engine makes (Binance spot REST weights)
+BINANCE_WEIGHTS = {
+    'fetch_balance': 20,
+    'fetch_ticker': 2,
+    'fetch_tickers': 40,
+    'fetch_ohlcv': 2,
+    'fetch_order_book': 5,
+    'fetch_order': 4,
+    'fetch_open_orders': 6,
+    'fetch_trading_fees': 20,
+    'load_markets': 20,
+    'create_order': 1,
+    'create_market_buy_order': 1,
+    'create_market_sell_order': 1,
+    'create_limit_buy_order': 1,
+    'create_limit_sell_order': 1,
+    'cancel_order': 1,
+    'cancel_all_orders': 1,
+}
+
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` tokens per second, bursts up to `capacity`.
+    Waiters are served in arrival order (the lock is held while sleeping).
+    """
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.waited = 0.0           # Total seconds callers spent throttled
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, cost=1):
+        cost = min(cost, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < cost:
+                delay = (cost - self.tokens) / self.rate
+                self.waited += delay
+                await asyncio.sleep(delay)
+                self._refill()
+            self.tokens -= cost
+
+
+class RateLimitedExchange:
+    """
+    Wraps an async ccxt exchange so every weighted REST call first takes its weight from
+    one shared TokenBucket. Create the ccxt client with enableRateLimit=False: this
+    budget replaces ccxt's own per-client throttle, so many symbols share one limit.
+    """
+    def __init__(self, exchange, bucket, weights=BINANCE_WEIGHTS):
+        self.exchange = exchange
+        self.bucket = bucket
+        self.weights = weights
+
+    def __getattr__(self, name):
+        attr = getattr(self.exchange, name)
+        weight = self.weights.get(name)
+        if weight is None or not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            await self.bucket.acquire(weight)
+            return await attr(*args, **kwargs)
+        return call
@@ -1,36 +1,94 @@
+import asyncio
 from decimal import Decimal
 import time
 from datetime import datetime, timedelta
 
+from trading_engine.equity import EquitySeries, RollingMax
+from trading_engine import telemetry
+
+# Drawdown windows tracked side by side (seconds); the panic switch uses `panic_window`
+DRAWDOWN_WINDOWS = {'1h': 60 * 60, '24h': 24 * 60 * 60, '7d': 7 * 24 * 60 * 60}
+STATUS_EQUITY_STEP = 60 * 60    # Equity curve on /status: one point per hour (168 for 7 days)
+
 class RiskManager:
-    def __init__(self, exchange_client):
+    def __init__(self, exchange_client, panic_threshold=Decimal("0.05"), cooldown_period=24 * 60 * 60,
+                 executor=None, panic_window='24h', resolution=60):
         self.exchange = exchange_client
-        self.panic_threshold = Decimal("0.05")  # 5% Drop
-        self.cooldown_period = 24 * 60 * 60     # 24 Hours in seconds
+        self.executor = executor  # Optional execution.Executor: bounded-impact liquidation
+        self.panic_threshold = panic_threshold  # 5% Drop
+        self.cooldown_period = cooldown_period  # 24 Hours in seconds
+        self.panic_window = panic_window
         
         # State tracking
-        self.high_water_mark = Decimal("0.00")  # Peak value in last 24h
+        self.high_water_mark = Decimal("0.00")  # Peak value in the panic window (rolling 24h)
         self.is_frozen = False
         self.freeze_start_time = None
 
-    def update_high_water_mark(self, current_portfolio_value: Decimal):
+        # Equity history: one point per `resolution` seconds for dashboards,
+        # plus a rolling peak per window (O(1) amortized per sample)
+        self.equity = EquitySeries(max(DRAWDOWN_WINDOWS.values()), resolution)
+        self.peaks = {name: RollingMax(window, resolution) for name, window in DRAWDOWN_WINDOWS.items()}
+        self._published_bucket = None
+
+    def update_high_water_mark(self, current_portfolio_value: Decimal, now=None):
+        """
+        Records one equity sample and moves every rolling peak.
+        The high-water mark is the peak of the panic window, so it decays as old highs age out.
+        """
+        now = time.time() if now is None else now
+        value = float(current_portfolio_value)
+        self.equity.push(now, value)
+        for name, peak in self.peaks.items():
+            peak.push(now, value)
+        self.high_water_mark = Decimal(str(self.peaks[self.panic_window].value))
+
+    def drawdowns(self):
+        """{window: drawdown from that window's peak to the latest sample}, as fractions."""
+        last = self.equity.last
+        if last is None:
+            return {}
+        return {name: (peak.value - last[1]) / peak.value if peak.value else 0.0
+                for name, peak in self.peaks.items() if peak.value is not None}
+
+    def equity_series(self, window=None, step=None):
         """
-        Tracks the highest value the portfolio has reached recently.
-        In a real production app, we would reset this every 24h or use a rolling window.
+        [(timestamp, equity)] for the last `window` seconds (or everything kept),
+        downsampled to the last point of every `step` seconds if given.
         """
-        if current_portfolio_value > self.high_water_mark:
-            self.high_water_mark = current_portfolio_value
+        last = self.equity.last
+        points = self.equity.points(since=None if window is None or last is None else last[0] - window)
+        if step:
+            points = [p for p, after in zip(points, points[1:] + [None])
+                      if after is None or after[0] - after[0] % step != p[0] - p[0] % step]
+        return points
 
-    def check_panic_condition(self, current_portfolio_value: Decimal):
+    def publish(self):
+        """
+        Puts the drawdowns on the bot's status board (GET /status, pushed to dashboards),
+        with the equity curve downsampled to STATUS_EQUITY_STEP. The curve is only rebuilt
+        once per equity bucket, not on every tick.
+        """
+        last = self.equity.last
+        if last is None:
+            return
+        fields = {'drawdowns': self.drawdowns(), 'equity': last[1]}
+        bucket = last[0] - last[0] % self.equity.resolution
+        if bucket != self._published_bucket:
+            self._published_bucket = bucket
+            fields['equity_series'] = [[t, round(v, 2)] for t, v in self.equity_series(step=STATUS_EQUITY_STEP)]
+        telemetry.STATUS.report_portfolio(**fields)
+
+    def check_panic_condition(self, current_portfolio_value: Decimal, now=None):
         """
         The Guardian Logic:
-        Checks if we have dropped 5% from the peak.
+        Checks if we have dropped 5% from the rolling 24h peak.
         """
         if self.is_frozen:
             return self._check_thaw()
 
+        self.update_high_water_mark(current_portfolio_value, now)
+        self.publish()
         if self.high_water_mark == 0:
-            self.update_high_water_mark(current_portfolio_value)
             return False
 
         # Calculate drawdown
@@ -39,11 +97,12 @@ class RiskManager:
 
         if drawdown >= self.panic_threshold:
             print(f"🚨 PANIC TRIGGERED! Drawdown: {drawdown*100:.2f}%")
+            telemetry.PANICS.inc()
             return True
         
         return False
 
-    def trigger_emergency_sell(self):
+    def trigger_emergency_sell(self, symbols=('BTC/USDT',)):
         """
         EXECUTE ORDER 66: Sell everything to USDC immediately.
         """
@@ -51,26 +110,99 @@ class RiskManager:
         
         try:
             # 1. Cancel all open orders to free up locked funds
-            self.exchange.cancel_all_orders('BTC/USDT')
-            
-            # 2. Get current BTC balance
+            for symbol in symbols:
+                if self.executor is not None:
+                    self.executor.cancel(symbol)
+                self.exchange.cancel_all_orders(symbol)
+
+            # 2. Get current balances
             balance = self.exchange.fetch_balance()
-            btc_amount = balance.get('BTC', {}).get('free', 0)
-            
-            if btc_amount > 0.0001: # Minimum trade size check
-                # 3. Market Sell (Fastest exit)
-                order = self.exchange.create_market_sell_order('BTC/USDT', btc_amount)
-                print(f"✅ LIQUIDATION COMPLETE. Sold {btc_amount} BTC. ID: {order['id']}")
+
+            for symbol in symbols:
+                amount = self._liquidation_amount(balance, symbol)
+                if amount and self.executor is not None:
+                    # 3a. IOC sweeps with a price floor (fast, bounded impact)
+                    report = self.executor.liquidate(symbol, amount)
+                    print(f"✅ LIQUIDATION COMPLETE. Sold {report['filled']} {symbol} "
+                          f"({report['slippage_bps']:+.1f}bps vs arrival)")
+                elif amount:
+                    # 3b. Market Sell (Fastest exit)
+                    order = self.exchange.create_market_sell_order(symbol, amount)
+                    print(f"✅ LIQUIDATION COMPLETE. Sold {amount} {symbol}. ID: {order['id']}")
             
             # 4. Freeze the system
-            self.is_frozen = True
-            self.freeze_start_time = time.time()
-            self.high_water_mark = Decimal("0.00") # Reset for next cycle
+            self._freeze()
             
         except Exception as e:
             print(f"❌ CRITICAL FAILURE during Panic Sell: {e}")
             # In production, this would send an SMS/Email to the admin immediately
 
+    async def trigger_emergency_sell_async(self, symbols):
+        """
+        Same as trigger_emergency_sell, for an async (ccxt.async_support) exchange client.
+        All symbols are cancelled and sold concurrently.
+        """
+        print("🛑 EMERGENCY: Liquidating all assets to USDC...")
+
+        try:
+            await asyncio.gather(*(self.exchange.cancel_all_orders(symbol) for symbol in symbols))
+            balance = await self.exchange.fetch_balance()
+
+            sells = {
+                symbol: amount for symbol in symbols
+                if (amount := self._liquidation_amount(balance, symbol))
+            }
+            orders = await asyncio.gather(
+                *(self.exchange.create_market_sell_order(symbol, amount) for symbol, amount in sells.items()),
+                return_exceptions=True,
+            )
+            for (symbol, amount), order in zip(sells.items(), orders):
+                if isinstance(order, Exception):
+                    print(f"❌ CRITICAL FAILURE selling {symbol}: {order}")
+                else:
+                    print(f"✅ LIQUIDATION COMPLETE. Sold {amount} {symbol}. ID: {order['id']}")
+
+            self._freeze()
+
+        except Exception as e:
+            print(f"❌ CRITICAL FAILURE during Panic Sell: {e}")
+
+    def _liquidation_amount(self, balance, symbol):
+        """Free base-asset amount for `symbol`, or 0 if it is below the minimum trade size."""
+        base = symbol.split('/')[0]
+        amount = balance.get(base, {}).get('free', 0) or 0
+        minimum = 0.0001
+        market = getattr(self.exchange, 'markets', None) or {}
+        if symbol in market:
+            minimum = market[symbol].get('limits', {}).get('amount', {}).get('min') or minimum
+        return amount if amount > minimum else 0
+
+    def _freeze(self):
+        self.is_frozen = True
+        self.freeze_start_time = time.time()
+        self.high_water_mark = Decimal("0.00") # Reset for next cycle
+        for peak in self.peaks.values():
+            peak.reset()
+
+    def state(self):
+        """JSON-serializable risk state (for checkpoints)."""
+        # Only the rolling peaks (a few bucketed entries each); the equity series
+        # itself is for dashboards and starts over after a restart
+        return {
+            'high_water_mark': str(self.high_water_mark),
+            'is_frozen': self.is_frozen,
+            'freeze_start_time': self.freeze_start_time,
+            'peaks': {name: peak.state() for name, peak in self.peaks.items()},
+        }
+
+    def restore(self, state):
+        self.high_water_mark = Decimal(state['high_water_mark'])
+        self.is_frozen = state['is_frozen']
+        self.freeze_start_time = state['freeze_start_time']
+        for name, entries in state.get('peaks', {}).items():
+            if name in self.peaks:
+                self.peaks[name].restore(entries)
+
     def _check_thaw(self):
         """
         Checks if the 24h freeze period is over.
@@ -0,0 +1,523 @@
+"""
+Local simulated exchange for deterministic replay and load-testing.
+
+SimulatedExchange is a drop-in for the ccxt.binance methods the engine uses
+(fetch_ohlcv, fetch_ticker(s), fetch_order_book, fetch_balance, market and limit
+orders, ...). It replays recorded or synthetic OHLCV, splitting every bar into
+`ticks_per_bar` prices, and can add latency, rate limits and random failures.
+
+Usage (benchmark the bot against the simulator):
+    python -m trading_engine.simulator [candles.csv] --ticks 20000
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from bisect import bisect_left, bisect_right
+from decimal import Decimal
+
+import ccxt
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from trading_engine.rate_limiter import BINANCE_WEIGHTS
+
+TIMEFRAME_SECONDS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def parse_timeframe(timeframe):
+    return int(timeframe[:-1]) * TIMEFRAME_SECONDS[timeframe[-1]]
+
+
+def synthetic_bars(n, start_price=30_000.0, volatility=0.01, drift=0.0, timeframe='1h',
+                   start_ts=1_600_000_000_000, seed=0):
+    """Geometric Brownian motion OHLCV rows (ccxt format)."""
+    rng = random.Random(seed)
+    step = parse_timeframe(timeframe) * 1000
+    bars, price = [], start_price
+    for i in range(n):
+        close = price * math.exp(drift + rng.gauss(0, volatility))
+        wick = abs(rng.gauss(0, volatility / 2))
+        high = max(price, close) * (1 + wick)
+        low = min(price, close) * (1 - wick)
+        bars.append([start_ts + i * step, price, high, low, close, rng.uniform(10, 100)])
+        price = close
+    return bars
+
+
+class SimulatedExchange:
+    """
+    speed: simulated seconds per wall-clock second (e.g. 3600 = one 1h bar per second).
+           0 = manual clock, moved only by advance().
+    latency: (mean, jitter) seconds added to every call.
+    weight_per_minute: Binance-style request weight budget; exceeding it raises
+           ccxt.RateLimitExceeded. None disables the limit.
+    failure_rate: probability that a call raises ccxt.NetworkError (per method via dict).
+    spread_bps / book_depth: synthetic order book around the tick price; `book_depth`
+           base units rest on each 1bp level, so large market orders walk the book.
+    """
+    def __init__(self, series, timeframe='1h', balances=None, ticks_per_bar=4,
+                 speed=0, latency=(0.0, 0.0), weight_per_minute=None, failure_rate=0.0,
+                 fee=0.001, slippage=0.0, spread_bps=2.0, book_depth=None, warmup_bars=200, seed=0):
+        if not isinstance(series, dict):
+            series = {'BTC/USDT': series}
+        self.series = {s: [list(b[:6]) for b in bars] for s, bars in series.items()}
+        self.n_bars = min(len(b) for b in self.series.values())
+        self.timeframe = timeframe
+        self.ticks_per_bar = max(2, ticks_per_bar)
+        self.speed = speed
+        self.latency = latency
+        self.weight_per_minute = weight_per_minute
+        self.failure_rate = failure_rate
+        self.fee = fee
+        self.slippage = slippage
+        self.spread_bps = spread_bps
+        self.book_depth = book_depth
+        self.rng = random.Random(seed)
+
+        self.balances = {'USDT': 10_000.0}
+        self.balances.update(balances or {})
+        for symbol in self.series:
+            for asset in symbol.split('/'):
+                self.balances.setdefault(asset, 0.0)
+
+        self.markets = {s: self._market(s) for s in self.series}
+        self.orders = []
+        self.open_orders = {}
+        self.calls = {}
+        self.defer_latency = False
+        self.pending_delay = 0.0
+
+        # Clock: global tick index (bar * ticks_per_bar + tick within bar)
+        self.tick = min(warmup_bars, self.n_bars - 1) * self.ticks_per_bar
+        self._clock_start = (time.monotonic(), self.tick)
+        self._bar_paths = {}
+        self._tokens = float(weight_per_minute or 0)
+        self._tokens_at = time.monotonic()
+
+    # --- CLOCK ---
+
+    @staticmethod
+    def _market(symbol):
+        base, quote = symbol.split('/')
+        return {'id': base + quote, 'symbol': symbol, 'base': base, 'quote': quote, 'spot': True,
+                'active': True, 'limits': {'amount': {'min': 0.0001}, 'cost': {'min': 5.0}}}
+
+    @property
+    def exhausted(self):
+        return self._now_tick() >= self.n_bars * self.ticks_per_bar - 1
+
+    def advance(self, ticks=1):
+        """Moves the manual clock forward. Returns False at the end of the data."""
+        self.tick = min(self.tick + ticks, self.n_bars * self.ticks_per_bar - 1)
+        return not self.exhausted
+
+    def seek(self, timestamp):
+        """Moves the manual clock to the tick at `timestamp` (ms, as milliseconds() reports it)."""
+        bars = next(iter(self.series.values()))
+        bar_index = max(0, bisect_right(bars, timestamp, hi=self.n_bars, key=lambda b: b[0]) - 1)
+        k = (timestamp - bars[bar_index][0]) * self.ticks_per_bar // (parse_timeframe(self.timeframe) * 1000)
+        self.tick = min(bar_index * self.ticks_per_bar + min(max(0, int(k)), self.ticks_per_bar - 1),
+                        self.n_bars * self.ticks_per_bar - 1)
+
+    def _now_tick(self):
+        if not self.speed:
+            return self.tick
+        started, start_tick = self._clock_start
+        bar_seconds = parse_timeframe(self.timeframe)
+        elapsed_ticks = (time.monotonic() - started) * self.speed / bar_seconds * self.ticks_per_bar
+        self.tick = min(start_tick + int(elapsed_ticks), self.n_bars * self.ticks_per_bar - 1)
+        return self.tick
+
+    def _path(self, symbol, bar_index):
+        """Tick prices inside one bar: open -> low/high -> high/low -> close, interpolated."""
+        key = (symbol, bar_index)
+        if key not in self._bar_paths:
+            if len(self._bar_paths) > 4096:
+                self._bar_paths.clear()
+            _, o, h, l, c, _ = self.series[symbol][bar_index]
+            points = (o, l, h, c) if c >= o else (o, h, l, c)
+            prices = []
+            for k in range(self.ticks_per_bar):
+                x = k * 3 / (self.ticks_per_bar - 1)
+                i = min(int(x), 2)
+                prices.append(points[i] + (points[i + 1] - points[i]) * (x - i))
+            self._bar_paths[key] = prices
+        return self._bar_paths[key]
+
+    def _forming_bar(self, symbol):
+        bar_index, k = divmod(self._now_tick(), self.ticks_per_bar)
+        ts, o, _, _, _, v = self.series[symbol][bar_index]
+        seen = self._path(symbol, bar_index)[:k + 1]
+        return [ts, o, max(seen), min(seen), seen[-1], v * (k + 1) / self.ticks_per_bar], bar_index
+
+    def price(self, symbol='BTC/USDT'):
+        return self._forming_bar(symbol)[0][4]
+
+    def milliseconds(self):
+        """Simulated exchange time (ccxt API), so clients can schedule against replayed time."""
+        bar_index, k = divmod(self._now_tick(), self.ticks_per_bar)
+        ts = next(iter(self.series.values()))[bar_index][0]
+        return int(ts + parse_timeframe(self.timeframe) * 1000 * k / self.ticks_per_bar)
+
+    # --- NETWORK SIMULATION ---
+
+    def _before_call(self, method):
+        """Counts the call, applies rate limit + failure injection, returns the latency to wait."""
+        self.calls[method] = self.calls.get(method, 0) + 1
+
+        if self.weight_per_minute:
+            now = time.monotonic()
+            self._tokens = min(self.weight_per_minute,
+                               self._tokens + (now - self._tokens_at) * self.weight_per_minute / 60.0)
+            self._tokens_at = now
+            weight = BINANCE_WEIGHTS.get(method, 1)
+            if self._tokens < weight:
+                raise ccxt.RateLimitExceeded(f"simulator: request weight exceeded on {method}")
+            self._tokens -= weight
+
+        rate = self.failure_rate.get(method, 0.0) if isinstance(self.failure_rate, dict) else self.failure_rate
+        if rate and self.rng.random() < rate:
+            raise ccxt.NetworkError(f"simulator: injected failure on {method}")
+
+        mean, jitter = self.latency
+        return max(0.0, self.rng.gauss(mean, jitter)) if (mean or jitter) else 0.0
+
+    def _call(self, method):
+        delay = self._before_call(method)
+        if self.defer_latency:
+            self.pending_delay = delay  # AsyncSimulatedExchange awaits it instead
+        elif delay:
+            time.sleep(delay)
+
+    # --- CCXT API ---
+
+    def parse_timeframe(self, timeframe):
+        return parse_timeframe(timeframe)
+
+    def load_markets(self, reload=False):
+        self._call('load_markets')
+        return self.markets
+
+    def set_markets(self, markets, currencies=None):
+        self.markets = markets
+
+    def fetch_trading_fees(self):
+        self._call('fetch_trading_fees')
+        return {s: {'symbol': s, 'maker': self.fee, 'taker': self.fee} for s in self.series}
+
+    def fetch_ohlcv(self, symbol, timeframe=None, since=None, limit=None):
+        self._call('fetch_ohlcv')
+        if timeframe not in (None, self.timeframe):
+            raise ccxt.NotSupported(f"simulator replays {self.timeframe} bars only")
+        forming, bar_index = self._forming_bar(symbol)
+        bars = self.series[symbol]
+        if since is not None:
+            # Like the exchange: the first `limit` candles from `since` on
+            start = min(bisect_left(bars, since, hi=bar_index, key=lambda b: b[0]), bar_index)
+            end = bar_index + 1 if limit is None else min(bar_index + 1, start + limit)
+        else:
+            end = bar_index + 1
+            start = 0 if limit is None else max(0, end - limit)
+        rows = [list(b) for b in bars[start:min(end, bar_index)]]
+        if end > bar_index and (since is None or forming[0] >= since):
+            rows.append(forming)
+        return rows
+
+    def _ticker(self, symbol):
+        forming, bar_index = self._forming_bar(symbol)
+        bid, ask = self._touch(symbol)
+        bars_per_day = max(1, 86400 // parse_timeframe(self.timeframe))
+        volume = sum(b[5] for b in self.series[symbol][max(0, bar_index - bars_per_day + 1):bar_index])
+        return {'symbol': symbol, 'timestamp': forming[0], 'last': forming[4], 'close': forming[4],
+                'bid': bid, 'ask': ask, 'high': forming[2], 'low': forming[3],
+                'baseVolume': volume + forming[5]}
+
+    def _touch(self, symbol):
+        price = self.price(symbol)
+        half = price * self.spread_bps / 2e4
+        return price - half, price + half
+
+    def _levels(self, symbol, side, limit=None):
+        """Book levels ([price, amount]) a taker on `side` would hit, best first."""
+        bid, ask = self._touch(symbol)
+        step = self.price(symbol) * 1e-4
+        depth = self.book_depth if self.book_depth is not None else float('inf')
+        n = limit or 100
+        if side == 'buy':
+            return [[ask + i * step, depth] for i in range(n)]
+        return [[bid - i * step, depth] for i in range(n)]
+
+    def fetch_order_book(self, symbol, limit=None):
+        self._call('fetch_order_book')
+        n = min(limit or 20, 100)
+        forming, _ = self._forming_bar(symbol)
+        return {'symbol': symbol, 'timestamp': forming[0],
+                'bids': self._levels(symbol, 'sell', n), 'asks': self._levels(symbol, 'buy', n)}
+
+    def fetch_ticker(self, symbol):
+        self._call('fetch_ticker')
+        return self._ticker(symbol)
+
+    def fetch_tickers(self, symbols=None):
+        self._call('fetch_tickers')
+        return {s: self._ticker(s) for s in (symbols or self.series)}
+
+    def fetch_balance(self, params=None):
+        self._call('fetch_balance')
+        result = {'free': {}, 'used': {}, 'total': {}}
+        for asset, amount in self.balances.items():
+            result[asset] = {'free': amount, 'used': 0.0, 'total': amount}
+            result['free'][asset], result['used'][asset], result['total'][asset] = amount, 0.0, amount
+        return result
+
+    def _settle(self, symbol, side, amount, price, fee_rate):
+        """Moves balances for one fill. Raises ccxt.InsufficientFunds if it can't be paid for."""
+        base, quote = symbol.split('/')
+        cost = amount * price
+        fee = cost * fee_rate
+        if side == 'buy':
+            if cost + fee > self.balances[quote] + 1e-9:
+                raise ccxt.InsufficientFunds(f"simulator: need {cost + fee:.2f} {quote}")
+            self.balances[quote] -= cost + fee
+            self.balances[base] += amount
+        else:
+            if amount > self.balances[base] + 1e-12:
+                raise ccxt.InsufficientFunds(f"simulator: need {amount} {base}")
+            self.balances[base] -= amount
+            self.balances[quote] += cost - fee
+        return cost, fee
+
+    def _take(self, symbol, side, amount, limit_price=None):
+        """Walks the book up to `limit_price`. Returns (filled, cost)."""
+        filled = cost = 0.0
+        for price, size in self._levels(symbol, side):
+            if limit_price is not None and (price > limit_price if side == 'buy' else price < limit_price):
+                break
+            take = min(size, amount - filled)
+            filled += take
+            cost += take * price
+            if filled >= amount - 1e-12:
+                break
+        if filled and self.slippage:
+            cost *= 1 + self.slippage if side == 'buy' else 1 - self.slippage
+        return filled, cost
+
+    def _order(self, symbol, type, side, amount, price):
+        order = {'id': str(len(self.orders) + 1), 'symbol': symbol, 'type': type, 'side': side,
+                 'amount': amount, 'filled': 0.0, 'remaining': amount, 'price': price, 'average': None,
+                 'cost': 0.0, 'status': 'open', 'timestamp': self.milliseconds(),
+                 'fee': {'cost': 0.0, 'currency': symbol.split('/')[1]}}
+        self.orders.append(order)
+        return order
+
+    def _record_fill(self, order, filled, cost, fee_rate):
+        _, fee = self._settle(order['symbol'], order['side'], filled, cost / filled, fee_rate)
+        order['filled'] += filled
+        order['remaining'] = max(0.0, order['amount'] - order['filled'])
+        order['cost'] += cost
+        order['average'] = order['cost'] / order['filled']
+        order['fee']['cost'] += fee
+        if order['remaining'] <= 1e-12:
+            order['status'] = 'closed'
+
+    def create_order(self, symbol, type, side, amount, price=None, params=None):
+        self._call('create_order')
+        return self._create(symbol, type, side, amount, price, params)
+
+    def _create(self, symbol, type, side, amount, price=None, params=None):
+        order = self._order(symbol, type, side, amount, price)
+        filled, cost = self._take(symbol, side, amount, price if type == 'limit' else None)
+        if filled:
+            self._record_fill(order, filled, cost, self.fee)
+        if order['status'] == 'open':
+            if type == 'market' or (params or {}).get('timeInForce') in ('IOC', 'FOK'):
+                order['status'] = 'canceled' if order['filled'] == 0 else 'closed'
+            else:
+                self.open_orders[order['id']] = order
+        return dict(order)
+
+    def create_market_buy_order(self, symbol, amount, params=None):
+        self._call('create_market_buy_order')
+        return self._create(symbol, 'market', 'buy', amount)
+
+    def create_market_sell_order(self, symbol, amount, params=None):
+        self._call('create_market_sell_order')
+        return self._create(symbol, 'market', 'sell', amount)
+
+    def _match_resting(self):
+        """Fills resting limit orders (as maker, at their limit) once the tick price trades through."""
+        for order_id, order in list(self.open_orders.items()):
+            price = self.price(order['symbol'])
+            crossed = price <= order['price'] if order['side'] == 'buy' else price >= order['price']
+            if crossed:
+                try:
+                    self._record_fill(order, order['remaining'], order['remaining'] * order['price'], self.fee)
+                except ccxt.InsufficientFunds:
+                    order['status'] = 'canceled'
+            if order['status'] != 'open':
+                del self.open_orders[order_id]
+
+    def fetch_order(self, id, symbol=None, params=None):
+        self._call('fetch_order')
+        self._match_resting()
+        return dict(self.orders[int(id) - 1])
+
+    def fetch_open_orders(self, symbol=None, since=None, limit=None, params=None):
+        self._call('fetch_open_orders')
+        self._match_resting()
+        return [dict(o) for o in self.open_orders.values() if symbol in (None, o['symbol'])]
+
+    def cancel_order(self, id, symbol=None, params=None):
+        self._call('cancel_order')
+        self._match_resting()
+        order = self.open_orders.pop(id, None)
+        if order is None:
+            raise ccxt.OrderNotFound(f"simulator: order {id} is not open")
+        order['status'] = 'canceled'
+        return dict(order)
+
+    def cancel_all_orders(self, symbol=None, params=None):
+        self._call('cancel_all_orders')
+        self._match_resting()
+        cancelled = []
+        for order_id, order in list(self.open_orders.items()):
+            if symbol in (None, order['symbol']):
+                order['status'] = 'canceled'
+                cancelled.append(dict(self.open_orders.pop(order_id)))
+        return cancelled
+
+    def close(self):
+        pass
+
+
+class AsyncSimulatedExchange:
+    """ccxt.async_support-style wrapper: same simulator, coroutine methods, non-blocking latency."""
+    ASYNC_METHODS = {
+        'load_markets', 'fetch_trading_fees', 'fetch_ohlcv', 'fetch_ticker', 'fetch_tickers',
+        'fetch_balance', 'fetch_order_book', 'create_order', 'create_market_buy_order',
+        'create_market_sell_order', 'fetch_order', 'fetch_open_orders', 'cancel_order', 'cancel_all_orders',
+    }
+
+    def __init__(self, simulator):
+        self.sim = simulator
+        self.sim.defer_latency = True
+
+    def __getattr__(self, name):
+        attr = getattr(self.sim, name)
+        if name not in self.ASYNC_METHODS:
+            return attr
+
+        async def call(*args, **kwargs):
+            self.sim.pending_delay = 0.0
+            result = attr(*args, **kwargs)
+            delay = self.sim.pending_delay
+            if delay:
+                await asyncio.sleep(delay)
+            return result
+        return call
+
+    async def close(self):
+        pass
+
+
+# --- BENCHMARK ---
+
+def benchmark(bars, ticks=10_000, ticks_per_bar=4, mode='poll'):
+    """
+    Drives QuantitativeBot against the simulator on a manual clock and reports throughput.
+    mode='poll' runs the full execute_strategy fan-out per tick, 'tick' the streaming on_tick path.
+    The user-pool DB query, the NAV write and the Fear & Greed API are replaced by
+    constants so only the engine itself is measured.
+    """
+    with tempfile.TemporaryDirectory(prefix='apex_sim_') as tmp:
+        # The bot reads its file locations from the environment: pointed at `tmp` for this
+        # run only, then restored, so the caller's settings (and files) are left alone
+        paths = {"BOT_CACHE_FILE": os.path.join(tmp, 'cache.json'),
+                 "BOT_STATE_FILE": os.path.join(tmp, 'state.jsonl'),
+                 "CANDLE_STORE": os.path.join(tmp, 'candles')}
+        saved = {name: os.environ.get(name) for name in paths}
+        os.environ.update(paths)
+        from trading_engine import bot as bot_module
+
+        sim = SimulatedExchange(bars, ticks_per_bar=ticks_per_bar)
+        real_pool, real_nav = bot_module.get_total_trading_pool, bot_module.record_equity
+        bot_module.get_total_trading_pool = lambda: Decimal("0.00")
+        bot_module.record_equity = lambda equity: None
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                bot = bot_module.QuantitativeBot(exchange=sim)
+                bot.cache.entries['fng'].loader = lambda: 50
+                bot.cache.get('fees')
+                bot.fetch_data()
+
+            latencies = []
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(ticks):
+                    if not sim.advance():
+                        break
+                    t0 = time.perf_counter()
+                    if mode == 'tick':
+                        with bot.indicators_lock:
+                            bot.indicators.update(sim._forming_bar(bot.symbol)[0])
+                        bot.on_tick(sim.price(bot.symbol))
+                    else:
+                        bot.execute_strategy()
+                    bot.save_state()
+                    latencies.append(time.perf_counter() - t0)
+            elapsed = time.perf_counter() - started
+            bot.io_pool.shutdown(wait=False)
+            bot.checkpoints.close()
+        finally:
+            bot_module.get_total_trading_pool, bot_module.record_equity = real_pool, real_nav
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1e6 if latencies else 0.0
+    stats = {
+        'ticks': len(latencies),
+        'ticks_per_second': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_us': pct(0.50),
+        'p99_us': pct(0.99),
+        'orders': len(sim.orders),
+        'slippage_bps': bot.executor.slippage(),
+        'final_usdt': sim.balances['USDT'],
+        'calls': dict(sim.calls),
+    }
+    print("\n--- 🧪 SIMULATOR BENCHMARK ---")
+    print(f"⚡ {stats['ticks']:,} ticks at {stats['ticks_per_second']:,.0f} ticks/s "
+          f"(p50 {stats['p50_us']:.0f}µs, p99 {stats['p99_us']:.0f}µs)")
+    print(f"🧾 Orders: {stats['orders']} | USDT: ${stats['final_usdt']:,.2f} | "
+          f"Slippage: {stats['slippage_bps']:+.1f}bps vs arrival")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Apex bot against the simulated exchange")
+    parser.add_argument('csv', nargs='?', help="Recorded OHLCV (default: synthetic)")
+    parser.add_argument('--ticks', type=int, default=10_000)
+    parser.add_argument('--ticks-per-bar', type=int, default=4)
+    parser.add_argument('--mode', choices=['poll', 'tick'], default='poll')
+    args = parser.parse_args(argv)
+
+    if args.csv:
+        from trading_engine.feeds import ReplayFeed
+        bars = ReplayFeed.load_csv(args.csv)
+    else:
+        bars = synthetic_bars(args.ticks // args.ticks_per_bar + 400)
+    return benchmark(bars, args.ticks, args.ticks_per_bar, args.mode)
+
+
+if __name__ == "__main__":
+    main()
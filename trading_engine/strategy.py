@@ -0,0 +1,50 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class ApexParams:
+    """The "Apex" configuration. Shared by the live bot, the backtester and the optimizer."""
+    timeframe: str = '1h'
+    ema_fast: int = 50
+    ema_slow: int = 200
+    rsi_length: int = 14
+    rsi_cap: float = 75.0
+    macd_fast: int = 12
+    macd_slow: int = 26
+    macd_signal: int = 9
+    atr_length: int = 14
+    atr_mult: float = 2.0
+    bb_length: int = 20
+    bb_std: float = 2.0
+    panic_threshold: float = 0.05        # RiskManager: 5% drop from peak
+    cooldown_period: int = 24 * 60 * 60  # RiskManager: freeze for 24h
+
+
+DEFAULT_PARAMS = ApexParams()
+
+
+# --- SIGNAL DEFINITIONS ---
+# `ind` is an indicator row (dict of floats, e.g. IndicatorEngine.latest) or a dict of
+# NumPy arrays with the same keys. Only element-wise operators (&, |) are used so the
+# exact same rules drive the live bot and the vectorized backtester.
+
+def buy_signal(ind, params=DEFAULT_PARAMS):
+    bullish_trend = ind['EMA_50'] > ind['EMA_200']
+    momentum_up = ind['MACD'] > ind['MACD_SIGNAL']
+    safe_entry = ind['RSI'] < params.rsi_cap
+    volatility_breakout = ind['close'] > ind['BB_UPPER']
+
+    return (bullish_trend & momentum_up & safe_entry) | (volatility_breakout & momentum_up)
+
+
+def trend_reversal(ind):
+    return ind['EMA_50'] < ind['EMA_200']
+
+
+def momentum_crash(ind, params=DEFAULT_PARAMS):
+    return (ind['MACD'] < ind['MACD_SIGNAL']) & (ind['RSI'] > params.rsi_cap)
+
+
+def stop_level(price, atr, params=DEFAULT_PARAMS):
+    """Trailing stop candidate: price minus `atr_mult` x ATR (2x ATR by default)."""
+    return price - (atr * params.atr_mult)
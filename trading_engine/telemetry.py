@@ -0,0 +1,73 @@
+"""
+Bot metrics (Prometheus), served by the bot's own listener: METRICS_PORT, default 9101.
+
+    bot_cycle_duration_seconds          one full polling cycle / tick
+    bot_phase_duration_seconds{phase}   sync (fan-out + audit), analyze (indicator math),
+                                        risk, decide (signals), execute (order calls)
+    bot_input_duration_seconds{input}   each fan-out input: balance, ticker, pool, candles, fng,
+                                        and the background NAV write (nav)
+    db_query_duration_seconds           the pool query and NAV update (engine="bot", see backend/app/db_config.py)
+    bot_orders_total{side,kind}         orders sent: twap | iceberg | pov | liquidation | market
+    bot_order_rejections_total{reason}  orders the exchange refused, by exception type
+    bot_panic_triggers_total            panic switch activations
+
+The same listener serves GET /status: the latest price, RSI, stop level, position and
+frozen state per symbol, plus the portfolio's 1h/24h/7d drawdowns and an hourly equity
+curve, and the external-data cache's hits and misses, as JSON. The API polls it for its push channel (BOT_STATUS_URL).
+"""
+import threading
+import time
+
+from backend.app import metrics
+
+CYCLE = metrics.histogram("bot_cycle_duration_seconds", "Bot cycle latency (polling cycle or tick)")
+PHASES = metrics.histogram("bot_phase_duration_seconds", "Bot cycle latency per phase", ("phase",))
+INPUTS = metrics.histogram("bot_input_duration_seconds", "Fan-out input latency", ("input",))
+ORDERS = metrics.counter("bot_orders_total", "Orders sent to the exchange", ("side", "kind"))
+REJECTIONS = metrics.counter("bot_order_rejections_total", "Orders the exchange refused", ("reason",))
+PANICS = metrics.counter("bot_panic_triggers_total", "Panic switch activations")
+
+# Bound once: these are recorded on every cycle
+SYNC = PHASES.labels(phase='sync')
+ANALYZE = PHASES.labels(phase='analyze')
+RISK = PHASES.labels(phase='risk')
+DECIDE = PHASES.labels(phase='decide')
+EXECUTE = PHASES.labels(phase='execute')
+INPUT = {name: INPUTS.labels(input=name) for name in ('balance', 'ticker', 'pool', 'candles', 'fng', 'nav')}
+
+
+class StatusBoard:
+    """
+    Latest state per symbol, and of the whole portfolio. `report` merges fields, so a
+    frozen cycle can update just that.
+    """
+    def __init__(self):
+        self.symbols = {}
+        self.portfolio = {}
+        self.sources = {}           # name -> callable, read on every snapshot (e.g. cache stats)
+        self.lock = threading.Lock()
+
+    def report(self, symbol, **fields):
+        with self.lock:
+            self.symbols[symbol] = {**self.symbols.get(symbol, {}), **fields, 'updated_at': time.time()}
+
+    def attach(self, name, source):
+        self.sources[name] = source
+
+    def report_portfolio(self, **fields):
+        with self.lock:
+            self.portfolio = {**self.portfolio, **fields, 'updated_at': time.time()}
+
+    def snapshot(self):
+        with self.lock:
+            snapshot = {'symbols': {symbol: dict(fields) for symbol, fields in self.symbols.items()},
+                        'portfolio': dict(self.portfolio)}
+        return {**snapshot, **{name: source() for name, source in self.sources.items()}}
+
+
+STATUS = StatusBoard()
+
+
+def serve(port):
+    """Starts the /metrics (and /status) listener unless `port` is 0."""
+    return metrics.serve(port, status=STATUS.snapshot) if port else None
@@ -0,0 +1,174 @@
+"""
+Multi-timeframe indicators from one base candle stream.
+
+The bot fetches (or streams) a single timeframe, e.g. 1m. Every higher timeframe is
+built from it in-process, one base candle at a time, and runs its own IndicatorEngine:
+asking for 15m, 1h or 4h indicators costs no extra REST calls.
+
+Resampled bars follow the exchange's kline rules, so they match what fetch_ohlcv would
+return for that timeframe:
+- bars open on multiples of the timeframe since the epoch (UTC), weekly bars on Mondays;
+- open = first base open, high / low = extremes, close = last base close, volume = sum;
+- the bar in progress is built from the closed base candles plus the forming one.
+
+A bar is only emitted if its first base candle was seen: a warm-up that starts mid-bar
+skips to the next bar instead of reporting a truncated one.
+
+Standard library only: the bot imports it at startup.
+"""
+
+WEEK_OFFSET = 4 * 86400 * 1000   # 1970-01-01 was a Thursday; Binance weeks open on Monday
+FETCH_LIMIT = 1000               # Binance's max candles per fetch_ohlcv call
+
+
+def timeframe_ms(timeframe):
+    """'1m' / '15m' / '1h' / '4h' / '1d' / '1w' -> milliseconds."""
+    units = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+    return int(timeframe[:-1]) * units[timeframe[-1]] * 1000
+
+
+def bar_open(ts, timeframe):
+    """Open time of the `timeframe` bar containing `ts` (ms; also works on NumPy arrays)."""
+    step = timeframe_ms(timeframe)
+    offset = WEEK_OFFSET if timeframe.endswith('w') else 0
+    return ts - (ts - offset) % step
+
+
+class Resampler:
+    """Aggregates a base candle stream into `timeframe` bars, O(1) per row."""
+    def __init__(self, timeframe, base_timeframe):
+        self.timeframe = timeframe
+        step, base = timeframe_ms(timeframe), timeframe_ms(base_timeframe)
+        if step < base or step % base:
+            raise ValueError(f"{timeframe} is not a multiple of the base timeframe {base_timeframe}")
+        self.step = step
+        self.offset = WEEK_OFFSET if timeframe.endswith('w') else 0
+        self.closed = None      # [bar open, open, high, low, volume] over the bar's closed base candles
+        self.forming = None     # Latest base candle (may still be updated)
+
+    def update(self, candle):
+        """
+        Applies one base row (same rules as IndicatorEngine.update: a repeated timestamp
+        replaces the forming candle, a newer one closes it). Returns the resampled bar the
+        row belongs to, or None for stale rows and rows of a bar joined mid-way.
+        """
+        ts = candle[0]
+        if self.forming is not None:
+            if ts < self.forming[0]:
+                return None
+            if ts > self.forming[0]:
+                self._commit(self.forming)
+
+        start = ts - (ts - self.offset) % self.step
+        if self.closed is not None and self.closed[0] != start:
+            self.closed = None  # The previous bar is complete
+        if self.closed is None and ts != start:
+            self.forming = None
+            return None
+
+        self.forming = candle
+        _, o, h, l, c, v = candle[:6]
+        o, h, l, c, v = float(o), float(h), float(l), float(c), float(v)
+        if self.closed is None:
+            return [start, o, h, l, c, v]
+        _, bar_o, bar_h, bar_l, bar_v = self.closed
+        return [start, bar_o, max(bar_h, h), min(bar_l, l), c, bar_v + v]
+
+    def _commit(self, candle):
+        ts, o, h, l, _, v = candle[:6]
+        o, h, l, v = float(o), float(h), float(l), float(v)
+        if self.closed is None:
+            self.closed = [ts - (ts - self.offset) % self.step, o, h, l, v]
+        else:
+            self.closed[2] = max(self.closed[2], h)
+            self.closed[3] = min(self.closed[3], l)
+            self.closed[4] += v
+
+    def state(self):
+        return [self.closed, self.forming]
+
+    def restore(self, state):
+        self.closed, self.forming = state
+
+
+class TimeframeSet:
+    """
+    One IndicatorEngine per timeframe, all fed from the `base_timeframe` stream.
+
+    Drop-in for a single IndicatorEngine (update / seed / latest / last_timestamp /
+    closed_bars / reset / state / restore), where `latest` is the primary `timeframe`
+    and timestamps are base candles. Other timeframes: `frames['4h'].latest`.
+    """
+    def __init__(self, make_engine, timeframe, base_timeframe=None, timeframes=()):
+        self.make_engine = make_engine
+        self.timeframe = timeframe
+        self.base_timeframe = base_timeframe or timeframe
+        self.timeframes = list(dict.fromkeys([timeframe, *timeframes]))
+        self.reset()
+
+    def reset(self):
+        self.engines = {tf: self.make_engine() for tf in self.timeframes}
+        # The base timeframe itself is fed straight through
+        self.resamplers = {tf: Resampler(tf, self.base_timeframe)
+                           for tf in self.timeframes if tf != self.base_timeframe}
+        self.last_timestamp = None  # Latest base candle
+        self.closed_bars = 0        # Base candles committed so far
+
+    def __getitem__(self, timeframe):
+        return self.engines[timeframe]
+
+    @property
+    def latest(self):
+        return self.engines[self.timeframe].latest
+
+    def warmup_bars(self, bars):
+        """Base candles needed for `bars` bars on the longest timeframe (plus one joined mid-way)."""
+        ratio = max(timeframe_ms(tf) for tf in self.timeframes) // timeframe_ms(self.base_timeframe)
+        return bars * ratio + ratio - 1
+
+    def update(self, candle):
+        """Applies one base OHLCV row to every timeframe; returns the primary snapshot."""
+        ts = candle[0]
+        if self.last_timestamp is not None:
+            if ts < self.last_timestamp:
+                return self.latest
+            if ts > self.last_timestamp:
+                self.closed_bars += 1
+        self.last_timestamp = ts
+        for timeframe, engine in self.engines.items():
+            resampler = self.resamplers.get(timeframe)
+            bar = resampler.update(candle) if resampler is not None else candle
+            if bar is not None:
+                engine.update(bar)
+        return self.latest
+
+    def seed(self, bars):
+        for bar in bars:
+            self.update(bar)
+        return self.latest
+
+    def state(self):
+        return {
+            'timeframes': self.timeframes,
+            'base_timeframe': self.base_timeframe,
+            'engines': {tf: engine.state() for tf, engine in self.engines.items()},
+            'resamplers': {tf: r.state() for tf, r in self.resamplers.items()},
+            'last_timestamp': self.last_timestamp,
+            'closed_bars': self.closed_bars,
+        }
+
+    def restore(self, state):
+        """Loads a snapshot from `state()`. Returns False (and keeps a clean set) if it was
+        taken with other timeframes or indicator lengths."""
+        if (state.get('timeframes') != self.timeframes
+                or state.get('base_timeframe') != self.base_timeframe):
+            return False
+        for timeframe, engine in self.engines.items():
+            if not engine.restore(state['engines'][timeframe]):
+                self.reset()
+                return False
+        for timeframe, resampler in self.resamplers.items():
+            resampler.restore(state['resamplers'][timeframe])
+        self.last_timestamp = state['last_timestamp']
+        self.closed_bars = state['closed_bars']
+        return True